@@ -0,0 +1,156 @@
+import os
+import re
+import time
+import threading
+from collections import OrderedDict
+import numpy as np
+from embedding_cache import normalize_query
+
+# bge-base-en cosines of unrelated questions already sit around 0.7-0.85, and
+# questions that differ only in the program named can score above 0.95, so the
+# threshold alone is not enough; see extract_entities and calibrate_answer_cache.py
+ANSWER_CACHE_THRESHOLD = float(os.getenv("ANSWER_CACHE_THRESHOLD", "0.97"))
+
+# Program, school, exam and money terms that users often type in lower case.
+# Questions that name different ones never share an answer.
+KEY_TERMS = frozenset({
+    "ai", "ml", "aiml", "dsml", "devops", "dsa", "sde", "sst", "nset", "mba", "bachelors", "bachelor",
+    "masters", "master", "data", "science", "analytics", "cloud", "backend", "frontend", "fullstack",
+    "academy", "school", "business", "technology", "intermediate", "advanced", "beginner", "iit", "bits",
+    "python", "java", "sql", "aws", "emi", "ctc", "lpa", "inr", "online", "offline", "hybrid",
+})
+
+_TOKEN_RE = re.compile(r"\w+")
+
+def extract_entities(text, key_terms=KEY_TERMS):
+    """
+    Lower-cased entity-like tokens of a question: numbers, acronyms and mixed-case
+    words (DSML, DevOps) and any of `key_terms`.
+    """
+    entities = set()
+    for token in _TOKEN_RE.findall(text):
+        lower = token.lower()
+        if len(token) > 2 and token[-1] == "s" and token[:-1].isupper():
+            # Plural acronyms (EMIs, IITs) name the same thing as the singular
+            lower = lower[:-1]
+        if any(c.isdigit() for c in token) or any(c.isupper() for c in token[1:]) or lower in key_terms:
+            entities.add(lower)
+    return frozenset(entities)
+
+def file_version(path):
+    """Version token for `version_fn`: changes whenever the file at `path` is rewritten."""
+    try:
+        return os.stat(path).st_mtime_ns
+    except FileNotFoundError:
+        return None
+
+class SemanticAnswerCache:
+    """
+    Cache of full RAG answers keyed by question embedding.
+
+    A lookup embeds the question and returns the stored answer of the most similar
+    earlier question if its cosine similarity is at least `threshold` and both
+    questions name the same entities (see extract_entities), so "fee for DSML"
+    never answers "fee for DevOps". Entries expire after `ttl` seconds and the
+    least recently used entry is evicted once `maxsize` is reached. If `version_fn` is given (e.g. the mtime of the index or
+    ingestion manifest), the cache empties itself whenever the value changes.
+    """
+
+    def __init__(self, embed_func, threshold=ANSWER_CACHE_THRESHOLD, maxsize=256, ttl=3600, version_fn=None,
+                 key_terms=KEY_TERMS):
+        """
+        Args:
+            embed_func: Embedding model exposing embed_query (normalized vectors)
+            threshold: Minimum cosine similarity to reuse an answer
+            maxsize: Maximum number of cached answers
+            ttl: Seconds an answer stays valid, None for no expiry
+            version_fn: Optional callable returning a token that changes when the index is rebuilt
+            key_terms: Lower-case terms that must match between questions, see extract_entities
+        """
+        self.embed_func = embed_func
+        self.key_terms = key_terms
+        self.threshold = threshold
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.version_fn = version_fn
+        self._version = version_fn() if version_fn else None
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _check_version(self):
+        if self.version_fn is None:
+            return
+        version = self.version_fn()
+        if version != self._version:
+            self._entries.clear()
+            self._version = version
+
+    def _expired(self, entry, now):
+        return self.ttl is not None and now - entry[2] > self.ttl
+
+    def _expire(self, now):
+        # Entries are ordered by last use, so expired ones collect at the head. An
+        # expired entry used more recently is dropped when a lookup matches it.
+        while self._entries:
+            key, entry = next(iter(self._entries.items()))
+            if not self._expired(entry, now):
+                break
+            del self._entries[key]
+
+    def lookup(self, question):
+        """Return a copy of the cached result for a similar question, or None."""
+        vector = np.asarray(self.embed_func.embed_query(question), dtype=np.float32)
+        entities = extract_entities(question, self.key_terms)
+        with self._lock:
+            self._check_version()
+            now = time.time()
+            self._expire(now)
+
+            best_key, best_score = None, -1.0
+            keys = [k for k, e in self._entries.items() if e[3] == entities]
+            if keys:
+                scores = np.stack([self._entries[k][0] for k in keys]) @ vector
+                best = int(np.argmax(scores))
+                best_key, best_score = keys[best], float(scores[best])
+
+            if best_key is not None and self._expired(self._entries[best_key], now):
+                del self._entries[best_key]
+                best_key = None
+            if best_key is None or best_score < self.threshold:
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(best_key)
+            self.hits += 1
+            result = self._entries[best_key][1]
+            return {"answer": result["answer"], "source_documents": list(result["source_documents"])}
+
+    def store(self, question, result):
+        """Cache a {"answer", "source_documents"} result for `question`."""
+        vector = np.asarray(self.embed_func.embed_query(question), dtype=np.float32)
+        entry = {"answer": result["answer"], "source_documents": list(result.get("source_documents", []))}
+        key = normalize_query(question)
+        with self._lock:
+            self._check_version()
+            self._entries[key] = (vector, entry, time.time(), extract_entities(question, self.key_terms))
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def invalidate(self):
+        """Drop every cached answer, call this after rebuilding the index."""
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "size": len(self._entries),
+                "maxsize": self.maxsize,
+            }
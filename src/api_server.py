@@ -0,0 +1,249 @@
+# Headless HTTP API for the assistant
+#
+#   python api_server.py --port 8000 --workers 8
+#   python api_server.py --stub               (stub LLM + local index, no keys or network)
+#
+# Endpoints:
+#   POST   /chat              {"question": ..., "session_id": optional} -> {"session_id", "answer", "sources"}
+#   POST   /chat/stream       same body, answer streamed as server-sent events (token ... done)
+#   DELETE /sessions/<id>     forget a conversation
+#   GET    /health            liveness
+#   GET    /metrics           perf_stats in Prometheus text format
+#   GET    /stats             perf_stats snapshot as JSON
+#
+# The chain, embedding model and index client are shared by every request (see
+# shared_resources.py); only the HybridMemory is kept per session, in a
+# SessionStore that compacts idle sessions and spills them to SQLite. At most
+# --workers turns run at once and turns of one session run one after another;
+# requests wait up to --queue-timeout seconds for both and then get a 503.
+
+import os
+import json
+import time
+import uuid
+import argparse
+import threading
+from contextlib import closing
+from urllib.parse import urlsplit, unquote
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from perf_stats import PERF, get_perf_stats
+from session_store import SessionStore, SESSION_DB_PATH
+
+API_WORKERS = int(os.getenv("API_WORKERS", str(os.cpu_count() or 4)))
+API_QUEUE_TIMEOUT = float(os.getenv("API_QUEUE_TIMEOUT", "30"))
+
+class ChatService:
+    """Answers questions on a shared chain with per-session memory and bounded concurrency."""
+
+    def __init__(self, chain, llm, workers=API_WORKERS, queue_timeout=API_QUEUE_TIMEOUT,
+                 window_size=4, max_history_tokens=None, session_db_path=SESSION_DB_PATH):
+        from hist_rag_chain_v2 import HybridMemory
+        self.chain = chain
+        self.sessions = SessionStore(
+            lambda: HybridMemory(llm=llm, window_size=window_size, max_history_tokens=max_history_tokens),
+            db_path=session_db_path,
+        )
+        # Turns of one conversation never interleave. session_id -> [lock, waiting or running turns];
+        # an entry only exists while a turn of that session is queued or running
+        self._session_locks = {}
+        self._session_locks_guard = threading.Lock()
+        self.slots = threading.BoundedSemaphore(workers)
+        self.queue_timeout = queue_timeout
+
+    def lock_session(self, session_id, timeout=None):
+        """Wait for the session's previous turn to finish; False after `timeout` (default queue_timeout) seconds."""
+        with self._session_locks_guard:
+            entry = self._session_locks.setdefault(session_id, [threading.Lock(), 0])
+            entry[1] += 1
+        if entry[0].acquire(timeout=self.queue_timeout if timeout is None else timeout):
+            return True
+        with self._session_locks_guard:
+            self._drop_session_lock(session_id)
+        return False
+
+    def unlock_session(self, session_id):
+        with self._session_locks_guard:
+            self._session_locks[session_id][0].release()
+            self._drop_session_lock(session_id)
+
+    def _drop_session_lock(self, session_id):
+        # Caller holds _session_locks_guard
+        entry = self._session_locks[session_id]
+        entry[1] -= 1
+        if not entry[1]:
+            del self._session_locks[session_id]
+
+    def wrapper(self, memory):
+        from hist_rag_chain_v2 import HybridRAGChainWrapper
+        return HybridRAGChainWrapper(self.chain, memory)
+
+    def acquire(self, timeout=None):
+        """Take a worker slot; False after `timeout` (default queue_timeout) seconds."""
+        return self.slots.acquire(timeout=self.queue_timeout if timeout is None else timeout)
+
+def serialize_sources(documents):
+    return [{"text": doc.page_content, "source": doc.metadata.get("source"),
+             "score": doc.metadata.get("score", doc.metadata.get("rrf_score"))} for doc in documents]
+
+class ChatRequestHandler(BaseHTTPRequestHandler):
+    service = None  # ChatService, set by make_server
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        # Per-request access logs would dominate the cost of a turn under load
+        pass
+
+    def _send_json(self, status, payload):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _read_json(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        try:
+            return json.loads(self.rfile.read(length) or b"{}")
+        except json.JSONDecodeError:
+            return None
+
+    def do_GET(self):
+        path = urlsplit(self.path).path
+        if path == "/health":
+            self._send_json(200, {"status": "ok", "sessions": self.service.sessions.stats()})
+        elif path == "/metrics":
+            body = PERF.to_prometheus().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        elif path == "/stats":
+            self._send_json(200, get_perf_stats())
+        else:
+            self._send_json(404, {"error": "not found"})
+
+    def do_DELETE(self):
+        path = urlsplit(self.path).path
+        if path.startswith("/sessions/"):
+            deleted = self.service.sessions.delete(unquote(path[len("/sessions/"):]))
+            self._send_json(200 if deleted else 404, {"deleted": deleted})
+        else:
+            self._send_json(404, {"error": "not found"})
+
+    def do_POST(self):
+        path = urlsplit(self.path).path
+        if path not in ("/chat", "/chat/stream"):
+            self._send_json(404, {"error": "not found"})
+            return
+        body = self._read_json()
+        if not body or not str(body.get("question", "")).strip():
+            self._send_json(400, {"error": "expected a JSON body with a non-empty 'question'"})
+            return
+        session_id = body.get("session_id") or uuid.uuid4().hex
+
+        # Take the session lock first so a queued turn of a busy session does not hold a worker
+        # slot; both waits share one queue_timeout budget
+        deadline = time.monotonic() + self.service.queue_timeout
+        if not self.service.lock_session(session_id):
+            self._send_json(503, {"error": "session busy, retry later", "session_id": session_id})
+            return
+        try:
+            if not self.service.acquire(max(0.0, deadline - time.monotonic())):
+                self._send_json(503, {"error": "server busy, retry later"})
+                return
+            try:
+                # Checked out for the whole turn so the session is not evicted mid-answer
+                with self.service.sessions.checkout(session_id) as memory:
+                    wrapper = self.service.wrapper(memory)
+                    if path == "/chat":
+                        self._answer(wrapper, session_id, body["question"])
+                    else:
+                        self._stream(wrapper, session_id, body["question"])
+            finally:
+                self.service.slots.release()
+        finally:
+            self.service.unlock_session(session_id)
+
+    def _answer(self, wrapper, session_id, question):
+        try:
+            result = wrapper.invoke({"question": question})
+        except Exception as e:
+            self._send_json(500, {"error": str(e), "session_id": session_id})
+            return
+        self._send_json(200, {"session_id": session_id, "answer": result["answer"],
+                              "sources": serialize_sources(result["source_documents"])})
+
+    def _stream(self, wrapper, session_id, question):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        # No Content-Length for a stream, so the connection ends with it
+        self.send_header("Connection", "close")
+        self.end_headers()
+        self.close_connection = True
+
+        def send(event, data):
+            self.wfile.write(f"event: {event}\ndata: {json.dumps(data)}\n\n".encode("utf-8"))
+            self.wfile.flush()
+
+        try:
+            # Closing the stream on a disconnect saves the partial turn to memory right away
+            with closing(wrapper.stream({"question": question})) as tokens:
+                for token in tokens:
+                    send("token", token)
+            send("done", {"session_id": session_id, "sources": serialize_sources(wrapper.last_source_documents)})
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+        except Exception as e:
+            send("error", {"error": str(e), "session_id": session_id})
+
+def make_server(service, host="127.0.0.1", port=8000):
+    handler = type("BoundChatRequestHandler", (ChatRequestHandler,), {"service": service})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    return server
+
+def build_service(stub=False, workers=API_WORKERS, queue_timeout=API_QUEUE_TIMEOUT, llm_latency=0.0,
+                  session_db_path=SESSION_DB_PATH):
+    """ChatService over the shared Groq chain, or over the offline stub chain (sessions kept in RAM only)."""
+    if stub:
+        from eval_stubs import build_stub_chain
+        chain, llm = build_stub_chain(llm_latency=llm_latency)
+        return ChatService(chain, llm, workers, queue_timeout, session_db_path=None)
+
+    from dotenv import load_dotenv
+    from shared_resources import get_llm, get_rag_chain, warm_up
+    from context_packer import HISTORY_TOKEN_BUDGET
+    load_dotenv(dotenv_path="/Users/kumarpersonal/Downloads/ScalerAssist/venv-scaler-assist/.env")
+    groq_api_key, model = os.getenv("GROQ_API_KEY"), os.getenv("INFER_MODEL_NAME")
+    # Load the model, index and chain before accepting traffic
+    warm_up(groq_api_key, model)
+    return ChatService(get_rag_chain(groq_api_key, model), get_llm(groq_api_key, model), workers,
+                       queue_timeout, max_history_tokens=HISTORY_TOKEN_BUDGET, session_db_path=session_db_path)
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve the assistant over HTTP")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--workers", type=int, default=API_WORKERS, help="Turns processed concurrently")
+    parser.add_argument("--queue-timeout", type=float, default=API_QUEUE_TIMEOUT)
+    parser.add_argument("--stub", action="store_true", help="Use the stub LLM and a local index")
+    parser.add_argument("--stub-llm-latency", type=float, default=0.0)
+    args = parser.parse_args()
+
+    service = build_service(args.stub, args.workers, args.queue_timeout, args.stub_llm_latency)
+    server = make_server(service, args.host, args.port)
+    print(f"Serving on http://{args.host}:{args.port} with {args.workers} workers")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        # Persist every conversation so a restart picks them up again
+        service.sessions.flush()
+
+if __name__ == "__main__":
+    main()
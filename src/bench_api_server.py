@@ -0,0 +1,102 @@
+# Load test of api_server.py in stub mode (or against a running server with --url)
+#
+#   python bench_api_server.py --requests 500 --clients 16 --workers 8 --output api.json
+#
+# Each client thread owns a few sessions and sends multi-turn conversations, so
+# both the JSON and the streaming endpoint see session history. Reports
+# requests/s overall and per CPU core plus latency percentiles, and exits non-zero
+# if any request fails or a session's streamed answer is malformed.
+
+import os
+import json
+import time
+import argparse
+import threading
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from eval_stubs import SAMPLE_QUESTIONS
+from perf_stats import latency_percentiles
+
+def post(url, payload, timeout=60):
+    request = urllib.request.Request(url, data=json.dumps(payload).encode("utf-8"),
+                                     headers={"Content-Type": "application/json"}, method="POST")
+    with urllib.request.urlopen(request, timeout=timeout) as response:
+        return response.read().decode("utf-8")
+
+def parse_sse(text):
+    """[(event, data)] from a server-sent event stream."""
+    events = []
+    for block in text.strip().split("\n\n"):
+        fields = dict(line.split(": ", 1) for line in block.split("\n") if ": " in line)
+        events.append((fields.get("event"), json.loads(fields.get("data", "null"))))
+    return events
+
+def one_request(base_url, i, sessions_per_client, stream_every):
+    session_id = f"bench-{i % sessions_per_client}"
+    question = SAMPLE_QUESTIONS[i % len(SAMPLE_QUESTIONS)]
+    payload = {"question": question, "session_id": session_id}
+    start = time.perf_counter()
+    if stream_every and i % stream_every == 0:
+        events = parse_sse(post(base_url + "/chat/stream", payload))
+        if not events or events[-1][0] != "done" or events[-1][1]["session_id"] != session_id:
+            raise AssertionError(f"Malformed stream: {events[-1:] if events else events}")
+    else:
+        reply = json.loads(post(base_url + "/chat", payload))
+        if reply["session_id"] != session_id or not reply["answer"]:
+            raise AssertionError(f"Bad reply: {reply}")
+    return time.perf_counter() - start
+
+def main():
+    parser = argparse.ArgumentParser(description="Requests/s and latency of the HTTP API")
+    parser.add_argument("--url", help="Benchmark a running server instead of starting a stub one")
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--clients", type=int, default=16)
+    parser.add_argument("--sessions", type=int, default=64)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 4)
+    parser.add_argument("--stream-every", type=int, default=4, help="Every n-th request uses the SSE endpoint, 0 for none")
+    parser.add_argument("--stub-llm-latency", type=float, default=0.0)
+    parser.add_argument("--output", help="Optional JSON file for the results")
+    args = parser.parse_args()
+
+    server = None
+    base_url = args.url
+    if base_url is None:
+        from api_server import build_service, make_server
+        server = make_server(build_service(stub=True, workers=args.workers, llm_latency=args.stub_llm_latency),
+                             port=0)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        base_url = f"http://127.0.0.1:{server.server_address[1]}"
+
+    errors = []
+    def run(i):
+        try:
+            return one_request(base_url, i, args.sessions, args.stream_every)
+        except Exception as e:
+            errors.append(e)
+            return None
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.clients) as pool:
+        latencies = [t for t in pool.map(run, range(args.requests)) if t is not None]
+    wall_time = time.perf_counter() - start
+    if server is not None:
+        server.shutdown()
+
+    result = {
+        "requests": args.requests,
+        "clients": args.clients,
+        "workers": args.workers,
+        "errors": len(errors),
+        "rps": len(latencies) / wall_time,
+        "rps_per_core": len(latencies) / wall_time / (os.cpu_count() or 1),
+        **latency_percentiles(latencies),
+    }
+    print(json.dumps(result, indent=2))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(result, f, indent=2)
+    if errors:
+        raise SystemExit(f"{len(errors)} requests failed, first: {errors[0]!r}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+# Many concurrent conversations on one event loop, against stubbed backends
+#
+#   python bench_async_conversations.py --conversations 50 --turns 3 --max-concurrency 50
+#
+# Every conversation gets its own HybridMemory over one shared chain and runs its
+# turns through HybridRAGChainWrapper.ainvoke, with at most --max-concurrency
+# turns in flight. The stub LLM and index sleep asynchronously to stand in for
+# Groq and Pinecone round trips. The run fails (non-zero exit) if any turn
+# errors or a conversation's memory does not hold exactly its own turns.
+
+import time
+import asyncio
+import argparse
+from eval_stubs import SAMPLE_QUESTIONS, build_stub_chain
+from hist_rag_chain_v2 import HybridMemory, HybridRAGChainWrapper
+
+async def run_conversation(chain, llm, conversation_id, turns, semaphore):
+    memory = HybridMemory(llm=llm, window_size=turns)
+    wrapper = HybridRAGChainWrapper(chain, memory)
+    questions = [f"{SAMPLE_QUESTIONS[(conversation_id + t) % len(SAMPLE_QUESTIONS)]} [{conversation_id}]"
+                 for t in range(turns)]
+    for question in questions:
+        async with semaphore:
+            result = await wrapper.ainvoke({"question": question})
+        if not result["answer"]:
+            raise AssertionError(f"Empty answer in conversation {conversation_id}")
+
+    asked = [m.content for m in memory.window_memory.chat_memory.messages if m.type == "human"]
+    if asked != questions:
+        raise AssertionError(f"Conversation {conversation_id} memory holds {asked}, expected {questions}")
+
+async def run_all(conversations, turns, max_concurrency, llm_latency, index_latency):
+    chain, llm = build_stub_chain(llm_latency=llm_latency, index_latency=index_latency)
+    semaphore = asyncio.Semaphore(max_concurrency)
+    start = time.perf_counter()
+    results = await asyncio.gather(
+        *(run_conversation(chain, llm, i, turns, semaphore) for i in range(conversations)),
+        return_exceptions=True,
+    )
+    return time.perf_counter() - start, [r for r in results if isinstance(r, BaseException)]
+
+def main():
+    parser = argparse.ArgumentParser(description="Run concurrent conversations through the async chain path")
+    parser.add_argument("--conversations", type=int, default=50)
+    parser.add_argument("--turns", type=int, default=3)
+    parser.add_argument("--max-concurrency", type=int, default=50)
+    parser.add_argument("--llm-latency", type=float, default=0.05, help="Simulated seconds per LLM call")
+    parser.add_argument("--index-latency", type=float, default=0.02, help="Simulated seconds per index query")
+    args = parser.parse_args()
+
+    elapsed, errors = asyncio.run(run_all(args.conversations, args.turns, args.max_concurrency,
+                                          args.llm_latency, args.index_latency))
+    total_turns = args.conversations * args.turns
+    # Turns after the first also pay for the rewrite call
+    serial = args.conversations * (args.turns * (args.llm_latency + args.index_latency)
+                                   + (args.turns - 1) * args.llm_latency)
+    print(f"{total_turns} turns in {elapsed:.2f}s ({total_turns / elapsed:.1f} turns/s), "
+          f"simulated backend time if run serially: {serial:.2f}s")
+    if errors:
+        for error in errors[:5]:
+            print(f"  {type(error).__name__}: {error}")
+        raise SystemExit(f"{len(errors)} of {args.conversations} conversations failed")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+# Throughput/latency benchmark: per-call embed_query vs. EmbeddingBatcher
+#
+#   python bench_embedding_batcher.py --requests 256 --concurrency 1 8 32
+
+import json
+import time
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+from embeddings import BGEEmbedding
+from embedding_cache import QueryEmbeddingCache
+from embedding_batcher import EmbeddingBatcher
+from eval_stubs import SAMPLE_QUESTIONS
+from perf_stats import latency_percentiles
+
+def run_load(embed_query, concurrency, total_requests):
+    """Fire `total_requests` unique queries from `concurrency` threads, return (latencies, wall time)."""
+    # Unique texts so neither path is helped by the query cache
+    texts = [f"{SAMPLE_QUESTIONS[i % len(SAMPLE_QUESTIONS)]} ({i})" for i in range(total_requests)]
+
+    def timed(text):
+        start = time.perf_counter()
+        embed_query(text)
+        return time.perf_counter() - start
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        latencies = list(pool.map(timed, texts))
+    return latencies, time.perf_counter() - start
+
+def summarize(mode, concurrency, latencies, wall_time):
+    return {
+        "mode": mode,
+        "concurrency": concurrency,
+        "requests": len(latencies),
+        "throughput_qps": len(latencies) / wall_time,
+        **latency_percentiles(latencies),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare per-call and batched query embedding")
+    parser.add_argument("--requests", type=int, default=256)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--max-batch-size", type=int, default=32)
+    parser.add_argument("--max-wait-ms", type=float, default=5.0)
+    parser.add_argument("--output", help="Optional JSON file for the results")
+    args = parser.parse_args()
+
+    model = BGEEmbedding(query_cache=QueryEmbeddingCache(maxsize=0))
+    batcher = EmbeddingBatcher(model, max_batch_size=args.max_batch_size, max_wait_ms=args.max_wait_ms)
+
+    # Warm up both paths so model initialization is not measured
+    model.embed_query("warm up")
+    batcher.embed_query("warm up")
+
+    results = []
+    for concurrency in args.concurrency:
+        for mode, embed_query in (("per_call", model.embed_query), ("batched", batcher.embed_query)):
+            latencies, wall_time = run_load(embed_query, concurrency, args.requests)
+            result = summarize(mode, concurrency, latencies, wall_time)
+            results.append(result)
+            print(f"{mode:>8} | concurrency {concurrency:>3} | {result['throughput_qps']:8.1f} q/s | "
+                  f"p50 {result['p50_ms']:7.1f} ms | p95 {result['p95_ms']:7.1f} ms")
+
+    print(f"Batcher stats: {batcher.stats()}")
+    batcher.close()
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"Results saved to {args.output}")
+
+if __name__ == "__main__":
+    main()
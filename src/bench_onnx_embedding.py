@@ -0,0 +1,79 @@
+# Parity and latency/throughput benchmark: torch vs. ONNX (float32 / int8) embedding backends
+#
+#   python bench_onnx_embedding.py --threads 1 4 --batch-size 32 --output onnx.json
+
+import json
+import time
+import argparse
+from embeddings import BGEEmbedding
+from embedding_cache import QueryEmbeddingCache
+from eval_stubs import SAMPLE_PASSAGES, SAMPLE_QUESTIONS
+from onnx_embedding import check_parity
+from perf_stats import latency_percentiles
+
+def load_texts(path=None, count=256):
+    """Benchmark passages: lines of `path` if given, otherwise the built-in samples repeated."""
+    if path:
+        with open(path, "r", encoding="utf-8") as f:
+            texts = [line.strip() for line in f if line.strip()]
+    else:
+        texts = SAMPLE_PASSAGES
+    return [texts[i % len(texts)] for i in range(count)]
+
+def make_model(backend, quantized=True, num_threads=None, batch_size=32):
+    # Disabled query cache so every embed_query hits the model
+    return BGEEmbedding(batch_size=batch_size, query_cache=QueryEmbeddingCache(maxsize=0),
+                        backend=backend, quantized=quantized, num_threads=num_threads)
+
+def bench(model, texts, queries=64):
+    """Single-query latency percentiles and batched document throughput."""
+    latencies = []
+    for i in range(queries):
+        start = time.perf_counter()
+        model.embed_query(f"{SAMPLE_QUESTIONS[i % len(SAMPLE_QUESTIONS)]} ({i})")
+        latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    model.embed_documents(texts)
+    doc_time = time.perf_counter() - start
+
+    return {
+        **latency_percentiles(latencies, prefix="query_"),
+        "docs_per_s": len(texts) / doc_time,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare torch and ONNX embedding backends")
+    parser.add_argument("--texts", help="Optional text file with one passage per line")
+    parser.add_argument("--docs", type=int, default=256)
+    parser.add_argument("--queries", type=int, default=64)
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--threads", type=int, nargs="+", default=[0], help="ONNX Runtime thread counts to try")
+    parser.add_argument("--min-cosine", type=float, default=0.99, help="Parity threshold against torch")
+    parser.add_argument("--output", help="Optional JSON file for the results")
+    args = parser.parse_args()
+
+    texts = load_texts(args.texts, args.docs)
+    torch_model = make_model("torch", batch_size=args.batch_size)
+    results = [dict(backend="torch", **bench(torch_model, texts, args.queries))]
+    print(results[-1])
+
+    failed = False
+    for quantized in (False, True):
+        for threads in args.threads:
+            model = make_model("onnx", quantized, threads, args.batch_size)
+            parity = check_parity(torch_model, model, texts[:64])
+            failed |= parity["min"] < args.min_cosine
+            results.append(dict(backend="onnx-int8" if quantized else "onnx", threads=threads,
+                                parity_min_cosine=parity["min"], parity_mean_cosine=parity["mean"],
+                                **bench(model, texts, args.queries)))
+            print(results[-1])
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+    if failed:
+        raise SystemExit(f"Parity check failed: cosine below {args.min_cosine}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+# Per-stage latency/allocation benchmark of create_rag_chain on local stubs
+#
+#   python bench_rag_stages.py --history 0 4 16 --k 3 5 10 --output stages.json
+#
+# Uses HashEmbedding, a LocalVectorIndex and StubChatModel from eval_stubs, so the
+# numbers isolate the pipeline's own overhead from model and network time. Each
+# stage is timed on its own (p50/p95/p99 over --iterations calls) and then run
+# again under tracemalloc for the peak allocation per call.
+
+import json
+import time
+import argparse
+import tracemalloc
+import numpy as np
+from langchain_core.output_parsers import StrOutputParser
+from eval_stubs import SAMPLE_PASSAGES, SAMPLE_QUESTIONS, StubChatModel, build_stub_retriever
+from perf_stats import latency_percentiles
+from hist_rag_chain_v2 import (
+    HybridMemory, create_rag_chain, contextualize_q_prompt, qa_prompt, HISTORY_TOKEN_BUDGET
+)
+
+def make_corpus(size):
+    """`size` distinct passages derived from the sample brochure sentences."""
+    return [f"{SAMPLE_PASSAGES[i % len(SAMPLE_PASSAGES)]} (section {i})" for i in range(size)]
+
+def fill_memory(memory, turns):
+    for i in range(turns):
+        memory.add_user_message(SAMPLE_QUESTIONS[i % len(SAMPLE_QUESTIONS)])
+        memory.add_ai_message(SAMPLE_PASSAGES[i % len(SAMPLE_PASSAGES)])
+    memory.wait_for_summary()
+
+def measure(func, iterations, alloc_iterations, setup=None):
+    """Latency percentiles (ms) and mean peak allocation (KiB) of calling func(), after an untimed setup()."""
+    setup = setup or (lambda: None)
+    setup()
+    func()  # warm-up
+    latencies = []
+    for _ in range(iterations):
+        setup()
+        start = time.perf_counter()
+        func()
+        latencies.append(time.perf_counter() - start)
+
+    peaks = []
+    tracemalloc.start()
+    for _ in range(alloc_iterations):
+        setup()
+        tracemalloc.reset_peak()
+        baseline = tracemalloc.get_traced_memory()[0]
+        func()
+        peaks.append(tracemalloc.get_traced_memory()[1] - baseline)
+    tracemalloc.stop()
+
+    return {
+        **latency_percentiles(latencies),
+        "alloc_peak_kib": float(np.mean(peaks)) / 1024 if peaks else None,
+    }
+
+def bench_config(retriever, llm, history_turns, k, iterations, alloc_iterations):
+    """Time every stage of one turn for a given history length and k."""
+    retriever.k = k
+    question = SAMPLE_QUESTIONS[1]
+    memory = HybridMemory(llm=llm, window_size=4, max_history_tokens=HISTORY_TOKEN_BUDGET)
+    fill_memory(memory, history_turns)
+    history = memory.get_combined_history()
+
+    rag_chain = create_rag_chain(retriever, groq_api_key=None, model=None, memory=memory, llm=llm)
+    query_vector = retriever.embed_func.embed_query(question)
+    docs = retriever.invoke(question)
+    rewrite_chain = contextualize_q_prompt | llm | StrOutputParser()
+    generate_chain = qa_prompt | llm | StrOutputParser()
+    context = "\n\n".join(doc.page_content for doc in docs)
+
+    def reset_memory():
+        # Keep the history length fixed across end-to-end iterations
+        memory.clear()
+        fill_memory(memory, history_turns)
+
+    stages = {
+        "get_combined_history": memory.get_combined_history,
+        "embed_query": lambda: retriever.embed_func.embed_query(question),
+        "index_query": lambda: retriever.index.query(vector=query_vector, top_k=k, include_metadata=True),
+        "retrieve": lambda: retriever.invoke(question),
+        "rewrite": lambda: rewrite_chain.invoke({"input": question, "chat_history": history}),
+        "generation": lambda: generate_chain.invoke({"input": question, "chat_history": history, "context": context}),
+        "end_to_end": lambda: rag_chain.invoke({"question": question}),
+    }
+    # Without history the chain skips the rewrite call, so do not report it
+    if not history:
+        del stages["rewrite"]
+
+    results = []
+    for name, func in stages.items():
+        stats = measure(func, iterations, alloc_iterations, reset_memory if name == "end_to_end" else None)
+        results.append({"stage": name, "history_turns": history_turns, "k": k, **stats})
+        print(f"history={history_turns:3d} k={k:2d} {name:22s} p50={stats['p50_ms']:8.3f} ms "
+              f"p95={stats['p95_ms']:8.3f} ms p99={stats['p99_ms']:8.3f} ms "
+              f"peak={stats['alloc_peak_kib']:8.1f} KiB")
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description="Per-stage latency and allocation benchmark of the RAG chain")
+    parser.add_argument("--history", type=int, nargs="+", default=[0, 4, 16], help="Conversation turns before the question")
+    parser.add_argument("--k", type=int, nargs="+", default=[3, 5, 10])
+    parser.add_argument("--corpus-size", type=int, default=2000)
+    parser.add_argument("--iterations", type=int, default=200)
+    parser.add_argument("--alloc-iterations", type=int, default=20)
+    parser.add_argument("--output", help="Optional JSON file for the results")
+    args = parser.parse_args()
+
+    llm = StubChatModel()
+    retriever = build_stub_retriever(make_corpus(args.corpus_size), k=max(args.k))
+
+    results = []
+    for history_turns in args.history:
+        for k in args.k:
+            results.extend(bench_config(retriever, llm, history_turns, k, args.iterations, args.alloc_iterations))
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"corpus_size": args.corpus_size, "iterations": args.iterations, "results": results}, f, indent=2)
+
+if __name__ == "__main__":
+    main()
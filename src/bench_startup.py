@@ -0,0 +1,83 @@
+# Startup benchmark: import cost of the app modules and cold vs. warm first query
+#
+#   python bench_startup.py --top 15 --output startup.json
+
+import sys
+import json
+import time
+import argparse
+import subprocess
+
+APP_MODULES = ["shared_resources", "hist_rag_chain_v2", "hist_retriever", "embeddings", "retriever"]
+
+def measure_imports(modules=APP_MODULES, top=15):
+    """
+    Import the modules in a fresh interpreter with -X importtime.
+
+    Returns the wall time of the import and the `top` most expensive modules by
+    cumulative import time.
+    """
+    code = f"import {', '.join(modules)}"
+    start = time.perf_counter()
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", code],
+                            capture_output=True, text=True)
+    wall_time = time.perf_counter() - start
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1])
+
+    entries = []
+    for line in result.stderr.splitlines():
+        # import time: self [us] | cumulative | imported package
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        entries.append({"module": name[1:], "self_ms": int(self_us) / 1000,
+                        "cumulative_ms": int(cumulative_us) / 1000})
+
+    # Top-level imports are the ones not indented under another import
+    total_ms = sum(e["cumulative_ms"] for e in entries if not e["module"].startswith(" "))
+    slowest = sorted(entries, key=lambda e: e["cumulative_ms"], reverse=True)[:top]
+    slowest = [dict(entry, module=entry["module"].strip()) for entry in slowest]
+    return {"wall_s": wall_time, "import_total_ms": total_ms, "slowest": slowest}
+
+def measure_first_query(queries=3):
+    """Time warm_up (model load + first embedding) and a few steady-state query embeddings."""
+    from shared_resources import warm_up, get_embedding_model
+
+    start = time.perf_counter()
+    warm_up()
+    first_s = time.perf_counter() - start
+
+    model = get_embedding_model()
+    steady = []
+    for i in range(queries):
+        start = time.perf_counter()
+        model.embed_query(f"What courses does Scaler offer? ({time.time()}-{i})")
+        steady.append(time.perf_counter() - start)
+    return {"first_request_s": first_s, "steady_state_ms": 1000 * sum(steady) / len(steady)}
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure import time and cold vs. warm first query")
+    parser.add_argument("--top", type=int, default=15, help="Number of slowest imports to report")
+    parser.add_argument("--skip-query", action="store_true", help="Only measure imports")
+    parser.add_argument("--output", help="Optional JSON file for the results")
+    args = parser.parse_args()
+
+    report = {"imports": measure_imports(top=args.top)}
+    imports = report["imports"]
+    print(f"Importing {', '.join(APP_MODULES)}: {imports['import_total_ms']:.0f} ms "
+          f"({imports['wall_s']:.2f}s including interpreter start)")
+    for entry in imports["slowest"]:
+        print(f"  {entry['cumulative_ms']:9.1f} ms  {entry['module']}")
+
+    if not args.skip_query:
+        report["query"] = measure_first_query()
+        print(f"First request (warm-up): {report['query']['first_request_s']:.2f}s, "
+              f"steady-state query embedding: {report['query']['steady_state_ms']:.1f} ms")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+import os
+import re
+import json
+from collections import Counter
+import numpy as np
+
+BM25_INDEX_DIR = os.getenv("BM25_INDEX_DIR", "/Users/kumarpersonal/Downloads/ScalerAssist/Context/bm25_index")
+
+ARRAYS_FILE = "bm25.npz"
+META_FILE = "bm25.json"
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+def tokenize(text):
+    return _TOKEN_RE.findall(text.lower())
+
+class BM25Index:
+    """
+    Okapi BM25 over an inverted index with array-backed postings.
+
+    Postings for term t are doc_ids[offsets[t]:offsets[t+1]] with matching term
+    frequencies in tfs, so the whole index is four NumPy arrays plus the
+    vocabulary and chunk texts, and loads without rebuilding anything.
+    """
+
+    def __init__(self, ids, texts, terms, offsets, doc_ids, tfs, doc_lens, k1=1.5, b=0.75):
+        self.ids = ids
+        self.texts = texts
+        self.terms = terms
+        self.vocab = {term: i for i, term in enumerate(terms)}
+        self.offsets = offsets
+        self.doc_ids = doc_ids
+        self.tfs = tfs
+        self.doc_lens = doc_lens
+        self.k1 = k1
+        self.b = b
+
+        n_docs = len(ids)
+        doc_freqs = np.diff(offsets).astype(np.float32)
+        self.idf = np.log(1.0 + (n_docs - doc_freqs + 0.5) / (doc_freqs + 0.5)).astype(np.float32)
+        avg_len = float(doc_lens.mean()) if n_docs else 1.0
+        # Per-document part of the BM25 denominator, precomputed once
+        self._len_norm = (k1 * (1.0 - b + b * doc_lens / max(avg_len, 1e-9))).astype(np.float32)
+
+    @classmethod
+    def from_texts(cls, texts, ids, k1=1.5, b=0.75):
+        """Build the index from chunk texts and their vector ids."""
+        postings = {}
+        doc_lens = np.zeros(len(texts), dtype=np.float32)
+        for doc, text in enumerate(texts):
+            tokens = tokenize(text)
+            doc_lens[doc] = len(tokens)
+            for term, tf in Counter(tokens).items():
+                postings.setdefault(term, []).append((doc, tf))
+
+        terms = sorted(postings)
+        offsets = np.zeros(len(terms) + 1, dtype=np.int64)
+        for i, term in enumerate(terms):
+            offsets[i + 1] = offsets[i] + len(postings[term])
+        doc_ids = np.empty(offsets[-1], dtype=np.int32)
+        tfs = np.empty(offsets[-1], dtype=np.uint16)
+        for i, term in enumerate(terms):
+            docs, freqs = zip(*postings[term])
+            doc_ids[offsets[i]:offsets[i + 1]] = docs
+            tfs[offsets[i]:offsets[i + 1]] = np.minimum(freqs, np.iinfo(np.uint16).max)
+
+        return cls(list(ids), list(texts), terms, offsets, doc_ids, tfs, doc_lens, k1, b)
+
+    def save(self, index_dir=BM25_INDEX_DIR):
+        os.makedirs(index_dir, exist_ok=True)
+        np.savez(
+            os.path.join(index_dir, ARRAYS_FILE),
+            offsets=self.offsets, doc_ids=self.doc_ids, tfs=self.tfs, doc_lens=self.doc_lens,
+        )
+        with open(os.path.join(index_dir, META_FILE), "w", encoding="utf-8") as f:
+            json.dump({"k1": self.k1, "b": self.b, "ids": self.ids, "texts": self.texts, "terms": self.terms}, f)
+
+    @classmethod
+    def load(cls, index_dir=BM25_INDEX_DIR):
+        with open(os.path.join(index_dir, META_FILE), "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        arrays = np.load(os.path.join(index_dir, ARRAYS_FILE))
+        return cls(
+            meta["ids"], meta["texts"], meta["terms"],
+            arrays["offsets"], arrays["doc_ids"], arrays["tfs"], arrays["doc_lens"],
+            meta["k1"], meta["b"],
+        )
+
+    def search(self, query, top_k=10):
+        """Return up to top_k (id, text, score) tuples, best first."""
+        scores = np.zeros(len(self.ids), dtype=np.float32)
+        for term in set(tokenize(query)):
+            t = self.vocab.get(term)
+            if t is None:
+                continue
+            start, end = self.offsets[t], self.offsets[t + 1]
+            docs = self.doc_ids[start:end]
+            tf = self.tfs[start:end].astype(np.float32)
+            # A term occurs once per document in its postings, so fancy-index += is safe
+            scores[docs] += self.idf[t] * tf * (self.k1 + 1.0) / (tf + self._len_norm[docs])
+
+        candidates = np.flatnonzero(scores)
+        if len(candidates) > top_k:
+            candidates = candidates[np.argpartition(-scores[candidates], top_k - 1)[:top_k]]
+        candidates = candidates[np.argsort(-scores[candidates], kind="stable")]
+        return [(self.ids[i], self.texts[i], float(scores[i])) for i in candidates]
+
+def reciprocal_rank_fusion(rankings, k=60):
+    """
+    Fuse several ranked id lists: score(id) = sum over lists of 1 / (k + rank).
+
+    Returns (id, score) pairs, best first.
+    """
+    scores = {}
+    for ranking in rankings:
+        for rank, doc_id in enumerate(ranking, start=1):
+            scores[doc_id] = scores.get(doc_id, 0.0) + 1.0 / (k + rank)
+    return sorted(scores.items(), key=lambda item: item[1], reverse=True)
+
+def build_bm25_index(texts, ids, index_dir=BM25_INDEX_DIR):
+    """Build and persist the BM25 index for the given chunks."""
+    index = BM25Index.from_texts(texts, ids)
+    index.save(index_dir)
+    print(f"BM25 index with {len(ids)} chunks and {len(index.terms)} terms saved to {index_dir}")
+    return index
@@ -0,0 +1,91 @@
+# Calibrate the SemanticAnswerCache threshold for the embedding model
+#
+#   python calibrate_answer_cache.py                   (BGEEmbedding, needs the model weights)
+#   python calibrate_answer_cache.py --stub            (HashEmbedding, checks the script offline)
+#
+# Scores paraphrase pairs (must share an answer) and near-miss pairs (same
+# wording, different program or attribute, must not) taken from the brochure
+# topics. Prints the score ranges, a threshold just above the highest near-miss
+# that the entity guard does not catch, and how many paraphrases still hit.
+
+import json
+import argparse
+import numpy as np
+from answer_cache import extract_entities
+
+PARAPHRASES = [
+    ("What is the fee for the DSML program?", "How much does the DSML program cost?"),
+    ("How long is the DevOps course?", "What is the duration of the DevOps program?"),
+    ("What are the admission requirements?", "How do I get admitted to Scaler?"),
+    ("Does Scaler provide placement support?", "Will Scaler help me get a job?"),
+    ("Can I pay the fee in EMIs?", "Is there an EMI option for the fee?"),
+    ("What is the Scaler School of Technology?", "Tell me about Scaler School of Technology"),
+    ("Are the classes live or recorded?", "Are lectures held live?"),
+    ("What is NSET?", "What is the Scaler entrance test NSET?"),
+    ("Who are the instructors?", "Who teaches the courses at Scaler?"),
+    ("What is the average CTC after the program?", "What average salary do graduates get?"),
+]
+
+NEAR_MISSES = [
+    ("What is the fee for the DSML program?", "What is the fee for the DevOps program?"),
+    ("How long is the DSML course?", "How long is the AIML course?"),
+    ("What is the fee for the masters program?", "What is the fee for the bachelors program?"),
+    ("What is the fee for the DSML program?", "How long is the DSML program?"),
+    ("What is the eligibility for the DevOps program?", "What is the curriculum of the DevOps program?"),
+    ("What is the fee for the 2024 batch?", "What is the fee for the 2025 batch?"),
+    ("Does the AIML program cover NLP?", "Does the AIML program cover computer vision?"),
+    ("What is the Scaler School of Technology?", "What is the Scaler School of Business?"),
+    ("Is there a refund policy?", "Is there a scholarship policy?"),
+    ("What are the placement statistics for DSML?", "What are the placement statistics for DSA?"),
+]
+
+def pair_scores(embed_func, pairs):
+    left = np.asarray(embed_func.embed_queries([a for a, _ in pairs]), dtype=np.float32)
+    right = np.asarray(embed_func.embed_queries([b for _, b in pairs]), dtype=np.float32)
+    return (left * right).sum(axis=1)
+
+def calibrate(embed_func, margin=0.005):
+    paraphrase_scores = pair_scores(embed_func, PARAPHRASES)
+    near_miss_scores = pair_scores(embed_func, NEAR_MISSES)
+    guarded = [extract_entities(a) != extract_entities(b) for a, b in NEAR_MISSES]
+    paraphrase_guarded = [extract_entities(a) != extract_entities(b) for a, b in PARAPHRASES]
+
+    # Only near misses the entity guard lets through have to stay below the threshold
+    unguarded = [s for s, g in zip(near_miss_scores, guarded) if not g]
+    threshold = float(max(unguarded) + margin) if unguarded else float(min(paraphrase_scores))
+    hits = [s >= threshold and not g for s, g in zip(paraphrase_scores, paraphrase_guarded)]
+    return {
+        "paraphrase": {"min": float(paraphrase_scores.min()), "mean": float(paraphrase_scores.mean())},
+        "near_miss": {"max": float(near_miss_scores.max()), "mean": float(near_miss_scores.mean())},
+        "near_misses_blocked_by_entities": int(sum(guarded)),
+        "paraphrases_blocked_by_entities": int(sum(paraphrase_guarded)),
+        "recommended_threshold": threshold,
+        "paraphrase_hit_rate": sum(hits) / len(hits),
+        "pairs": {
+            "paraphrase": [{"pair": p, "score": float(s)} for p, s in zip(PARAPHRASES, paraphrase_scores)],
+            "near_miss": [{"pair": p, "score": float(s), "blocked": g}
+                          for p, s, g in zip(NEAR_MISSES, near_miss_scores, guarded)],
+        },
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Pick the answer cache similarity threshold")
+    parser.add_argument("--stub", action="store_true", help="Use HashEmbedding instead of the BGE model")
+    parser.add_argument("--verbose", action="store_true", help="Print every pair's score")
+    args = parser.parse_args()
+
+    if args.stub:
+        from eval_stubs import HashEmbedding
+        embed_func = HashEmbedding()
+    else:
+        from embeddings import BGEEmbedding
+        from embedding_cache import QueryEmbeddingCache
+        embed_func = BGEEmbedding(query_cache=QueryEmbeddingCache(maxsize=0))
+
+    result = calibrate(embed_func)
+    if not args.verbose:
+        result.pop("pairs")
+    print(json.dumps(result, indent=2))
+
+if __name__ == "__main__":
+    main()
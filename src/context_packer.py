@@ -0,0 +1,79 @@
+from typing import Callable, List, Optional
+from langchain_core.documents import Document
+
+def split_token_budget(total_tokens: int, history_share: float = 0.35):
+    """Split a prompt budget into (context tokens, history tokens)."""
+    history_tokens = int(total_tokens * history_share)
+    return total_tokens - history_tokens, history_tokens
+
+# Token budget for retrieved context + chat history, split between the two
+PROMPT_TOKEN_BUDGET = 4000
+CONTEXT_TOKEN_BUDGET, HISTORY_TOKEN_BUDGET = split_token_budget(PROMPT_TOKEN_BUDGET)
+
+MIN_RELATIVE_SCORE = 0.85
+MAX_SCORE_GAP = 0.08
+
+class ContextPacker:
+    """
+    Trims retrieved documents before they are stuffed into the QA prompt.
+
+    Documents carry the similarity `score` from the vector index in their
+    metadata. Those scoring below `min_relative_score` times the best score, or
+    below a drop of more than `max_score_gap` between consecutive scores, are
+    discarded. The rest are added in retrieval order until `max_tokens` is
+    used up. Documents without a score (e.g. BM25-only hits) are never cut by
+    score, only by budget.
+    """
+
+    def __init__(self, token_counter: Callable[[str], int], max_tokens: int = CONTEXT_TOKEN_BUDGET,
+                 min_relative_score: float = MIN_RELATIVE_SCORE, max_score_gap: Optional[float] = MAX_SCORE_GAP,
+                 min_docs: int = 1):
+        """
+        Args:
+            token_counter: Function counting tokens in a string, e.g. llm.get_num_tokens
+            max_tokens: Token budget for the packed context
+            min_relative_score: Drop documents scoring below this fraction of the best score
+            max_score_gap: Drop everything below the first score drop larger than this, None to disable
+            min_docs: Always keep at least this many of the top documents
+        """
+        self.token_counter = token_counter
+        self.max_tokens = max_tokens
+        self.min_relative_score = min_relative_score
+        self.max_score_gap = max_score_gap
+        self.min_docs = min_docs
+
+    def score_cutoff(self, scores: List[float]) -> float:
+        """Lowest score that is still kept."""
+        scores = sorted(scores, reverse=True)
+        cutoff = scores[0] * self.min_relative_score
+        if self.max_score_gap is not None:
+            for previous, current in zip(scores, scores[1:]):
+                if previous - current > self.max_score_gap:
+                    cutoff = max(cutoff, previous)
+                    break
+        return cutoff
+
+    def filter_by_score(self, docs: List[Document]) -> List[Document]:
+        scores = [doc.metadata.get("score") for doc in docs]
+        known = [s for s in scores if s is not None]
+        if not known:
+            return docs
+        cutoff = self.score_cutoff(known)
+        kept = [doc for doc, score in zip(docs, scores) if score is None or score >= cutoff]
+        return kept if len(kept) >= self.min_docs else docs[:self.min_docs]
+
+    def fit_budget(self, docs: List[Document]) -> List[Document]:
+        """Greedily add documents in order, skipping any that would overflow the budget."""
+        packed, used = [], 0
+        for doc in docs:
+            tokens = self.token_counter(doc.page_content)
+            if used + tokens <= self.max_tokens:
+                packed.append(doc)
+                used += tokens
+        # Never send an empty context just because the top document is large
+        if not packed and docs:
+            packed = docs[:1]
+        return packed
+
+    def __call__(self, docs: List[Document]) -> List[Document]:
+        return self.fit_budget(self.filter_by_score(docs))
@@ -0,0 +1,128 @@
+import re
+import hashlib
+import numpy as np
+
+SHINGLE_SIZE = 5
+NUM_PERM = 128
+NUM_BANDS = 32
+DUPLICATE_THRESHOLD = 0.8
+# Brochures share templates whose chunks differ only in a program name or fee,
+# so chunks of different sources must be near-identical to be merged
+CROSS_SOURCE_THRESHOLD = 0.95
+
+_MERSENNE_PRIME = (1 << 61) - 1
+_MAX_HASH = (1 << 32) - 1
+
+def shingles(text, size=SHINGLE_SIZE):
+    """Lower-cased word n-grams of a text."""
+    words = re.findall(r"\w+", text.lower())
+    if len(words) <= size:
+        return {" ".join(words)} if words else set()
+    return {" ".join(words[i:i + size]) for i in range(len(words) - size + 1)}
+
+class MinHasher:
+    """MinHash signatures with `num_perm` universal-hash permutations."""
+
+    def __init__(self, num_perm=NUM_PERM, seed=1):
+        rng = np.random.default_rng(seed)
+        self.num_perm = num_perm
+        self.a = rng.integers(1, _MERSENNE_PRIME, size=num_perm, dtype=np.uint64)
+        self.b = rng.integers(0, _MERSENNE_PRIME, size=num_perm, dtype=np.uint64)
+
+    def signature(self, text):
+        """Signature of the text's shingle set, or None for texts shorter than one shingle."""
+        grams = shingles(text)
+        if not grams or len(next(iter(grams)).split()) < SHINGLE_SIZE:
+            # Headings and fragments are too short to judge, never treat them as duplicates
+            return None
+        hashes = np.fromiter(
+            (int.from_bytes(hashlib.blake2b(g.encode("utf-8"), digest_size=4).digest(), "little") for g in grams),
+            dtype=np.uint64, count=len(grams),
+        )
+        # uint64 products wrap around, which is fine for hashing purposes
+        permuted = (np.outer(hashes, self.a) + self.b) % _MERSENNE_PRIME & _MAX_HASH
+        return permuted.min(axis=0)
+
+def match_near_duplicates(texts, threshold=DUPLICATE_THRESHOLD, groups=None,
+                          cross_group_threshold=CROSS_SOURCE_THRESHOLD, keep_first=0,
+                          num_perm=NUM_PERM, bands=NUM_BANDS):
+    """
+    Map each near-duplicate text to the index of the earlier text it duplicates.
+
+    Candidates come from LSH banding of MinHash signatures and are confirmed
+    when the estimated Jaccard similarity of their shingles is >= threshold, or
+    >= cross_group_threshold when `groups` (e.g. source names) differ. The first
+    occurrence of every group of duplicates is kept, and the first `keep_first`
+    texts are always kept (e.g. chunks already in the index).
+
+    Returns {duplicate index: kept index}.
+    """
+    hasher = MinHasher(num_perm)
+    rows = num_perm // bands
+    buckets = {}
+    kept_signatures = {}
+    matches = {}
+
+    for i, text in enumerate(texts):
+        signature = hasher.signature(text)
+        if signature is None:
+            continue
+        keys = [(band, signature[band * rows:(band + 1) * rows].tobytes()) for band in range(bands)]
+
+        if i >= keep_first:
+            best, best_similarity = None, 0.0
+            for j in {j for key in keys for j in buckets.get(key, ())}:
+                similarity = np.mean(kept_signatures[j] == signature)
+                same_group = groups is None or groups[i] == groups[j]
+                if similarity >= (threshold if same_group else cross_group_threshold) and similarity > best_similarity:
+                    best, best_similarity = j, similarity
+            if best is not None:
+                matches[i] = best
+                continue
+
+        kept_signatures[i] = signature
+        for key in keys:
+            buckets.setdefault(key, []).append(i)
+    return matches
+
+def find_near_duplicates(texts, threshold=DUPLICATE_THRESHOLD, num_perm=NUM_PERM, bands=NUM_BANDS):
+    """Indices of texts that are near-duplicates of an earlier text (see match_near_duplicates)."""
+    return sorted(match_near_duplicates(texts, threshold, num_perm=num_perm, bands=bands))
+
+def dedup_documents(documents, threshold=DUPLICATE_THRESHOLD, cross_source_threshold=CROSS_SOURCE_THRESHOLD):
+    """
+    Drop near-duplicate chunk documents. Chunks of different `source`s only count
+    as duplicates when they are near-identical (cross_source_threshold).
+
+    Returns (kept documents, stats) where stats has the number of input,
+    dropped and kept chunks and the number of characters dropped.
+    """
+    groups = [doc.metadata.get("source") for doc in documents]
+    duplicates = set(match_near_duplicates([doc.page_content for doc in documents], threshold, groups,
+                                           cross_source_threshold))
+    kept = [doc for i, doc in enumerate(documents) if i not in duplicates]
+    stats = {
+        "input": len(documents),
+        "dropped": len(duplicates),
+        "kept": len(kept),
+        "dropped_chars": sum(len(documents[i].page_content) for i in duplicates),
+    }
+    return kept, stats
+
+def dedup_paragraphs(text, threshold=DUPLICATE_THRESHOLD):
+    """
+    Collapse near-duplicate paragraphs (blank-line separated blocks) of a raw text,
+    e.g. the pdfplumber and OCR renderings of the same page.
+
+    Returns (text, stats) like dedup_documents.
+    """
+    paragraphs = re.split(r"\n\s*\n", text)
+    duplicates = set(find_near_duplicates(paragraphs, threshold))
+    kept = [p for i, p in enumerate(paragraphs) if i not in duplicates]
+    stats = {
+        "input": len(paragraphs),
+        "dropped": len(duplicates),
+        "kept": len(kept),
+        "dropped_chars": sum(len(paragraphs[i]) for i in duplicates),
+    }
+    return "\n\n".join(kept), stats
@@ -0,0 +1,98 @@
+import time
+import queue
+import asyncio
+import threading
+from concurrent.futures import Future
+
+class EmbeddingBatcher:
+    """
+    Coalesces concurrent embed_query calls into batched model calls.
+
+    Callers enqueue their query and get a Future back. A single worker thread
+    flushes the queue as one `embed_queries` call once `max_batch_size` queries
+    are waiting or `max_wait_ms` has passed since the first one arrived, so
+    concurrent sessions share one encode instead of competing for torch threads.
+    Every other attribute is delegated to the wrapped embedding model, so the
+    batcher can be used wherever a BGEEmbedding is expected.
+    """
+
+    def __init__(self, embed_func, max_batch_size=32, max_wait_ms=5.0):
+        """
+        Args:
+            embed_func: Embedding model exposing embed_queries
+            max_batch_size: Flush as soon as this many queries are waiting
+            max_wait_ms: Longest time the first query of a batch waits for company
+        """
+        self.embed_func = embed_func
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self.batches = 0
+        self.requests = 0
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name="embedding-batcher", daemon=True)
+        self._thread.start()
+
+    def __getattr__(self, name):
+        return getattr(self.embed_func, name)
+
+    def submit(self, text):
+        """Queue a query, the returned Future resolves to its embedding."""
+        future = Future()
+        self._queue.put((text, future))
+        return future
+
+    def embed_query(self, text):
+        return self.submit(text).result()
+
+    async def aembed_query(self, text):
+        """Await the batched embedding without parking an executor thread on the Future."""
+        return await asyncio.wrap_future(self.submit(text))
+
+    def embed_queries(self, texts):
+        return [future.result() for future in [self.submit(t) for t in texts]]
+
+    def _run(self):
+        stopping = False
+        while not stopping:
+            item = self._queue.get()
+            if item is None:
+                return
+            batch = [item]
+            deadline = time.monotonic() + self.max_wait
+            while len(batch) < self.max_batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if item is None:
+                    stopping = True
+                    break
+                batch.append(item)
+            self._flush(batch)
+
+    def _flush(self, batch):
+        self.batches += 1
+        self.requests += len(batch)
+        try:
+            vectors = self.embed_func.embed_queries([text for text, _ in batch])
+        except Exception as e:
+            for _, future in batch:
+                future.set_exception(e)
+            return
+        for (_, future), vector in zip(batch, vectors):
+            future.set_result(vector)
+
+    def close(self):
+        """Flush what is queued and stop the worker thread."""
+        self._queue.put(None)
+        self._thread.join()
+
+    def stats(self):
+        return {
+            "requests": self.requests,
+            "batches": self.batches,
+            "mean_batch_size": self.requests / self.batches if self.batches else 0.0,
+        }
@@ -0,0 +1,138 @@
+import re
+import time
+import sqlite3
+import threading
+from collections import OrderedDict
+import numpy as np
+from sqlite_lru import trim_lru
+
+def normalize_query(text):
+    """Cache key for a query: only whitespace runs are collapsed, the model is cased and sees punctuation."""
+    return re.sub(r"\s+", " ", text).strip()
+
+class QueryEmbeddingCache:
+    """
+    Bounded LRU cache of query embeddings with an optional SQLite tier.
+
+    The in-memory tier is per process. When `db_path` is given, vectors are also
+    written to a SQLite file (WAL mode) so other processes and restarts can reuse
+    them; a disk hit is promoted into the in-memory tier. The SQLite tier keeps
+    at most `max_rows` vectors, evicting the least recently written or read from disk.
+    """
+
+    def __init__(self, maxsize=1024, db_path=None, namespace="default", max_rows=100_000):
+        """
+        Args:
+            maxsize: Maximum number of vectors kept in memory, 0 disables the memory tier
+            db_path: Optional SQLite file for the persistent tier
+            namespace: Prefix for keys, use the model name so models never share vectors
+            max_rows: Maximum number of vectors kept in the SQLite tier
+        """
+        self.maxsize = maxsize
+        self.namespace = namespace
+        self.max_rows = max_rows
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.disk_hits = 0
+        self.evictions = 0
+
+        self._db = None
+        self._rows = 0
+        if db_path:
+            self._db = sqlite3.connect(db_path, check_same_thread=False, timeout=30)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            columns = [row[1] for row in self._db.execute("PRAGMA table_info(query_embeddings)")]
+            if columns and "last_used" not in columns:
+                # Older files were keyed on lower-cased text, so their vectors cannot be reused
+                self._db.execute("DROP TABLE query_embeddings")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS query_embeddings "
+                "(key TEXT PRIMARY KEY, vector BLOB NOT NULL, last_used REAL NOT NULL)"
+            )
+            self._db.execute("CREATE INDEX IF NOT EXISTS query_embeddings_last_used ON query_embeddings (last_used)")
+            self._db.commit()
+            self._rows = self._db.execute("SELECT COUNT(*) FROM query_embeddings").fetchone()[0]
+
+    def _key(self, text):
+        return f"{self.namespace}\x00{normalize_query(text)}"
+
+    def _remember(self, key, vector):
+        if self.maxsize <= 0:
+            return
+        self._entries[key] = vector
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def get(self, text):
+        """Return the cached vector for `text` as a read-only float32 array, or None."""
+        key = self._key(text)
+        with self._lock:
+            vector = self._entries.get(key)
+            if vector is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return vector
+
+            if self._db is not None:
+                row = self._db.execute(
+                    "SELECT vector FROM query_embeddings WHERE key = ?", (key,)
+                ).fetchone()
+                if row is not None:
+                    self._db.execute("UPDATE query_embeddings SET last_used = ? WHERE key = ?", (time.time(), key))
+                    self._db.commit()
+                    vector = np.frombuffer(row[0], dtype=np.float32)
+                    self._remember(key, vector)
+                    self.hits += 1
+                    self.disk_hits += 1
+                    return vector
+
+            self.misses += 1
+            return None
+
+    def put(self, text, vector):
+        key = self._key(text)
+        vector = np.array(vector, dtype=np.float32)
+        vector.setflags(write=False)
+        with self._lock:
+            self._remember(key, vector)
+            if self._db is not None:
+                inserted = self._db.execute(
+                    "INSERT OR IGNORE INTO query_embeddings (key, vector, last_used) VALUES (?, ?, ?)",
+                    (key, vector.tobytes(), time.time()),
+                ).rowcount
+                if not inserted:
+                    self._db.execute(
+                        "UPDATE query_embeddings SET vector = ?, last_used = ? WHERE key = ?",
+                        (vector.tobytes(), time.time(), key),
+                    )
+                self._rows += inserted
+                if self._rows > self.max_rows:
+                    self._evict()
+                self._db.commit()
+
+    def _evict(self):
+        self._rows, removed = trim_lru(self._db, "query_embeddings", self.max_rows)
+        self.evictions += removed
+
+    def clear(self):
+        """Empty the in-memory tier and reset counters, the SQLite tier is left alone."""
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.misses = self.disk_hits = 0
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "disk_hits": self.disk_hits,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "size": len(self._entries),
+                "maxsize": self.maxsize,
+                "disk_rows": self._rows,
+                "evictions": self.evictions,
+            }
@@ -1,19 +1,111 @@
+import os
+import asyncio
 import numpy as np
-from FlagEmbedding import BGEM3FlagModel
+from embedding_cache import QueryEmbeddingCache
+
+MODEL_NAME = 'BAAI/bge-base-en'
+
+QUERY_CACHE_SIZE = int(os.getenv("QUERY_CACHE_SIZE", "1024"))
+# Optional SQLite file, shared by every process that points at it
+QUERY_CACHE_PATH = os.getenv("QUERY_CACHE_PATH")
+QUERY_CACHE_MAX_ROWS = int(os.getenv("QUERY_CACHE_MAX_ROWS", "100000"))
+# "torch" runs BGEM3FlagModel, "onnx" runs the int8-quantized ONNX export on CPU
+EMBED_BACKEND = os.getenv("EMBED_BACKEND", "torch")
+
+def _normalize(vecs):
+    norms = np.linalg.norm(vecs, axis=-1, keepdims=True)
+    return vecs / np.maximum(norms, 1e-12)
 
 class BGEEmbedding:
-    def __init__(self):
-        self.model = BGEM3FlagModel('BAAI/bge-base-en', use_fp16=False)
+    def __init__(self, use_fp16=False, batch_size=32, query_cache=None, backend=None, num_threads=None,
+                 quantized=True, onnx_model_dir=None):
+        """
+        Args:
+            use_fp16: Run the model in half precision (only pays off where the device supports it)
+            batch_size: Number of texts encoded per model call in the batched paths
+            query_cache: QueryEmbeddingCache for embed_query, defaults to one sized by QUERY_CACHE_SIZE
+            backend: "torch" or "onnx", defaults to EMBED_BACKEND
+            num_threads: ONNX Runtime thread count, defaults to ONNX_NUM_THREADS
+            quantized: Use the int8-quantized ONNX model (onnx backend only)
+            onnx_model_dir: Folder of the exported ONNX model, defaults to ONNX_MODEL_DIR (onnx backend only)
+        """
+        self.backend = backend or EMBED_BACKEND
+        if self.backend == "onnx":
+            from onnx_embedding import OnnxEncoder, ONNX_MODEL_DIR, ONNX_NUM_THREADS
+            if num_threads is None:
+                num_threads = ONNX_NUM_THREADS
+            self.model = OnnxEncoder(MODEL_NAME, model_dir=onnx_model_dir or ONNX_MODEL_DIR, quantized=quantized,
+                                     num_threads=num_threads)
+        elif self.backend == "torch":
+            # FlagEmbedding pulls in torch, import it only when a model is actually built
+            from FlagEmbedding import BGEM3FlagModel
+            self.model = BGEM3FlagModel(MODEL_NAME, use_fp16=use_fp16)
+        else:
+            raise ValueError(f"Unknown embedding backend: {self.backend}")
+        self.batch_size = batch_size
+        if query_cache is None:
+            # Backends produce slightly different vectors, so they do not share cache entries
+            namespace = MODEL_NAME
+            if self.backend == "onnx":
+                namespace = f"{MODEL_NAME}:onnx-int8" if quantized else f"{MODEL_NAME}:onnx"
+            query_cache = QueryEmbeddingCache(QUERY_CACHE_SIZE, QUERY_CACHE_PATH, namespace=namespace,
+                                             max_rows=QUERY_CACHE_MAX_ROWS)
+        self.query_cache = query_cache
+
+    def _encode(self, texts):
+        if self.backend == "onnx":
+            return self.model.encode(texts)
+        output = self.model.encode(texts, batch_size=len(texts))
+        return np.asarray(output["dense_vecs"], dtype=np.float32)
+
+    def iter_embed_documents(self, texts, batch_size=None, sort_by_length=True):
+        """
+        Encode documents batch by batch instead of all at once.
+
+        Yields (positions, vectors) pairs where `positions` are the indices of the
+        batch in `texts` and `vectors` is a normalized float32 array of shape
+        (len(positions), dim). Only one batch is held in memory at a time.
+        With sort_by_length, similar-length texts are batched together to cut
+        padding waste, so batches come out of input order.
+        """
+        batch_size = batch_size or self.batch_size
+        order = np.arange(len(texts))
+        if sort_by_length:
+            order = np.argsort([len(t) for t in texts], kind="stable")
+
+        for start in range(0, len(order), batch_size):
+            positions = order[start:start + batch_size]
+            batch = ["passage: " + texts[i] for i in positions]
+            yield positions, _normalize(self._encode(batch))
 
     def embed_documents(self, texts):
-        texts = ["passage: " + t for t in texts]
-        output = self.model.encode(texts)
-        dense_vecs = output["dense_vecs"]
-        dense_vecs = dense_vecs / np.linalg.norm(dense_vecs, axis=1, keepdims=True)
+        dense_vecs = None
+        for positions, vecs in self.iter_embed_documents(texts):
+            if dense_vecs is None:
+                dense_vecs = np.empty((len(texts), vecs.shape[1]), dtype=np.float32)
+            dense_vecs[positions] = vecs
+        if dense_vecs is None:
+            return []
         return dense_vecs.tolist()
 
+    def embed_queries(self, texts):
+        """Embed several queries with a single model call; cached queries are not re-encoded."""
+        vectors = [self.query_cache.get(t) for t in texts]
+        missing = [i for i, vec in enumerate(vectors) if vec is None]
+        if missing:
+            encoded = _normalize(self._encode(["query: " + texts[i] for i in missing]))
+            for i, vec in zip(missing, encoded):
+                self.query_cache.put(texts[i], vec)
+                vectors[i] = vec
+        return [vec.tolist() for vec in vectors]
+
+    def warm_up(self):
+        """Encode one dummy query to load weights and kernels, bypassing the query cache."""
+        self._encode(["query: warm up"])
+
     def embed_query(self, text):
-        output = self.model.encode(["query: " + text])
-        dense_vec = output["dense_vecs"][0]
-        dense_vec = dense_vec / np.linalg.norm(dense_vec)
-        return dense_vec.tolist()
\ No newline at end of file
+        return self.embed_queries([text])[0]
+
+    async def aembed_query(self, text):
+        """embed_query in the default executor, so encoding never blocks the event loop."""
+        return await asyncio.get_running_loop().run_in_executor(None, self.embed_query, text)
@@ -0,0 +1,231 @@
+# Concurrent, cached RAGAS evaluation
+#
+#   python eval_runner.py --output eval_results.jsonl           (Groq + Pinecone/local index)
+#   python eval_runner.py --stub --output eval_results.parquet  (offline, stub models)
+#
+# Questions are answered concurrently, each with a fresh conversation memory, and
+# all answers are scored in one batched evaluate call. Judge scores are cached in
+# a JSONL file keyed by (question, answer, contexts, reference, metrics), so a
+# rerun only pays for rows that changed.
+
+import os
+import json
+import time
+import hashlib
+import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+JUDGE_CACHE_PATH = os.getenv("JUDGE_CACHE_PATH", "/Users/kumarpersonal/Downloads/ScalerAssist/Context/judge_cache.jsonl")
+EVAL_MAX_WORKERS = int(os.getenv("EVAL_MAX_WORKERS", "4"))
+
+def judge_key(record, metric_names):
+    payload = [record["question"], record["answer"], record["contexts"], record.get("reference"), sorted(metric_names)]
+    return hashlib.sha256(json.dumps(payload, ensure_ascii=False).encode("utf-8")).hexdigest()
+
+class JudgeCache:
+    """Append-only JSONL cache of judge scores, loaded into memory on start."""
+
+    def __init__(self, path=JUDGE_CACHE_PATH):
+        self.path = path
+        self._scores = {}
+        self._lock = threading.Lock()
+        if path and os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                for line in f:
+                    if line.strip():
+                        entry = json.loads(line)
+                        self._scores[entry["key"]] = entry["scores"]
+
+    def get(self, key):
+        return self._scores.get(key)
+
+    def put_many(self, entries):
+        """Store {key: scores} entries and append them to the cache file."""
+        with self._lock:
+            self._scores.update(entries)
+            if self.path:
+                with open(self.path, "a", encoding="utf-8") as f:
+                    for key, scores in entries.items():
+                        f.write(json.dumps({"key": key, "scores": scores}) + "\n")
+
+def make_answer_func(chain, llm, window_size=4):
+    """Answer function over a shared chain, with a fresh HybridMemory per question."""
+    from hist_rag_chain_v2 import HybridMemory, HybridRAGChainWrapper
+
+    def answer(question):
+        memory = HybridMemory(llm=llm, window_size=window_size)
+        return HybridRAGChainWrapper(chain, memory).invoke({"question": question})
+
+    return answer
+
+def answer_questions(answer_func, items, max_workers=EVAL_MAX_WORKERS):
+    """
+    Answer every item ({"question", optional "reference"}) with at most `max_workers` in flight.
+
+    Returns one record per item, in input order, with the answer, retrieved
+    contexts, latency and any error.
+    """
+    def run(item):
+        record = {"question": item["question"], "reference": item.get("reference"),
+                  "answer": None, "contexts": [], "error": None}
+        start = time.perf_counter()
+        try:
+            result = answer_func(item["question"])
+            record["answer"] = result["answer"]
+            record["contexts"] = [doc.page_content if hasattr(doc, "page_content") else str(doc)
+                                  for doc in result.get("source_documents", [])]
+        except Exception as e:
+            record["error"] = str(e)
+        record["latency_s"] = time.perf_counter() - start
+        return record
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        return list(executor.map(run, items))
+
+def _row_scores(result):
+    """Per-row metric dicts from a ragas EvaluationResult (any version) or stub result."""
+    scores = getattr(result, "scores", None)
+    if isinstance(scores, list):
+        return scores
+    return result.to_pandas().to_dict("records")
+
+def score_records(records, metrics, llm=None, embeddings=None, cache=None, evaluate_func=None):
+    """
+    Score answered records with one evaluate call over every row not in the cache.
+
+    Records without an answer or without contexts are left unscored. Scores are
+    added to each record under "metrics" and "cached" tells whether they came
+    from the cache. Returns the number of rows sent to the judge.
+    """
+    metric_names = [metric.name for metric in metrics]
+    pending = []
+    for record in records:
+        record["metrics"], record["cached"] = None, False
+        if record["error"] is not None or not record["contexts"]:
+            continue
+        key = judge_key(record, metric_names)
+        scores = cache.get(key) if cache is not None else None
+        if scores is not None:
+            record["metrics"], record["cached"] = scores, True
+        else:
+            pending.append((key, record))
+
+    if not pending:
+        return 0
+
+    data = {
+        "question": [r["question"] for _, r in pending],
+        "answer": [r["answer"] for _, r in pending],
+        "contexts": [r["contexts"] for _, r in pending],
+    }
+    if all(r.get("reference") for _, r in pending):
+        data["reference"] = [r["reference"] for _, r in pending]
+
+    if evaluate_func is None:
+        from ragas import evaluate as evaluate_func
+        from datasets import Dataset
+        dataset = Dataset.from_dict(data)
+    else:
+        dataset = data
+    kwargs = {"embeddings": embeddings} if embeddings is not None else {}
+    result = evaluate_func(dataset, metrics=metrics, llm=llm, **kwargs)
+
+    new_entries = {}
+    for (key, record), row in zip(pending, _row_scores(result)):
+        scores = {name: (None if row.get(name) is None else float(row[name])) for name in metric_names}
+        record["metrics"] = scores
+        new_entries[key] = scores
+    if cache is not None:
+        cache.put_many(new_entries)
+    return len(pending)
+
+def flatten_record(record):
+    row = {k: v for k, v in record.items() if k != "metrics"}
+    row.update(record.get("metrics") or {})
+    return row
+
+def write_results(records, output_path):
+    """Write one row per question to JSONL, or to Parquet if the path ends in .parquet."""
+    rows = [flatten_record(r) for r in records]
+    if output_path.endswith(".parquet"):
+        import pandas as pd
+        pd.DataFrame(rows).to_parquet(output_path, index=False)
+        return
+    with open(output_path, "w", encoding="utf-8") as f:
+        for row in rows:
+            f.write(json.dumps(row, ensure_ascii=False) + "\n")
+
+def summarize(records, metric_names):
+    """Mean of each metric over the scored rows, plus answer latency percentiles."""
+    latencies = sorted(r["latency_s"] for r in records)
+    summary = {"questions": len(records), "errors": sum(r["error"] is not None for r in records)}
+    if latencies:
+        summary["latency_p50_s"] = latencies[len(latencies) // 2]
+        summary["latency_max_s"] = latencies[-1]
+    for name in metric_names:
+        values = [r["metrics"][name] for r in records if r.get("metrics") and r["metrics"].get(name) is not None]
+        summary[name] = sum(values) / len(values) if values else None
+    return summary
+
+def run_evaluation(items, answer_func, metrics, llm=None, embeddings=None, output_path=None,
+                   cache=None, evaluate_func=None, max_workers=EVAL_MAX_WORKERS):
+    """Answer, score and optionally write results; returns (records, summary)."""
+    start = time.perf_counter()
+    records = answer_questions(answer_func, items, max_workers)
+    answer_s = time.perf_counter() - start
+
+    start = time.perf_counter()
+    judged = score_records(records, metrics, llm, embeddings, cache, evaluate_func)
+    score_s = time.perf_counter() - start
+
+    if output_path:
+        write_results(records, output_path)
+    summary = summarize(records, [metric.name for metric in metrics])
+    summary.update({"judged": judged, "answer_s": answer_s, "score_s": score_s})
+    return records, summary
+
+def main():
+    parser = argparse.ArgumentParser(description="Answer questions concurrently and score them with RAGAS")
+    parser.add_argument("--questions", help="JSON file with a list of {question, reference} items")
+    parser.add_argument("--output", default="eval_results.jsonl", help="JSONL or .parquet output file")
+    parser.add_argument("--max-workers", type=int, default=EVAL_MAX_WORKERS)
+    parser.add_argument("--cache", default=JUDGE_CACHE_PATH, help="Judge cache file, empty to disable")
+    parser.add_argument("--stub", action="store_true", help="Run offline with stub embedding, chat model and judge")
+    args = parser.parse_args()
+
+    if args.questions:
+        with open(args.questions, "r", encoding="utf-8") as f:
+            items = json.load(f)
+    else:
+        from eval_stubs import SAMPLE_QUESTIONS
+        items = [{"question": q} for q in SAMPLE_QUESTIONS]
+
+    cache = JudgeCache(args.cache) if args.cache else None
+    if args.stub:
+        import eval_stubs
+        chain, llm = eval_stubs.build_stub_chain()
+        judge_llm = llm
+        evaluate_func = eval_stubs.stub_evaluate
+        metric_module = eval_stubs
+    else:
+        from dotenv import load_dotenv
+        from ragas import metrics as metric_module
+        from shared_resources import get_llm, get_rag_chain
+        load_dotenv(dotenv_path="/Users/kumarpersonal/Downloads/ScalerAssist/venv-scaler-assist/.env")
+        groq_api_key, model = os.getenv("GROQ_API_KEY"), os.getenv("INFER_MODEL_NAME")
+        chain, llm = get_rag_chain(groq_api_key, model), get_llm(groq_api_key, model)
+        # One shared deterministic judge instead of a new client per question
+        judge_llm = get_llm(groq_api_key, model, temperature=0)
+        evaluate_func = None
+
+    metrics = [metric_module.faithfulness, metric_module.answer_relevancy]
+    if all(item.get("reference") for item in items):
+        metrics += [metric_module.context_recall, metric_module.context_precision]
+
+    _, summary = run_evaluation(items, make_answer_func(chain, llm), metrics, llm=judge_llm, output_path=args.output,
+                                cache=cache, evaluate_func=evaluate_func, max_workers=args.max_workers)
+    print(json.dumps(summary, indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,263 @@
+# Offline stand-ins for the embedding model, chat model and ragas.evaluate
+#
+# Used by `eval_runner.py --stub` and the benchmarks so the full answer + score
+# pipeline runs without model downloads, API keys or network access.
+
+import re
+import time
+import asyncio
+import hashlib
+import threading
+import tempfile
+from typing import Any, List, Optional
+import numpy as np
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, BaseMessage, SystemMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+
+SAMPLE_PASSAGES = [
+    "Scaler Academy is an online upskilling platform for working tech professionals.",
+    "Scaler offers programs in Software Development, Data Science and Machine Learning, and DevOps.",
+    "The Data Science program runs for about 12 to 14 months depending on the learner's track.",
+    "Admission requires clearing the Scaler Entrance Test followed by a screening call.",
+    "The program fee can be paid upfront or through no-cost EMI options with partner lenders.",
+    "Learners get placement support including mock interviews, resume reviews and referrals.",
+    "The intermediate data analytics course covers Excel, SQL, Tableau and case studies.",
+    "Classes are held live in the evenings and recordings are available for revision.",
+]
+
+SAMPLE_QUESTIONS = [
+    "What is Scaler Academy?",
+    "What courses does Scaler offer?",
+    "How long is the Data Science program?",
+    "What are the admission requirements?",
+    "What is the fee structure?",
+]
+
+_WORD_RE = re.compile(r"[a-z0-9]+")
+
+def _words(text):
+    return _WORD_RE.findall(text.lower())
+
+class HashEmbedding:
+    """Deterministic bag-of-words embeddings from hashed tokens, normalized like BGEEmbedding."""
+
+    def __init__(self, dim=256):
+        self.dim = dim
+
+    def _embed(self, text):
+        vec = np.zeros(self.dim, dtype=np.float32)
+        for word in _words(text):
+            vec[int(hashlib.md5(word.encode("utf-8")).hexdigest()[:8], 16) % self.dim] += 1.0
+        norm = np.linalg.norm(vec)
+        return (vec / norm if norm else vec).tolist()
+
+    def embed_documents(self, texts):
+        return [self._embed(t) for t in texts]
+
+    def iter_embed_documents(self, texts, batch_size=32):
+        """(positions, vectors) batches in input order, like BGEEmbedding.iter_embed_documents."""
+        for start in range(0, len(texts), batch_size):
+            positions = np.arange(start, min(start + batch_size, len(texts)))
+            yield positions, np.array([self._embed(texts[i]) for i in positions], dtype=np.float32)
+
+    def embed_queries(self, texts):
+        return [self._embed(t) for t in texts]
+
+    def embed_query(self, text):
+        return self._embed(text)
+
+    async def aembed_query(self, text):
+        return self._embed(text)
+
+class StubChatModel(BaseChatModel):
+    """
+    Chat model that answers with the first sentence of the prompt's context.
+
+    Prompts without a "Context:" section (question rewriting, summaries) are
+    answered with the last message unchanged. `latency` simulates the API round
+    trip (time.sleep when sync, asyncio.sleep when async).
+    """
+
+    latency: float = 0.0
+
+    def _generate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                  run_manager: Any = None, **kwargs: Any) -> ChatResult:
+        if self.latency:
+            time.sleep(self.latency)
+        return self._respond(messages)
+
+    async def _agenerate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                         run_manager: Any = None, **kwargs: Any) -> ChatResult:
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        return self._respond(messages)
+
+    def _respond(self, messages: List[BaseMessage]) -> ChatResult:
+        answer = messages[-1].content if messages else ""
+        for message in messages:
+            if isinstance(message, SystemMessage) and "Context:\n" in message.content:
+                context = message.content.split("Context:\n", 1)[1].strip()
+                answer = context.split("\n")[0] if context else "I'm sorry, I couldn't find that information."
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=answer))])
+
+    def get_num_tokens(self, text: str) -> int:
+        return len(text.split())
+
+    @property
+    def _llm_type(self) -> str:
+        return "stub-chat"
+
+class SlowIndex:
+    """Wraps an index so queries take `latency` seconds, like a network round trip; aquery sleeps asynchronously."""
+
+    def __init__(self, index, latency=0.02):
+        self.index = index
+        self.latency = latency
+
+    def query(self, **kwargs):
+        time.sleep(self.latency)
+        return self.index.query(**kwargs)
+
+    async def aquery(self, **kwargs):
+        await asyncio.sleep(self.latency)
+        return self.index.query(**kwargs)
+
+    def __getattr__(self, name):
+        return getattr(self.index, name)
+
+class TransientIndexError(Exception):
+    """Failure injected by RecordingIndex, stands in for a Pinecone 429/5xx."""
+
+class RecordingIndex:
+    """
+    Stand-in for a Pinecone index that records every upsert/delete/list call.
+
+    Wraps a LocalVectorIndex for storage. `fail(method, times)` makes the next
+    `times` calls of that method raise TransientIndexError before touching the
+    data; `latency` keeps each upsert in flight long enough to observe the
+    maximum number of concurrent requests in `max_in_flight`.
+    """
+
+    def __init__(self, index=None, latency=0.0):
+        from local_index import LocalVectorIndex
+        self.index = index if index is not None else LocalVectorIndex(tempfile.mkdtemp(prefix="recording-index-"))
+        self.latency = latency
+        self.calls = []
+        self.max_in_flight = 0
+        self._in_flight = 0
+        self._failures = {}
+        self._lock = threading.Lock()
+
+    def fail(self, method, times=1):
+        with self._lock:
+            self._failures[method] = self._failures.get(method, 0) + times
+
+    def _record(self, method, **kwargs):
+        with self._lock:
+            self.calls.append((method, kwargs))
+            if self._failures.get(method):
+                self._failures[method] -= 1
+                raise TransientIndexError(f"injected {method} failure")
+
+    def calls_to(self, method):
+        return [kwargs for name, kwargs in self.calls if name == method]
+
+    def upsert(self, vectors, **kwargs):
+        self._record("upsert", ids=[v["id"] for v in vectors])
+        with self._lock:
+            self._in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self._in_flight)
+        try:
+            if self.latency:
+                time.sleep(self.latency)
+            return self.index.upsert(vectors=vectors, **kwargs)
+        finally:
+            with self._lock:
+                self._in_flight -= 1
+
+    def delete(self, ids=None, **kwargs):
+        self._record("delete", ids=list(ids or []))
+        return self.index.delete(ids=ids, **kwargs)
+
+    def list(self, prefix=None, **kwargs):
+        self._record("list", prefix=prefix)
+        return self.index.list(prefix=prefix, **kwargs)
+
+    def __getattr__(self, name):
+        return getattr(self.index, name)
+
+class StubMetric:
+    def __init__(self, name):
+        self.name = name
+
+faithfulness = StubMetric("faithfulness")
+answer_relevancy = StubMetric("answer_relevancy")
+context_precision = StubMetric("context_precision")
+context_recall = StubMetric("context_recall")
+
+def _overlap(words, reference_words):
+    words = set(words)
+    return len(words & set(reference_words)) / len(words) if words else 0.0
+
+class StubEvaluationResult:
+    def __init__(self, scores):
+        self.scores = scores
+
+def stub_evaluate(dataset, metrics, llm=None, embeddings=None, **kwargs):
+    """
+    Stand-in for ragas.evaluate scoring every row with word-overlap heuristics.
+
+    Takes the same column layout (question, answer, contexts, optional reference)
+    and returns an object whose `scores` holds one {metric name: value} dict per row.
+    """
+    scores = []
+    references = dataset["reference"] if "reference" in dataset else [None] * len(dataset["question"])
+    for question, answer, contexts, reference in zip(dataset["question"], dataset["answer"],
+                                                     dataset["contexts"], references):
+        context_words = [w for c in contexts for w in _words(c)]
+        values = {
+            "faithfulness": _overlap(_words(answer), context_words),
+            "answer_relevancy": _overlap(_words(question), _words(answer)),
+            "context_precision": (sum(_overlap(_words(question), _words(c)) > 0 for c in contexts) / len(contexts)
+                                  if contexts else 0.0),
+            "context_recall": _overlap(_words(reference or ""), context_words),
+        }
+        scores.append({metric.name: values[metric.name] for metric in metrics})
+    return StubEvaluationResult(scores)
+
+def build_stub_retriever(passages=SAMPLE_PASSAGES, k=3, index_dir=None, index_latency=0.0):
+    """
+    CustomPineconeRetriever over `passages` with HashEmbedding, a LocalVectorIndex and BM25.
+
+    With `index_latency`, the index is wrapped in SlowIndex.
+    """
+    from langchain_core.documents import Document
+    from local_index import LocalVectorIndex
+    from bm25_index import BM25Index
+    from hist_retriever import CustomPineconeRetriever
+    from pinecone_utils import upsert_documents
+
+    embed_func = HashEmbedding()
+    index = LocalVectorIndex(index_dir or tempfile.mkdtemp(prefix="stub-index-"))
+    ids = upsert_documents([Document(page_content=p) for p in passages], embed_func, index=index)
+
+    if index_latency:
+        index = SlowIndex(index, index_latency)
+
+    # Pass a BM25 index explicitly, otherwise the retriever falls back to the shared one
+    bm25_index = BM25Index.from_texts(passages, ids)
+    return CustomPineconeRetriever(k=k, embed_func=embed_func, index=index, bm25_index=bm25_index)
+
+def build_stub_chain(passages=SAMPLE_PASSAGES, k=3, index_dir=None, llm_latency=0.0, index_latency=0.0):
+    """
+    Retrieval chain over `passages` with build_stub_retriever and StubChatModel.
+
+    Returns (chain, llm) like the shared chain and client used by the app.
+    """
+    from hist_rag_chain_v2 import build_retrieval_chain
+    from context_packer import ContextPacker
+
+    llm = StubChatModel(latency=llm_latency)
+    retriever = build_stub_retriever(passages, k, index_dir, index_latency)
+    return build_retrieval_chain(llm, retriever, ContextPacker(llm.get_num_tokens)), llm
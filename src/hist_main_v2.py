@@ -1,8 +1,9 @@
 import os
+import uuid
 import streamlit as st
 from dotenv import load_dotenv
-from hist_retriever import CustomPineconeRetriever
-from hist_rag_chain_v2 import create_rag_chain
+from shared_resources import get_rag_chain, get_session_store, start_warm_up
+from hist_rag_chain_v2 import HybridRAGChainWrapper
 
 # Load environment variables
 env_path = "/Users/kumarpersonal/Downloads/ScalerAssist/venv-scaler-assist/.env"
@@ -25,15 +26,17 @@ st.set_page_config(page_title="ScalerAssist AI", layout="centered")
 if "messages" not in st.session_state:
     st.session_state.messages = []
 
-# Create retriever and RAG chain with hybrid memory (only once)
-if "rag_chain" not in st.session_state:
-    retriever = CustomPineconeRetriever()
-    st.session_state.rag_chain = create_rag_chain(
-        retriever=retriever,
-        groq_api_key=GROQ_API_KEY,
-        model=INFER_MODEL_NAME,
-        window_size=4  
-    )
+# Conversation memory is kept in the shared session store under this id, not in st.session_state
+if "session_id" not in st.session_state:
+    st.session_state.session_id = uuid.uuid4().hex
+
+# Embedding model, index client, LLM and chain are loaded once per process and shared by all sessions.
+# Loading starts in the background on the first run so the page renders right away.
+start_warm_up(GROQ_API_KEY, INFER_MODEL_NAME)
+
+def get_session_chain(memory):
+    """Wrap the shared chain with this session's memory"""
+    return HybridRAGChainWrapper(get_rag_chain(GROQ_API_KEY, INFER_MODEL_NAME), memory)
 
 # Header with New Chat button
 col1, col2 = st.columns([3, 1])
@@ -43,8 +46,9 @@ with col1:
 
 with col2:
     if st.button("New Chat", type="primary", use_container_width=True):
-        # Clear the hybrid memory
-        st.session_state.rag_chain.clear_memory()
+        # Drop the stored memory and start under a fresh session id
+        get_session_store(GROQ_API_KEY, INFER_MODEL_NAME).delete(st.session_state.session_id)
+        st.session_state.session_id = uuid.uuid4().hex
         
         # Clear Streamlit session messages
         st.session_state.messages = []
@@ -67,22 +71,20 @@ if prompt := st.chat_input("Ask me about Scaler Academy..."):
     with st.chat_message("user"):
         st.markdown(prompt)
     
-    # Get response from RAG chain
+    # Stream response from RAG chain token by token
     with st.chat_message("assistant"):
-        with st.spinner("Fetching answer..."):
-            try:
-                result = st.session_state.rag_chain.invoke({
+        try:
+            # Checked out from the session store (rehydrated if it was idle) so it is not evicted mid-answer
+            with get_session_store(GROQ_API_KEY, INFER_MODEL_NAME).checkout(st.session_state.session_id) as memory:
+                answer = st.write_stream(get_session_chain(memory).stream({
                     "question": prompt,
                     "chat_history": []  # This is ignored, hybrid memory handles it
-                })
-                answer = result["answer"]
-                
-                st.markdown(answer)
-                
-                # Add assistant response to chat history
-                st.session_state.messages.append({"role": "assistant", "content": answer})
-                            
-            except Exception as e:
-                error_msg = f"Sorry, I encountered an error: {str(e)}"
-                st.error(error_msg)
-                st.session_state.messages.append({"role": "assistant", "content": error_msg})
+                }))
+            
+            # Add assistant response to chat history
+            st.session_state.messages.append({"role": "assistant", "content": answer})
+                        
+        except Exception as e:
+            error_msg = f"Sorry, I encountered an error: {str(e)}"
+            st.error(error_msg)
+            st.session_state.messages.append({"role": "assistant", "content": error_msg})
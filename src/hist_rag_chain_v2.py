@@ -1,10 +1,17 @@
 from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
-from langchain_groq import ChatGroq
-from langchain.chains import create_history_aware_retriever, create_retrieval_chain
-from langchain.chains.combine_documents import create_stuff_documents_chain
-from langchain.memory import ConversationBufferWindowMemory, ConversationSummaryMemory
-from langchain.schema import BaseMessage, HumanMessage, AIMessage
-from typing import List, Dict, Any
+from langchain_core.runnables import RunnableLambda
+from langchain_core.messages import BaseMessage, HumanMessage, AIMessage, SystemMessage
+from typing import List, Dict, Any, Optional, Callable
+from concurrent.futures import ThreadPoolExecutor
+import threading
+import asyncio
+import logging
+import time
+from shared_resources import get_llm
+from context_packer import ContextPacker, CONTEXT_TOKEN_BUDGET, HISTORY_TOKEN_BUDGET
+from perf_stats import PERF, perf_callbacks, get_perf_stats
+
+logger = logging.getLogger(__name__)
 
 # Contextualize question prompt for history-aware retrieval
 contextualize_q_system_prompt = (
@@ -37,14 +44,34 @@ qa_prompt = ChatPromptTemplate.from_messages([
     ("human", "{input}"),
 ])
 
+# Appended to the saved answer of a streamed turn that ended before the model finished
+STREAM_ABORTED_MARKER = "[answer interrupted]"
+
+# Pending messages kept while summarization keeps failing; older ones are dropped beyond this
+MAX_PENDING_MESSAGES = 40
+
+# Share of the history budget held back because token counts are approximate:
+# ChatGroq.get_num_tokens counts with the GPT-2 tokenizer, not the served model's
+HISTORY_TOKEN_MARGIN = 0.1
+
+# Shared by every session so summarization never runs on the request path
+_SUMMARY_EXECUTOR = ThreadPoolExecutor(max_workers=2, thread_name_prefix="summary")
+
 class HybridMemory:
     """
     Hybrid memory that combines:
     - ConversationSummaryMemory for long-term summarized history
     - ConversationBufferWindowMemory for recent raw conversation turns
+    
+    Messages that fall out of the window are queued and folded into the running
+    summary by a background worker, then dropped, so a long session keeps a
+    constant number of raw messages in memory. While summarization keeps failing,
+    at most max_pending messages wait for it and older ones are dropped.
     """
     
-    def __init__(self, llm, window_size: int = 4, summary_memory_key: str = "summary_history", window_memory_key: str = "recent_history"):
+    def __init__(self, llm, window_size: int = 4, summary_memory_key: str = "summary_history", window_memory_key: str = "recent_history",
+                 max_history_tokens: Optional[int] = None, token_counter: Optional[Callable[[str], int]] = None,
+                 max_pending: int = MAX_PENDING_MESSAGES):
         """
         Initialize hybrid memory.
         
@@ -53,7 +80,14 @@ class HybridMemory:
             window_size: Number of recent conversation turns to keep in raw format
             summary_memory_key: Key for summary memory
             window_memory_key: Key for window memory
+            max_history_tokens: Token budget for get_combined_history, None for no limit; counts are
+                approximate, so HISTORY_TOKEN_MARGIN of it is held back
+            token_counter: Function counting tokens in a string, defaults to llm.get_num_tokens
+            max_pending: Messages kept waiting for a failing summarizer before the oldest are dropped
         """
+        # langchain.memory is slow to import, load it only when a session starts
+        from langchain.memory import ConversationBufferWindowMemory, ConversationSummaryMemory
+        
         self.summary_memory = ConversationSummaryMemory(
             llm=llm,
             memory_key=summary_memory_key,
@@ -68,52 +102,444 @@ class HybridMemory:
         
         self.summary_memory_key = summary_memory_key
         self.window_memory_key = window_memory_key
+        self.max_history_tokens = max_history_tokens
+        self.token_counter = token_counter or llm.get_num_tokens
+        self.max_pending = max_pending
+        
+        # Messages evicted from the window that are not yet part of the summary
+        self._pending: List[BaseMessage] = []
+        self._summarized_count = 0
+        self._dropped_count = 0
+        self._summary_failures = 0
+        self._summary_future = None
+        # Set and cleared under the lock, so a worker that is about to exit never hides new pending messages
+        self._summary_running = False
+        self._generation = 0
+        self._lock = threading.Lock()
         
     def add_user_message(self, message: str):
-        """Add user message to both memories"""
-        self.summary_memory.chat_memory.add_user_message(message)
-        self.window_memory.chat_memory.add_user_message(message)
+        """Add user message to the recent window"""
+        with self._lock:
+            self.window_memory.chat_memory.add_user_message(message)
+            self._trim_window()
         
     def add_ai_message(self, message: str):
-        """Add AI message to both memories"""
-        self.summary_memory.chat_memory.add_ai_message(message)
-        self.window_memory.chat_memory.add_ai_message(message)
+        """Add AI message to the recent window and summarize evicted turns in the background"""
+        with self._lock:
+            self.window_memory.chat_memory.add_ai_message(message)
+            self._trim_window()
+        self._schedule_summary()
+    
+    def _trim_window(self):
+        """Move messages older than the window to the pending queue (caller holds the lock)"""
+        messages = self.window_memory.chat_memory.messages
+        overflow = len(messages) - 2 * self.window_memory.k
+        if overflow > 0:
+            self._pending.extend(messages[:overflow])
+            del messages[:overflow]
+            self._cap_pending()
+    
+    def _cap_pending(self):
+        """Drop the oldest pending messages beyond max_pending once summarization has failed (caller holds the lock)"""
+        excess = len(self._pending) - self.max_pending
+        if self._summary_failures and excess > 0:
+            del self._pending[:excess]
+            self._dropped_count += excess
+    
+    def _schedule_summary(self):
+        with self._lock:
+            if not self._pending or self._summary_running:
+                # A running job picks up newly queued messages before it exits
+                return
+            self._summary_running = True
+            self._summary_future = _SUMMARY_EXECUTOR.submit(self._summarize_pending)
+    
+    def _summarize_pending(self):
+        """Fold pending messages into the running summary, then drop them"""
+        while True:
+            with self._lock:
+                batch = list(self._pending)
+                generation = self._generation
+                existing_summary = self.summary_memory.buffer
+                if not batch:
+                    self._summary_running = False
+                    return
+            
+            try:
+                new_summary = self.summary_memory.predict_new_summary(batch, existing_summary)
+            except Exception as e:
+                # Messages stay pending (up to max_pending) and are retried after the next answer
+                logger.warning("Background summarization failed: %s", e)
+                with self._lock:
+                    self._summary_failures += 1
+                    self._cap_pending()
+                    self._summary_running = False
+                return
+            
+            with self._lock:
+                if generation != self._generation:
+                    # Memory was cleared or replaced while the summary was being written,
+                    # start over on whatever is pending now
+                    continue
+                self.summary_memory.buffer = new_summary
+                del self._pending[:len(batch)]
+                self._summarized_count += len(batch)
+                self._summary_failures = 0
+    
+    def wait_for_summary(self, timeout: Optional[float] = None):
+        """Block until the background summarization has caught up"""
+        future = self._summary_future
+        if future is not None:
+            future.result(timeout=timeout)
         
     def get_combined_history(self) -> List[BaseMessage]:
         """
         Get combined chat history with summary + recent raw messages.
-        Returns summarized history followed by recent raw conversation turns.
+        Returns summarized history followed by messages still waiting to be
+        summarized and the recent raw conversation turns, trimmed to
+        max_history_tokens.
         """
-        messages = []
+        with self._lock:
+            summary = self.summary_memory.buffer
+            raw_messages = self._pending + list(self.window_memory.chat_memory.messages)
         
-        # Get summary if available
-        summary_vars = self.summary_memory.load_memory_variables({})
-        if summary_vars.get(self.summary_memory_key):
-            summary_messages = summary_vars[self.summary_memory_key]
-            if summary_messages and len(summary_messages) > 0:
-                # Add summary as a system-like message for context
-                if isinstance(summary_messages, list):
-                    messages.extend(summary_messages)
-                else:
-                    messages.append(AIMessage(content=f"Previous conversation summary: {summary_messages}"))
+        summary_messages = []
+        if summary:
+            summary_messages.append(SystemMessage(content=f"Previous conversation summary: {summary}"))
         
-        # Get recent raw messages from window memory
-        window_vars = self.window_memory.load_memory_variables({})
-        recent_messages = window_vars.get(self.window_memory_key, [])
+        if self.max_history_tokens is None:
+            return summary_messages + raw_messages
+        return self._fit_token_budget(summary_messages, raw_messages)
+    
+    def _fit_token_budget(self, summary_messages: List[BaseMessage], raw_messages: List[BaseMessage]) -> List[BaseMessage]:
+        """
+        Drop history until it fits max_history_tokens: oldest raw messages first,
+        then the summary, and the latest turn last.
+        """
+        budget = int(self.max_history_tokens * (1 - HISTORY_TOKEN_MARGIN))
+        raw_tokens = [self.token_counter(m.content) for m in raw_messages]
+        summary_tokens = sum(self.token_counter(m.content) for m in summary_messages)
+        total = summary_tokens + sum(raw_tokens)
         
-        # Only include recent messages that aren't already in summary
-        # This prevents duplication of the most recent messages
-        if recent_messages:
-            messages.extend(recent_messages)
-            
-        return messages
+        start = 0
+        latest_turn = max(len(raw_messages) - 2, 0)
+        while total > budget and start < latest_turn:
+            total -= raw_tokens[start]
+            start += 1
+        if total > budget and summary_messages:
+            total -= summary_tokens
+            summary_messages = []
+        while total > budget and start < len(raw_messages):
+            total -= raw_tokens[start]
+            start += 1
+        
+        return summary_messages + raw_messages[start:]
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Get statistics about memory usage"""
+        with self._lock:
+            summary = self.summary_memory.buffer
+            pending_count = len(self._pending)
+            recent_count = len(self.window_memory.chat_memory.messages)
+            summarized_count = self._summarized_count
+            dropped_count = self._dropped_count
+        history = self.get_combined_history()
+        
+        return {
+            "summary_length": len(summary),
+            "summary_tokens": self.token_counter(summary) if summary else 0,
+            "recent_messages_count": recent_count,
+            "pending_summary_messages": pending_count,
+            "total_messages_in_summary": summarized_count,
+            "dropped_unsummarized_messages": dropped_count,
+            "history_tokens": sum(self.token_counter(m.content) for m in history),
+            "max_history_tokens": self.max_history_tokens,
+            "window_size": self.window_memory.k
+        }
     
+    def export_state(self):
+        """
+        Compact snapshot of the conversation: (summary, summarized_count, pending, window),
+        where pending and window are tuples of (is_user, content) pairs.
+        """
+        with self._lock:
+            return (
+                self.summary_memory.buffer,
+                self._summarized_count,
+                tuple((m.type == "human", m.content) for m in self._pending),
+                tuple((m.type == "human", m.content) for m in self.window_memory.chat_memory.messages),
+            )
+
+    def load_state(self, state):
+        """Replace the conversation with one from export_state; pending messages are summarized again."""
+        summary, summarized_count, pending, window = state
+        with self._lock:
+            self._generation += 1
+            self.summary_memory.buffer = summary
+            self._summarized_count = summarized_count
+            self._pending = [HumanMessage(content=c) if is_user else AIMessage(content=c) for is_user, c in pending]
+            self.window_memory.chat_memory.messages = [
+                HumanMessage(content=c) if is_user else AIMessage(content=c) for is_user, c in window
+            ]
+        self._schedule_summary()
+
     def clear(self):
         """Clear both memories"""
-        self.summary_memory.clear()
-        self.window_memory.clear()
+        with self._lock:
+            self._generation += 1
+            self._pending = []
+            self._summarized_count = 0
+            self._dropped_count = 0
+            self._summary_failures = 0
+            self.summary_memory.clear()
+            self.window_memory.clear()
 
-def create_rag_chain(retriever, groq_api_key, model, memory=None, window_size: int = 4):
+class HybridRAGChainWrapper:
+    """
+    Binds a retrieval chain to one conversation's HybridMemory.
+    
+    The chain holds no per-conversation state, so a single chain can be shared
+    by many wrappers (one per session).
+    """
+    def __init__(self, chain, hybrid_memory, answer_cache=None):
+        self.chain = chain
+        self.hybrid_memory = hybrid_memory
+        self.answer_cache = answer_cache
+        self.last_source_documents = []
+
+    def _cache_lookup(self, question, chat_history):
+        # With an empty history the question is already standalone (no rewrite happens),
+        # so only first-turn questions can safely share answers
+        if self.answer_cache is None or chat_history:
+            return None
+        cached = self.answer_cache.lookup(question)
+        PERF.count("answer_cache_hits" if cached is not None else "answer_cache_misses")
+        return cached
+
+    def _get_history(self):
+        with PERF.stage("history"):
+            return self.hybrid_memory.get_combined_history()
+
+    def _update_memory(self, question, answer):
+        with PERF.stage("memory_update"):
+            self.hybrid_memory.add_user_message(question)
+            self.hybrid_memory.add_ai_message(answer)
+
+    def __call__(self, inputs):
+        with PERF.stage("turn"):
+            return self._answer(inputs)
+
+    def _answer(self, inputs):
+        question = inputs.get("question", inputs.get("query", ""))
+
+        # Get combined chat history from hybrid memory
+        chat_history = self._get_history()
+
+        cached = self._cache_lookup(question, chat_history)
+        if cached is not None:
+            self._update_memory(question, cached["answer"])
+            return cached
+
+        # Run the chain
+        result = self.chain.invoke({
+            "input": question,
+            "chat_history": chat_history
+        }, config={"callbacks": perf_callbacks()})
+
+        # Update hybrid memory
+        answer = result["answer"]
+
+        self._update_memory(question, answer)
+
+        # Return in expected format
+        response = {
+            "answer": answer,
+            "source_documents": result.get("context", [])
+        }
+        if self.answer_cache is not None and not chat_history:
+            self.answer_cache.store(question, response)
+        return response
+
+    def invoke(self, inputs):
+        return self(inputs)
+
+    @staticmethod
+    def _streamed_answer(answer_parts, completed):
+        answer = "".join(answer_parts)
+        if completed:
+            return answer
+        return f"{answer} {STREAM_ABORTED_MARKER}".lstrip()
+
+    def stream(self, inputs):
+        """
+        Yield answer tokens as the model produces them.
+
+        Hybrid memory is updated when the stream ends. If it ends early (the
+        consumer stops reading or the chain fails), the turn is still saved with
+        the partial answer followed by STREAM_ABORTED_MARKER, and it is not
+        cached. The retrieved documents of the last streamed answer are kept in
+        `last_source_documents`.
+        """
+        start = time.perf_counter()
+        question = inputs.get("question", inputs.get("query", ""))
+        chat_history = self._get_history()
+
+        cached = self._cache_lookup(question, chat_history)
+        if cached is not None:
+            self._update_memory(question, cached["answer"])
+            self.last_source_documents = cached["source_documents"]
+            yield cached["answer"]
+            PERF.observe("turn", time.perf_counter() - start)
+            return
+
+        answer_parts = []
+        context = []
+        completed = False
+        try:
+            for chunk in self.chain.stream({
+                "input": question,
+                "chat_history": chat_history
+            }, config={"callbacks": perf_callbacks()}):
+                if "context" in chunk:
+                    context = chunk["context"]
+                token = chunk.get("answer")
+                if token:
+                    answer_parts.append(token)
+                    yield token
+            completed = True
+        finally:
+            # Runs when the consumer disconnects (generator closed) or the chain fails too
+            answer = self._streamed_answer(answer_parts, completed)
+            self._update_memory(question, answer)
+            self.last_source_documents = context
+
+        if self.answer_cache is not None and not chat_history:
+            self.answer_cache.store(question, {"answer": answer, "source_documents": context})
+        PERF.observe("turn", time.perf_counter() - start)
+
+    async def _acache_lookup(self, question, chat_history):
+        # Looking up embeds the question, keep that off the event loop
+        if self.answer_cache is None or chat_history:
+            return None
+        return await asyncio.get_running_loop().run_in_executor(None, self._cache_lookup, question, chat_history)
+
+    async def _acache_store(self, question, response):
+        if self.answer_cache is not None:
+            await asyncio.get_running_loop().run_in_executor(None, self.answer_cache.store, question, response)
+
+    async def ainvoke(self, inputs):
+        """
+        Async version of invoke: retrieval and generation are awaited, so many
+        conversations can share one event loop.
+        """
+        start = time.perf_counter()
+        question = inputs.get("question", inputs.get("query", ""))
+        chat_history = self._get_history()
+
+        cached = await self._acache_lookup(question, chat_history)
+        if cached is not None:
+            self._update_memory(question, cached["answer"])
+            PERF.observe("turn", time.perf_counter() - start)
+            return cached
+
+        result = await self.chain.ainvoke({
+            "input": question,
+            "chat_history": chat_history
+        }, config={"callbacks": perf_callbacks()})
+
+        answer = result["answer"]
+        self._update_memory(question, answer)
+
+        response = {
+            "answer": answer,
+            "source_documents": result.get("context", [])
+        }
+        if not chat_history:
+            await self._acache_store(question, response)
+        PERF.observe("turn", time.perf_counter() - start)
+        return response
+
+    async def astream(self, inputs):
+        """Async version of stream, yielding answer tokens as they arrive."""
+        start = time.perf_counter()
+        question = inputs.get("question", inputs.get("query", ""))
+        chat_history = self._get_history()
+
+        cached = await self._acache_lookup(question, chat_history)
+        if cached is not None:
+            self._update_memory(question, cached["answer"])
+            self.last_source_documents = cached["source_documents"]
+            yield cached["answer"]
+            PERF.observe("turn", time.perf_counter() - start)
+            return
+
+        answer_parts = []
+        context = []
+        completed = False
+        try:
+            async for chunk in self.chain.astream({
+                "input": question,
+                "chat_history": chat_history
+            }, config={"callbacks": perf_callbacks()}):
+                if "context" in chunk:
+                    context = chunk["context"]
+                token = chunk.get("answer")
+                if token:
+                    answer_parts.append(token)
+                    yield token
+            completed = True
+        finally:
+            answer = self._streamed_answer(answer_parts, completed)
+            self._update_memory(question, answer)
+            self.last_source_documents = context
+
+        if not chat_history:
+            await self._acache_store(question, {"answer": answer, "source_documents": context})
+        PERF.observe("turn", time.perf_counter() - start)
+
+    def clear_memory(self):
+        """Clear conversation memory"""
+        self.hybrid_memory.clear()
+
+    def get_memory_stats(self) -> Dict[str, Any]:
+        """Get statistics about memory usage"""
+        return self.hybrid_memory.get_stats()
+
+    def get_cache_stats(self) -> Dict[str, Any]:
+        """Get hit/miss statistics of the answer cache, empty if caching is off"""
+        return self.answer_cache.stats() if self.answer_cache is not None else {}
+
+    def get_perf_stats(self) -> Dict[str, Any]:
+        """Process-wide per-stage latency and counter snapshot, empty unless PERF_STATS is on"""
+        return get_perf_stats()
+
+def build_retrieval_chain(llm, retriever, context_packer=None, rewrite_llm=None):
+    """
+    Build the stateless history-aware retrieval + QA chain.
+    
+    If a context_packer is given, retrieved documents pass through it before
+    being stuffed into the QA prompt. rewrite_llm, if given, rewrites follow-up
+    questions instead of llm (a temperature=0 client can answer from the LLM cache).
+    """
+    from langchain.chains import create_history_aware_retriever, create_retrieval_chain
+    from langchain.chains.combine_documents import create_stuff_documents_chain
+    
+    # Create history-aware retriever; the stage tags let PerfCallbackHandler tell the two LLM calls apart
+    history_aware_retriever = create_history_aware_retriever(
+        (rewrite_llm or llm).with_config(tags=["stage:rewrite"]), retriever, contextualize_q_prompt
+    )
+    if context_packer is not None:
+        history_aware_retriever = history_aware_retriever | RunnableLambda(context_packer)
+    
+    # Create question answering chain
+    question_answer_chain = create_stuff_documents_chain(llm.with_config(tags=["stage:generation"]), qa_prompt)
+    
+    # Create full RAG chain
+    return create_retrieval_chain(history_aware_retriever, question_answer_chain)
+
+def create_rag_chain(retriever, groq_api_key, model, memory=None, window_size: int = 4, answer_cache=None,
+                     max_history_tokens: Optional[int] = HISTORY_TOKEN_BUDGET, llm=None,
+                     max_context_tokens: Optional[int] = CONTEXT_TOKEN_BUDGET):
     """
     Create RAG chain with hybrid memory approach.
     
@@ -121,71 +547,29 @@ def create_rag_chain(retriever, groq_api_key, model, memory=None, window_size: i
         retriever: Document retriever
         groq_api_key: Groq API key
         model: Model name
-        memory: Optional existing memory (will be replaced with hybrid memory)
+        memory: Optional existing HybridMemory to reuse (any other memory is replaced with hybrid memory)
         window_size: Number of recent turns to keep in raw format
+        answer_cache: Optional SemanticAnswerCache consulted for first-turn questions
+        max_history_tokens: Token budget for the chat history passed to the chain
+        llm: Optional chat model, defaults to the process-wide shared ChatGroq client
+        max_context_tokens: Token budget for retrieved context, None to stuff every document
     """
-    llm = ChatGroq(groq_api_key=groq_api_key, model=model)
+    rewrite_llm = None
+    if llm is None:
+        llm = get_llm(groq_api_key, model)
+        # Deterministic rewrites, served from the LLM cache when LLM_CACHE=true
+        rewrite_llm = get_llm(groq_api_key, model, temperature=0)
     
     # Create hybrid memory
-    hybrid_memory = HybridMemory(llm=llm, window_size=window_size)
-    
-    # Create history-aware retriever
-    history_aware_retriever = create_history_aware_retriever(
-        llm, retriever, contextualize_q_prompt
-    )
+    if isinstance(memory, HybridMemory):
+        hybrid_memory = memory
+    else:
+        hybrid_memory = HybridMemory(llm=llm, window_size=window_size, max_history_tokens=max_history_tokens)
     
-    # Create question answering chain
-    question_answer_chain = create_stuff_documents_chain(llm, qa_prompt)
+    context_packer = None
+    if max_context_tokens is not None:
+        context_packer = ContextPacker(llm.get_num_tokens, max_tokens=max_context_tokens)
     
-    # Create full RAG chain
-    rag_chain = create_retrieval_chain(history_aware_retriever, question_answer_chain)
+    rag_chain = build_retrieval_chain(llm, retriever, context_packer, rewrite_llm)
     
-    # Wrapper class to maintain compatibility with existing code
-    class HybridRAGChainWrapper:
-        def __init__(self, chain, hybrid_memory):
-            self.chain = chain
-            self.hybrid_memory = hybrid_memory
-            
-        def __call__(self, inputs):
-            # Get combined chat history from hybrid memory
-            chat_history = self.hybrid_memory.get_combined_history()
-            
-            # Run the chain
-            result = self.chain.invoke({
-                "input": inputs.get("question", inputs.get("query", "")),
-                "chat_history": chat_history
-            })
-            
-            # Update hybrid memory
-            question = inputs.get("question", inputs.get("query", ""))
-            answer = result["answer"]
-            
-            self.hybrid_memory.add_user_message(question)
-            self.hybrid_memory.add_ai_message(answer)
-            
-            # Return in expected format
-            return {
-                "answer": answer,
-                "source_documents": result.get("context", [])
-            }
-            
-        def invoke(self, inputs):
-            return self(inputs)
-        
-        def clear_memory(self):
-            """Clear conversation memory"""
-            self.hybrid_memory.clear()
-        
-        def get_memory_stats(self) -> Dict[str, Any]:
-            """Get statistics about memory usage"""
-            summary_vars = self.hybrid_memory.summary_memory.load_memory_variables({})
-            window_vars = self.hybrid_memory.window_memory.load_memory_variables({})
-            
-            return {
-                "summary_length": len(str(summary_vars.get(self.hybrid_memory.summary_memory_key, ""))),
-                "recent_messages_count": len(window_vars.get(self.hybrid_memory.window_memory_key, [])),
-                "total_messages_in_summary": len(self.hybrid_memory.summary_memory.chat_memory.messages),
-                "window_size": self.hybrid_memory.window_memory.k
-            }
-    
-    return HybridRAGChainWrapper(rag_chain, hybrid_memory)
\ No newline at end of file
+    return HybridRAGChainWrapper(rag_chain, hybrid_memory, answer_cache)
@@ -1,23 +1,110 @@
+import asyncio
+from functools import partial
 from langchain_core.retrievers import BaseRetriever
 from langchain_core.documents import Document
-from typing import List, Any
+from typing import List, Any, Optional
 from embeddings import BGEEmbedding
-from pinecone_utils import get_pinecone_index
+from bm25_index import reciprocal_rank_fusion
+from shared_resources import get_embedding_model, get_vector_index, get_bm25_index
+from perf_stats import PERF
 
 class CustomPineconeRetriever(BaseRetriever):
     k: int = 5  # Declare as class field with default value
     embed_func: BGEEmbedding = None  # Declare as class field
     index: Any = None  # Declare as class field with proper type annotation
+    bm25_index: Any = None  # Optional BM25Index fused with the dense results
+    fetch_k: int = 20  # Candidates taken from each retriever before fusion
+    rrf_k: int = 60  # Reciprocal-rank fusion constant
     
-    def __init__(self, k: int = 5):
+    def __init__(self, k: int = 5, embed_func: BGEEmbedding = None, index: Any = None,
+                 bm25_index: Any = None, fetch_k: Optional[int] = None):
         super().__init__(k=k)  # Pass k to parent constructor
-        self.embed_func = BGEEmbedding()
-        self.index = get_pinecone_index()
+        # Default to the process-wide model and index client instead of loading new ones
+        self.embed_func = embed_func if embed_func is not None else get_embedding_model()
+        self.index = index if index is not None else get_vector_index()
+        self.bm25_index = bm25_index if bm25_index is not None else get_bm25_index()
+        if fetch_k is not None:
+            self.fetch_k = fetch_k
 
     def _get_relevant_documents(self, query: str) -> List[Document]:
-        query_vector = self.embed_func.embed_query(query)
-        results = self.index.query(vector=query_vector, top_k=self.k, include_metadata=True)
+        docs = self._retrieve(query)
+        PERF.count("retrievals")
+        PERF.count("retrieved_chunks", len(docs))
+        return docs
+
+    async def _aget_relevant_documents(self, query: str) -> List[Document]:
+        docs = await self._aretrieve(query)
+        PERF.count("retrievals")
+        PERF.count("retrieved_chunks", len(docs))
+        return docs
+
+    def _retrieve(self, query: str) -> List[Document]:
+        with PERF.stage("embed"):
+            query_vector = self.embed_func.embed_query(query)
+        if self.bm25_index is None:
+            with PERF.stage("vector_query"):
+                results = self.index.query(vector=query_vector, top_k=self.k, include_metadata=True)
+            return self._dense_documents(results["matches"])
+        
+        # Hybrid: fuse dense and BM25 rankings so exact-term matches surface at small k
+        fetch_k = max(self.fetch_k, self.k)
+        with PERF.stage("vector_query"):
+            dense_matches = self.index.query(vector=query_vector, top_k=fetch_k, include_metadata=True)["matches"]
+        with PERF.stage("bm25_query"):
+            sparse_matches = self.bm25_index.search(query, top_k=fetch_k)
+        return self._fuse(dense_matches, sparse_matches)
+
+    async def _aretrieve(self, query: str) -> List[Document]:
+        """
+        Async retrieval: the query is embedded with the model's `aembed_query`,
+        the vector query is awaited through the index's `aquery` (LocalVectorIndex)
+        or run in the default executor (Pinecone's sync client), BM25 runs in the
+        executor, and the dense and BM25 lookups run concurrently.
+        """
+        loop = asyncio.get_running_loop()
+        with PERF.stage("embed"):
+            query_vector = await self.embed_func.aembed_query(query)
+
+        if self.bm25_index is None:
+            results = await _timed("vector_query", self._aquery_index(query_vector, self.k))
+            return self._dense_documents(results["matches"])
+
+        fetch_k = max(self.fetch_k, self.k)
+        results, sparse_matches = await asyncio.gather(
+            _timed("vector_query", self._aquery_index(query_vector, fetch_k)),
+            _timed("bm25_query", loop.run_in_executor(None, self.bm25_index.search, query, fetch_k)),
+        )
+        return self._fuse(results["matches"], sparse_matches)
+
+    def _aquery_index(self, query_vector, top_k):
+        aquery = getattr(self.index, "aquery", None)
+        if aquery is not None:
+            return aquery(vector=query_vector, top_k=top_k, include_metadata=True)
+        return asyncio.get_running_loop().run_in_executor(
+            None, partial(self.index.query, vector=query_vector, top_k=top_k, include_metadata=True)
+        )
+
+    def _dense_documents(self, matches) -> List[Document]:
+        # Keep the similarity score so the context packer can cut weak matches
         return [
-            Document(page_content=match["metadata"]["text"], metadata=match["metadata"])
-            for match in results["matches"]
-        ]
\ No newline at end of file
+            Document(page_content=match["metadata"]["text"], metadata={**match["metadata"], "score": match["score"]})
+            for match in matches
+        ]
+
+    def _fuse(self, dense_matches, sparse_matches) -> List[Document]:
+        metadata = {match["id"]: {**match["metadata"], "score": match["score"]} for match in dense_matches}
+        for doc_id, text, score in sparse_matches:
+            metadata.setdefault(doc_id, {"text": text})["bm25_score"] = score
+        
+        fused = reciprocal_rank_fusion(
+            [[match["id"] for match in dense_matches], [doc_id for doc_id, _, _ in sparse_matches]],
+            k=self.rrf_k,
+        )
+        return [
+            Document(page_content=metadata[doc_id]["text"], metadata={**metadata[doc_id], "rrf_score": rrf_score})
+            for doc_id, rrf_score in fused[:self.k]
+        ]
+
+async def _timed(stage, awaitable):
+    with PERF.stage(stage):
+        return await awaitable
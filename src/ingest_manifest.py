@@ -0,0 +1,230 @@
+import os
+import json
+import glob
+import time
+import hashlib
+from text_extract import PDF_FOLDER, TEXT_FOLDER, process_pdf_file
+from text_cleaner import clean_text
+from text_splitter import semantic_split
+from dedup import dedup_paragraphs, match_near_duplicates
+from bm25_index import build_bm25_index, BM25_INDEX_DIR
+from pinecone_utils import (
+    chunk_id, upsert_documents, delete_vectors, delete_stale_vectors, get_pinecone_index
+)
+
+BASE_FOLDER = "/Users/kumarpersonal/Downloads/ScalerAssist/Context"
+MANIFEST_PATH = os.path.join(BASE_FOLDER, "ingest_manifest.json")
+MANIFEST_VERSION = 1
+
+def file_sha256(path):
+    """Hash a file in blocks so large brochures are never read in one go."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+def text_sha256(text):
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+def load_manifest(manifest_path=MANIFEST_PATH):
+    """
+    Load the ingestion manifest.
+
+    Layout:
+        {"version": 1,
+         "sources": {"<pdf name>": {"sha256": ..., "chunks": [{"hash", "id", "text"}]}}}
+
+    Every source lists all of its chunks. A chunk's "id" is the vector that
+    represents it: its own content id, or, for a near-duplicate of a chunk that
+    was already embedded, that chunk's id (an alias, see assign_chunk_ids).
+    """
+    if not os.path.exists(manifest_path):
+        return {"version": MANIFEST_VERSION, "sources": {}}
+    with open(manifest_path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+def save_manifest(manifest, manifest_path=MANIFEST_PATH):
+    """Write the manifest atomically so an interrupted run never leaves it half-written."""
+    tmp_path = manifest_path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp_path, manifest_path)
+
+def manifest_ids(manifest):
+    """All vector ids referenced by any source in the manifest."""
+    return {chunk["id"] for source in manifest["sources"].values() for chunk in source["chunks"]}
+
+def read_source_text(pdf_path, text_folder=TEXT_FOLDER):
+    """Read the extracted text and OCR outputs of one PDF, merged like merge_all_texts."""
+    name = os.path.splitext(os.path.basename(pdf_path))[0]
+    parts = []
+    for suffix in ("_text.txt", "_ocr.txt"):
+        path = os.path.join(text_folder, f"{name}{suffix}")
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                parts.append(f.read())
+    return "\n".join(parts)
+
+def build_manifest_bm25(manifest, index_dir=BM25_INDEX_DIR):
+    """Rebuild the BM25 index over every chunk tracked by the manifest."""
+    texts, ids, seen = [], [], set()
+    for source in manifest["sources"].values():
+        for chunk in source["chunks"]:
+            if chunk["id"] not in seen:
+                seen.add(chunk["id"])
+                texts.append(chunk["text"])
+                ids.append(chunk["id"])
+    return build_bm25_index(texts, ids, index_dir)
+
+def chunk_source(pdf_path, split_func=semantic_split):
+    """Extract, de-duplicate, clean and split a single PDF into chunk documents."""
+    process_pdf_file(pdf_path)
+    # Paragraph structure is gone after clean_text, so near-duplicate paragraphs
+    # (e.g. pdfplumber and OCR text of the same page) are collapsed first
+    raw_text, stats = dedup_paragraphs(read_source_text(pdf_path))
+    print(f"{os.path.basename(pdf_path)}: dropped {stats['dropped']}/{stats['input']} "
+          f"near-duplicate paragraphs ({stats['dropped_chars']} chars)")
+    text = clean_text(raw_text)
+    if not text:
+        return []
+    docs = split_func(text)
+    for doc in docs:
+        doc.metadata["source"] = os.path.basename(pdf_path)
+    return docs
+
+def assign_chunk_ids(docs, indexed_chunks):
+    """
+    Vector id for each new chunk document: its own content id, or the id of a
+    near-duplicate that is already indexed or appears earlier in `docs`, so
+    nothing is embedded twice. Aliased chunks stay listed under their own source,
+    which keeps the shared vector alive when the other source changes or goes away.
+
+    Args:
+        docs: New chunk documents with metadata["source"]
+        indexed_chunks: (id, text, source) of chunks that stay in the index
+
+    Returns (ids, stats) where stats counts the input and aliased chunks and the aliased characters.
+    """
+    offset = len(indexed_chunks)
+    matches = match_near_duplicates(
+        [text for _, text, _ in indexed_chunks] + [doc.page_content for doc in docs],
+        groups=[source for _, _, source in indexed_chunks] + [doc.metadata["source"] for doc in docs],
+        keep_first=offset,
+    )
+    ids = []
+    for i, doc in enumerate(docs):
+        j = matches.get(offset + i)
+        if j is None:
+            ids.append(chunk_id(doc.page_content))
+        elif j < offset:
+            ids.append(indexed_chunks[j][0])
+        else:
+            ids.append(ids[j - offset])
+    aliased = [doc for doc, vec_id in zip(docs, ids) if vec_id != chunk_id(doc.page_content)]
+    stats = {
+        "input": len(docs),
+        "aliased": len(aliased),
+        "aliased_chars": sum(len(doc.page_content) for doc in aliased),
+    }
+    return ids, stats
+
+def incremental_ingest(embed_func=None, pdf_folder=PDF_FOLDER, manifest_path=MANIFEST_PATH,
+                       index=None, split_func=semantic_split):
+    """
+    Bring the index in line with the PDFs in `pdf_folder`, touching only what changed.
+
+    PDFs whose hash matches the manifest are skipped entirely. Changed or new PDFs
+    are re-extracted and re-split, and only chunks whose ids are not already in the
+    index are embedded and upserted; near-duplicates of indexed chunks reuse their
+    vectors. Vectors no longer referenced by any source (removed PDFs, edited
+    chunks) are deleted.
+
+    Args:
+        embed_func: Embedding model, a BGEEmbedding is created only if something needs embedding
+        pdf_folder: Folder with the source PDFs
+        manifest_path: Location of the ingestion manifest
+        index: Target index, defaults to get_pinecone_index()
+        split_func: Chunking function applied to each cleaned source text
+
+    Returns the updated manifest.
+    """
+    manifest = load_manifest(manifest_path)
+    sources = manifest["sources"]
+
+    pdf_paths = {os.path.basename(p): p for p in sorted(glob.glob(os.path.join(pdf_folder, "*.pdf")))}
+    pdf_hashes = {name: file_sha256(path) for name, path in pdf_paths.items()}
+
+    changed = [name for name in pdf_paths if sources.get(name, {}).get("sha256") != pdf_hashes[name]]
+    removed = [name for name in sources if name not in pdf_paths]
+
+    if not changed and not removed:
+        print("Index is up to date, nothing to ingest.")
+        if not os.path.isdir(BM25_INDEX_DIR):
+            build_manifest_bm25(manifest)
+        return manifest
+
+    print(f"Changed or new sources: {changed or 'none'}")
+    print(f"Removed sources: {removed or 'none'}")
+
+    if index is None:
+        index = get_pinecone_index()
+
+    old_ids = manifest_ids(manifest)
+    new_sources = {name: entry for name, entry in sources.items()
+                   if name in pdf_paths and name not in changed}
+
+    new_docs = []
+    for name in changed:
+        new_docs.extend(chunk_source(pdf_paths[name], split_func))
+
+    # Dedup against every chunk that stays indexed, not only the re-chunked sources
+    indexed, seen = [], set()
+    for name, entry in new_sources.items():
+        for chunk in entry["chunks"]:
+            if chunk["id"] not in seen:
+                seen.add(chunk["id"])
+                indexed.append((chunk["id"], chunk["text"], name))
+    doc_ids, dedup_stats = assign_chunk_ids(new_docs, indexed)
+
+    for name in changed:
+        new_sources[name] = {
+            "sha256": pdf_hashes[name],
+            "chunks": [
+                {"hash": text_sha256(doc.page_content), "id": vec_id, "text": doc.page_content}
+                for doc, vec_id in zip(new_docs, doc_ids) if doc.metadata["source"] == name
+            ],
+        }
+
+    new_manifest = {"version": MANIFEST_VERSION, "sources": new_sources}
+    new_ids = manifest_ids(new_manifest)
+
+    # Aliased chunks reuse another chunk's vector, the rest are embedded unless already indexed
+    to_embed = [doc for doc, vec_id in zip(new_docs, doc_ids)
+                if vec_id == chunk_id(doc.page_content) and vec_id not in old_ids]
+    if to_embed:
+        if embed_func is None:
+            from embeddings import BGEEmbedding
+            embed_func = BGEEmbedding()
+        start = time.perf_counter()
+        # Flushed once together with the deletes below
+        upsert_documents(to_embed, embed_func, index=index, flush=False)
+        embed_seconds = time.perf_counter() - start
+        # Extrapolated from the measured seconds per embedded character, not measured
+        embedded_chars = sum(len(doc.page_content) for doc in to_embed)
+        estimated_saving = embed_seconds * dedup_stats["aliased_chars"] / max(embedded_chars, 1)
+        print(f"Aliased {dedup_stats['aliased']}/{dedup_stats['input']} near-duplicate chunks to existing vectors "
+              f"(estimated ~{estimated_saving:.1f}s of embedding and upserting saved, extrapolated by character count)")
+
+    if sources:
+        removed_ids = sorted(old_ids - new_ids)
+        delete_vectors(index, removed_ids)
+    else:
+        # First run with a manifest: drop anything left over from full-corpus ingestion
+        removed_ids = delete_stale_vectors(index, new_ids)
+
+    save_manifest(new_manifest, manifest_path)
+    build_manifest_bm25(new_manifest)
+    print(f"Embedded {len(to_embed)} new chunks, deleted {len(removed_ids)} vectors, "
+          f"{len(new_ids)} chunks tracked across {len(new_sources)} sources.")
+    return new_manifest
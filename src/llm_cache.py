@@ -0,0 +1,127 @@
+# Disk-backed LLM response cache
+#
+# Opt in with LLM_CACHE=true. shared_resources.get_llm attaches the cache to
+# every ChatGroq client created with temperature=0, so reruns of the eval,
+# test set generation and the query-rewrite step answer identical prompts from
+# SQLite instead of calling Groq. Sampled (temperature > 0) calls are never cached.
+
+import os
+import json
+import time
+import hashlib
+import sqlite3
+import threading
+from langchain_core.caches import BaseCache
+from langchain_core.messages import message_to_dict, messages_from_dict
+from langchain_core.outputs import ChatGeneration, Generation
+from perf_stats import PERF
+from sqlite_lru import trim_lru
+
+LLM_CACHE = os.getenv("LLM_CACHE", "false").lower() == "true"
+LLM_CACHE_PATH = os.getenv("LLM_CACHE_PATH", "/Users/kumarpersonal/Downloads/ScalerAssist/Context/llm_cache.sqlite")
+LLM_CACHE_MAX_ENTRIES = int(os.getenv("LLM_CACHE_MAX_ENTRIES", "50000"))
+
+def response_key(prompt, llm_string):
+    """
+    Cache key for a rendered prompt. `llm_string` is LangChain's serialization of
+    the model parameters (model name, temperature, stop, ...), API keys excluded.
+    """
+    digest = hashlib.sha256()
+    digest.update(llm_string.encode("utf-8"))
+    digest.update(b"\x00")
+    digest.update(prompt.encode("utf-8"))
+    return digest.hexdigest()
+
+def _dump_generations(generations):
+    return json.dumps([
+        {"text": g.text, "message": message_to_dict(g.message)} if isinstance(g, ChatGeneration) else {"text": g.text}
+        for g in generations
+    ])
+
+def _load_generations(data):
+    return [
+        ChatGeneration(message=messages_from_dict([g["message"]])[0]) if "message" in g else Generation(text=g["text"])
+        for g in json.loads(data)
+    ]
+
+class SQLiteLLMCache(BaseCache):
+    """
+    LangChain cache of LLM responses in a SQLite file (WAL mode), shared across
+    processes and runs. Entries beyond `max_entries` are evicted least recently used first.
+    """
+
+    def __init__(self, db_path=LLM_CACHE_PATH, max_entries=LLM_CACHE_MAX_ENTRIES):
+        """
+        Args:
+            db_path: SQLite file for the cache
+            max_entries: Maximum number of cached responses kept on disk
+        """
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        self._db = sqlite3.connect(db_path, check_same_thread=False, timeout=30)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS llm_responses "
+            "(key TEXT PRIMARY KEY, generations TEXT NOT NULL, last_used REAL NOT NULL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS llm_responses_last_used ON llm_responses (last_used)")
+        self._db.commit()
+        self._size = self._db.execute("SELECT COUNT(*) FROM llm_responses").fetchone()[0]
+
+    def lookup(self, prompt, llm_string):
+        key = response_key(prompt, llm_string)
+        with self._lock:
+            row = self._db.execute("SELECT generations FROM llm_responses WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+                self._db.execute("UPDATE llm_responses SET last_used = ? WHERE key = ?", (time.time(), key))
+                self._db.commit()
+        PERF.count("llm_cache_misses" if row is None else "llm_cache_hits")
+        return None if row is None else _load_generations(row[0])
+
+    def update(self, prompt, llm_string, return_val):
+        key = response_key(prompt, llm_string)
+        data = _dump_generations(return_val)
+        with self._lock:
+            inserted = self._db.execute(
+                "INSERT OR IGNORE INTO llm_responses (key, generations, last_used) VALUES (?, ?, ?)",
+                (key, data, time.time()),
+            ).rowcount
+            if not inserted:
+                self._db.execute(
+                    "UPDATE llm_responses SET generations = ?, last_used = ? WHERE key = ?", (data, time.time(), key)
+                )
+            self._size += inserted
+            if self._size > self.max_entries:
+                self._evict()
+            self._db.commit()
+
+    def _evict(self):
+        self._size, removed = trim_lru(self._db, "llm_responses", self.max_entries)
+        self.evictions += removed
+
+    def clear(self, **kwargs):
+        """Delete every cached response and reset the counters."""
+        with self._lock:
+            self._db.execute("DELETE FROM llm_responses")
+            self._db.commit()
+            self._size = 0
+            self.hits = self.misses = self.evictions = 0
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "size": self._size,
+                "max_entries": self.max_entries,
+            }
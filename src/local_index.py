@@ -0,0 +1,254 @@
+import json
+import os
+import asyncio
+import threading
+from functools import partial
+import numpy as np
+
+VECTORS_FILE = "vectors.npy"
+META_FILE = "index.json"
+
+# Rows converted to float32 per step when scoring, keeps float16 stores cheap
+_BLOCK_ROWS = 4096
+
+
+def _normalize(matrix):
+    """L2-normalize rows so that a dot product is a cosine similarity."""
+    norms = np.linalg.norm(matrix, axis=-1, keepdims=True)
+    return matrix / np.maximum(norms, 1e-12)
+
+
+class LocalVectorIndex:
+    """
+    In-process replacement for a Pinecone index.
+
+    Vectors are stored normalized in a single `.npy` file that is memory-mapped
+    on load, ids and metadata live next to it in `index.json`. `query` does an
+    exact cosine top-k with one matrix-vector product, so no network round trip
+    is needed for a corpus of a few thousand chunks.
+
+    Upserts and deletes are buffered in memory (new rows plus tombstones for
+    persisted rows) and are visible to queries right away; `flush` writes them
+    to disk in one rewrite of the files, so call it once per ingest.
+    """
+
+    def __init__(self, index_dir, dtype="float32"):
+        """
+        Open (or create) a local index.
+
+        Args:
+            index_dir: Directory holding vectors.npy and index.json
+            dtype: Storage dtype for new indexes, "float32" or "float16"
+        """
+        self.index_dir = index_dir
+        self.dtype = np.dtype(dtype)
+        self._lock = threading.Lock()
+        self._vectors = None
+        self._ids = []
+        self._metadata = []
+        self._positions = {}
+        # Buffered changes: id -> (normalized vector, metadata), and persisted ids deleted or overwritten
+        self._pending = {}
+        self._deleted = set()
+        self._pending_view = None
+        self._deleted_positions = None
+        os.makedirs(index_dir, exist_ok=True)
+        self._load()
+
+    @property
+    def vectors_path(self):
+        return os.path.join(self.index_dir, VECTORS_FILE)
+
+    @property
+    def meta_path(self):
+        return os.path.join(self.index_dir, META_FILE)
+
+    def _load(self):
+        """Memory-map persisted vectors and read ids/metadata, if present."""
+        if not os.path.exists(self.meta_path):
+            return
+        with open(self.meta_path, "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        self.dtype = np.dtype(meta.get("dtype", self.dtype.name))
+        self._ids = meta["ids"]
+        self._metadata = meta["metadata"]
+        self._positions = {vec_id: i for i, vec_id in enumerate(self._ids)}
+        if self._ids:
+            self._vectors = np.load(self.vectors_path, mmap_mode="r")
+
+    def _persist(self, vectors, ids, metadata):
+        """Write vectors and metadata atomically, then re-map the new file."""
+        tmp_vectors = self.vectors_path + ".tmp.npy"
+        tmp_meta = self.meta_path + ".tmp"
+        np.save(tmp_vectors, vectors)
+        with open(tmp_meta, "w", encoding="utf-8") as f:
+            json.dump({"dtype": self.dtype.name, "ids": ids, "metadata": metadata}, f)
+
+        # Drop the old mapping before replacing the file underneath it
+        self._vectors = None
+        os.replace(tmp_vectors, self.vectors_path)
+        os.replace(tmp_meta, self.meta_path)
+
+        self._ids = ids
+        self._metadata = metadata
+        self._positions = {vec_id: i for i, vec_id in enumerate(ids)}
+        self._vectors = np.load(self.vectors_path, mmap_mode="r") if ids else None
+        self._pending.clear()
+        self._deleted.clear()
+        self._changed()
+
+    def _changed(self):
+        # Query views of the buffered changes are rebuilt lazily
+        self._pending_view = None
+        self._deleted_positions = None
+
+    def _dimension(self):
+        if self._vectors is not None:
+            return int(self._vectors.shape[1])
+        for vector, _ in self._pending.values():
+            return len(vector)
+        return 0
+
+    def _query_view(self):
+        """(pending ids, pending metadata, pending matrix or None, deleted row positions), cached until the next change."""
+        if self._pending_view is None:
+            ids = list(self._pending)
+            rows = [self._pending[vec_id] for vec_id in ids]
+            matrix = np.stack([vector for vector, _ in rows]) if rows else None
+            self._pending_view = (ids, [meta for _, meta in rows], matrix)
+        if self._deleted_positions is None:
+            self._deleted_positions = np.fromiter((self._positions[vec_id] for vec_id in self._deleted),
+                                                  dtype=np.int64, count=len(self._deleted))
+        return self._pending_view + (self._deleted_positions,)
+
+    def upsert(self, vectors, **kwargs):
+        """
+        Insert or overwrite vectors, Pinecone style. Changes are buffered until `flush`.
+
+        Args:
+            vectors: List of {"id", "values", "metadata"} dicts
+        """
+        if not vectors:
+            return {"upserted_count": 0}
+
+        new_values = _normalize(np.asarray([v["values"] for v in vectors], dtype=np.float32))
+
+        with self._lock:
+            dimension = self._dimension()
+            if dimension and dimension != new_values.shape[1]:
+                raise ValueError(
+                    f"Vector dimension {new_values.shape[1]} does not match index dimension {dimension}"
+                )
+            for row, vec in enumerate(vectors):
+                # Same id repeated within this call or across calls, last write wins
+                if vec["id"] in self._positions:
+                    self._deleted.add(vec["id"])
+                self._pending[vec["id"]] = (new_values[row], vec.get("metadata", {}))
+            self._changed()
+
+        return {"upserted_count": len(vectors)}
+
+    def flush(self):
+        """Write buffered upserts and deletes to disk, a no-op when nothing changed."""
+        with self._lock:
+            if not self._pending and not self._deleted:
+                return
+            if self._deleted:
+                keep = [i for i, vec_id in enumerate(self._ids) if vec_id not in self._deleted]
+                parts = [np.asarray(self._vectors[keep], dtype=self.dtype)] if keep else []
+            else:
+                keep = range(len(self._ids))
+                parts = [self._vectors] if self._vectors is not None else []
+            pending_ids = list(self._pending)
+            if pending_ids:
+                parts.append(np.stack([self._pending[vec_id][0] for vec_id in pending_ids]).astype(self.dtype))
+            vectors = np.concatenate(parts) if parts else np.empty((0, 0), dtype=self.dtype)
+            self._persist(
+                vectors,
+                [self._ids[i] for i in keep] + pending_ids,
+                [self._metadata[i] for i in keep] + [self._pending[vec_id][1] for vec_id in pending_ids],
+            )
+
+    def query(self, vector, top_k=10, include_metadata=False, **kwargs):
+        """
+        Exact cosine top-k search over persisted and buffered vectors.
+
+        Returns a dict shaped like a Pinecone QueryResponse:
+        {"matches": [{"id", "score", "metadata"}]}.
+        """
+        with self._lock:
+            vectors = self._vectors
+            ids = self._ids
+            metadata = self._metadata
+            pending_ids, pending_metadata, pending, deleted = self._query_view()
+
+        query_vec = _normalize(np.asarray(vector, dtype=np.float32))
+        if vectors is None:
+            scores = np.empty(0, dtype=np.float32)
+        elif vectors.dtype == np.float32:
+            scores = vectors @ query_vec
+        else:
+            scores = np.empty(len(vectors), dtype=np.float32)
+            for start in range(0, len(vectors), _BLOCK_ROWS):
+                block = np.asarray(vectors[start:start + _BLOCK_ROWS], dtype=np.float32)
+                scores[start:start + len(block)] = block @ query_vec
+        if len(deleted):
+            scores[deleted] = -np.inf
+        if pending is not None:
+            scores = np.concatenate([scores, pending @ query_vec])
+
+        k = min(top_k, len(scores) - len(deleted))
+        if k <= 0:
+            return {"matches": []}
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+
+        matches = []
+        for pos in top:
+            if pos < len(ids):
+                match = {"id": ids[pos], "score": float(scores[pos])}
+                meta = metadata[pos]
+            else:
+                match = {"id": pending_ids[pos - len(ids)], "score": float(scores[pos])}
+                meta = pending_metadata[pos - len(ids)]
+            if include_metadata:
+                match["metadata"] = meta
+            matches.append(match)
+        return {"matches": matches}
+
+    async def aquery(self, vector, top_k=10, include_metadata=False, **kwargs):
+        """
+        `query` for async callers. The scoring runs in the default executor (numpy
+        releases the GIL for the matrix product), so the event loop keeps serving
+        other sessions meanwhile.
+        """
+        return await asyncio.get_running_loop().run_in_executor(
+            None, partial(self.query, vector, top_k=top_k, include_metadata=include_metadata, **kwargs)
+        )
+
+    def delete(self, ids=None, delete_all=False, **kwargs):
+        """Remove vectors by id (buffered until `flush`), or everything at once with delete_all=True."""
+        with self._lock:
+            if delete_all:
+                self._persist(np.empty((0, 0), dtype=self.dtype), [], [])
+                return {}
+            for vec_id in ids or []:
+                self._pending.pop(vec_id, None)
+                if vec_id in self._positions:
+                    self._deleted.add(vec_id)
+            self._changed()
+        return {}
+
+    def list(self, prefix=None, limit=100, **kwargs):
+        """Yield pages of ids, like Pinecone's `Index.list`."""
+        with self._lock:
+            ids = [vec_id for vec_id in self._ids if vec_id not in self._deleted] + list(self._pending)
+        if prefix is not None:
+            ids = [vec_id for vec_id in ids if vec_id.startswith(prefix)]
+        for start in range(0, len(ids), limit):
+            yield ids[start:start + limit]
+
+    def describe_index_stats(self):
+        with self._lock:
+            count = len(self._ids) - len(self._deleted) + len(self._pending)
+            return {"dimension": self._dimension(), "total_vector_count": count}
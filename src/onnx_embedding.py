@@ -0,0 +1,94 @@
+import os
+import numpy as np
+
+ONNX_MODEL_DIR = os.getenv("ONNX_MODEL_DIR", "/Users/kumarpersonal/Downloads/ScalerAssist/Context/onnx_model")
+# Intra-op threads for ONNX Runtime, 0 lets it use every core
+ONNX_NUM_THREADS = int(os.getenv("ONNX_NUM_THREADS", "0"))
+MAX_LENGTH = 512
+
+MODEL_FILE = "model.onnx"
+QUANTIZED_MODEL_FILE = "model.int8.onnx"
+
+def export_onnx_model(model_name, output_dir=ONNX_MODEL_DIR, quantize=True):
+    """
+    Export a BERT-style embedding model to ONNX, optionally with dynamic int8 quantization.
+
+    The tokenizer is saved next to the model so the runtime side needs neither
+    torch nor the Hugging Face cache. Returns the path of the model to load.
+    """
+    import torch
+    from transformers import AutoModel, AutoTokenizer
+
+    os.makedirs(output_dir, exist_ok=True)
+    tokenizer = AutoTokenizer.from_pretrained(model_name)
+    model = AutoModel.from_pretrained(model_name).eval()
+    tokenizer.save_pretrained(output_dir)
+
+    sample = tokenizer(["passage: export sample"], return_tensors="pt")
+    model_path = os.path.join(output_dir, MODEL_FILE)
+    dynamic_axes = {"input_ids": {0: "batch", 1: "sequence"},
+                    "attention_mask": {0: "batch", 1: "sequence"},
+                    "last_hidden_state": {0: "batch", 1: "sequence"}}
+    with torch.no_grad():
+        torch.onnx.export(
+            model, (sample["input_ids"], sample["attention_mask"]), model_path,
+            input_names=["input_ids", "attention_mask"], output_names=["last_hidden_state"],
+            dynamic_axes=dynamic_axes, opset_version=14,
+        )
+
+    if not quantize:
+        return model_path
+    from onnxruntime.quantization import quantize_dynamic, QuantType
+    quantized_path = os.path.join(output_dir, QUANTIZED_MODEL_FILE)
+    quantize_dynamic(model_path, quantized_path, weight_type=QuantType.QInt8)
+    return quantized_path
+
+class OnnxEncoder:
+    """
+    Runs an exported embedding model with ONNX Runtime on CPU.
+
+    Produces the same dense vectors as BGEM3FlagModel: the [CLS] hidden state,
+    left unnormalized (callers normalize, as with the torch model).
+    """
+
+    def __init__(self, model_name, model_dir=ONNX_MODEL_DIR, quantized=True, num_threads=ONNX_NUM_THREADS):
+        """
+        Args:
+            model_name: Hugging Face model to export if `model_dir` has no exported model yet
+            model_dir: Folder with the exported model and tokenizer
+            quantized: Load the int8 model instead of the float32 one
+            num_threads: Intra-op thread count, 0 for the ONNX Runtime default
+        """
+        import onnxruntime as ort
+        from transformers import AutoTokenizer
+
+        model_path = os.path.join(model_dir, QUANTIZED_MODEL_FILE if quantized else MODEL_FILE)
+        if not os.path.exists(model_path):
+            model_path = export_onnx_model(model_name, model_dir, quantize=quantized)
+
+        options = ort.SessionOptions()
+        options.intra_op_num_threads = num_threads
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        self.session = ort.InferenceSession(model_path, options, providers=["CPUExecutionProvider"])
+        self.tokenizer = AutoTokenizer.from_pretrained(model_dir)
+
+    def encode(self, texts):
+        tokens = self.tokenizer(texts, padding=True, truncation=True, max_length=MAX_LENGTH, return_tensors="np")
+        hidden = self.session.run(
+            ["last_hidden_state"],
+            {"input_ids": tokens["input_ids"].astype(np.int64),
+             "attention_mask": tokens["attention_mask"].astype(np.int64)},
+        )[0]
+        return hidden[:, 0].astype(np.float32)
+
+def check_parity(reference, candidate, texts):
+    """
+    Cosine similarity between two embedding models' document vectors for the same texts.
+
+    Returns {"min": ..., "mean": ...}; both models return normalized vectors, so
+    the cosine is a plain dot product.
+    """
+    ref = np.asarray(reference.embed_documents(texts), dtype=np.float32)
+    cand = np.asarray(candidate.embed_documents(texts), dtype=np.float32)
+    cosine = np.sum(ref * cand, axis=1)
+    return {"min": float(cosine.min()), "mean": float(cosine.mean())}
@@ -1,6 +1,6 @@
 import os
-from text_extract import process_all_pdfs, merge_all_texts
-from text_cleaner import clean_corpus_file
+from text_extract import process_all_pdfs, merge_all_texts, list_text_files
+from text_cleaner import clean_text_files_parallel
 
 BASE_FOLDER = "/Users/kumarpersonal/Downloads/ScalerAssist/Context"
 RAW_CORPUS_PATH = os.path.join(BASE_FOLDER, "extracted_corpus.txt")
@@ -8,13 +8,14 @@ CLEANED_CORPUS_PATH = os.path.join(BASE_FOLDER, "cleaned_text.txt")
 
 def extract_and_clean_pipeline():
     print("Starting PDF extraction...")
-    process_all_pdfs()
+    process_all_pdfs(parallel=True)
     
     print("Merging all extracted text files into corpus...")
-    merge_all_texts()
+    merge_all_texts(output_path=RAW_CORPUS_PATH)
     
-    print("Cleaning merged corpus text...")
-    clean_corpus_file(RAW_CORPUS_PATH, CLEANED_CORPUS_PATH)
+    print("Cleaning extracted text files in parallel...")
+    # Same output as cleaning the merged corpus, with the per-PDF files cleaned in worker processes
+    clean_text_files_parallel(list_text_files(), CLEANED_CORPUS_PATH)
     
     print(f"Pipeline complete. Cleaned corpus saved at: {CLEANED_CORPUS_PATH}")
 
@@ -0,0 +1,223 @@
+# In-process latency histograms and counters for the RAG pipeline
+#
+# Enable with PERF_STATS=true. When disabled, PERF.stage() hands back a shared
+# no-op context manager and PERF.count() returns immediately, so instrumented
+# code pays one attribute check per call.
+
+import os
+import json
+import time
+import bisect
+import threading
+from contextlib import nullcontext
+import numpy as np
+from langchain_core.callbacks import BaseCallbackHandler
+
+PERF_STATS = os.getenv("PERF_STATS", "false").lower() == "true"
+
+# Histogram bucket upper bounds in seconds (Prometheus defaults plus sub-5 ms buckets for local stages)
+LATENCY_BUCKETS = (
+    0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0,
+    float("inf"),
+)
+
+_NULL_CONTEXT = nullcontext()
+
+class Histogram:
+    """Fixed-bucket latency histogram with count, sum and max."""
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+        self.max = max(self.max, value)
+
+    def quantile(self, q):
+        """Estimate a quantile by linear interpolation inside the bucket that holds it."""
+        if not self.count:
+            return None
+        rank = q * self.count
+        cumulative, lower = 0, 0.0
+        for upper, count in zip(self.buckets, self.counts):
+            if count and cumulative + count >= rank:
+                if upper == float("inf"):
+                    return self.max
+                # The estimate never exceeds the largest value actually seen
+                return min(lower + (upper - lower) * (rank - cumulative) / count, self.max)
+            cumulative += count
+            lower = upper
+        return self.max
+
+    def summary(self):
+        return {
+            "count": self.count,
+            "mean_ms": 1000 * self.sum / self.count if self.count else None,
+            "p50_ms": _ms(self.quantile(0.5)),
+            "p95_ms": _ms(self.quantile(0.95)),
+            "p99_ms": _ms(self.quantile(0.99)),
+            "max_ms": 1000 * self.max,
+        }
+
+def _ms(seconds):
+    return None if seconds is None else 1000 * seconds
+
+def latency_percentiles(latencies, prefix=""):
+    """Exact p50/p95/p99 in ms of a list of latencies in seconds, for the bench scripts."""
+    latencies_ms = np.array(latencies, dtype=float) * 1000
+    return {
+        f"{prefix}p{q}_ms": float(np.percentile(latencies_ms, q)) if latencies else None
+        for q in (50, 95, 99)
+    }
+
+class _Timer:
+    __slots__ = ("recorder", "name", "start")
+
+    def __init__(self, recorder, name):
+        self.recorder = recorder
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.recorder.observe(self.name, time.perf_counter() - self.start)
+        return False
+
+class PerfRecorder:
+    """
+    Thread-safe registry of per-stage latency histograms and counters.
+
+    Stages used by the pipeline: turn, history, rewrite, embed, vector_query,
+    bm25_query, generation, memory_update. Counters: tokens_in, tokens_out,
+    retrievals, retrieved_chunks, answer_cache_hits, answer_cache_misses,
+    llm_cache_hits, llm_cache_misses.
+    """
+
+    def __init__(self, enabled=PERF_STATS):
+        self.enabled = enabled
+        self._histograms = {}
+        self._counters = {}
+        self._lock = threading.Lock()
+
+    def stage(self, name):
+        """Context manager timing a block into the `name` histogram."""
+        if not self.enabled:
+            return _NULL_CONTEXT
+        return _Timer(self, name)
+
+    def observe(self, name, seconds):
+        if not self.enabled:
+            return
+        with self._lock:
+            histogram = self._histograms.get(name)
+            if histogram is None:
+                histogram = self._histograms[name] = Histogram()
+            histogram.observe(seconds)
+
+    def count(self, name, value=1):
+        if not self.enabled:
+            return
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + value
+
+    def reset(self):
+        with self._lock:
+            self._histograms.clear()
+            self._counters.clear()
+
+    def snapshot(self):
+        """{"stages": {name: latency summary}, "counters": {name: value}}"""
+        with self._lock:
+            return {
+                "stages": {name: h.summary() for name, h in self._histograms.items()},
+                "counters": dict(self._counters),
+            }
+
+    def to_prometheus(self, prefix="scaler_assist"):
+        """Render all histograms and counters in the Prometheus text exposition format."""
+        lines = [f"# TYPE {prefix}_stage_seconds histogram"]
+        with self._lock:
+            for name, h in sorted(self._histograms.items()):
+                cumulative = 0
+                for upper, count in zip(h.buckets, h.counts):
+                    cumulative += count
+                    le = "+Inf" if upper == float("inf") else repr(upper)
+                    lines.append(f'{prefix}_stage_seconds_bucket{{stage="{name}",le="{le}"}} {cumulative}')
+                lines.append(f'{prefix}_stage_seconds_sum{{stage="{name}"}} {h.sum}')
+                lines.append(f'{prefix}_stage_seconds_count{{stage="{name}"}} {h.count}')
+            for name, value in sorted(self._counters.items()):
+                lines.append(f"# TYPE {prefix}_{name}_total counter")
+                lines.append(f"{prefix}_{name}_total {value}")
+        return "\n".join(lines) + "\n"
+
+    def write_jsonl(self, path):
+        """Append one timestamped snapshot to a JSONL file."""
+        with open(path, "a", encoding="utf-8") as f:
+            f.write(json.dumps({"timestamp": time.time(), **self.snapshot()}) + "\n")
+
+# Process-wide recorder used by the retriever, the chain wrapper and the LLM callback
+PERF = PerfRecorder()
+
+def get_perf_stats():
+    return PERF.snapshot()
+
+def start_jsonl_exporter(path, interval=60.0, recorder=PERF):
+    """Append a snapshot to `path` every `interval` seconds from a daemon thread."""
+    def run():
+        while True:
+            time.sleep(interval)
+            recorder.write_jsonl(path)
+
+    thread = threading.Thread(target=run, name="perf-stats-exporter", daemon=True)
+    thread.start()
+    return thread
+
+class PerfCallbackHandler(BaseCallbackHandler):
+    """
+    Times chat model calls tagged "stage:<name>" (rewrite, generation) and counts
+    their input/output tokens into PERF.
+    """
+
+    def __init__(self, recorder=PERF):
+        self.recorder = recorder
+        self._runs = {}
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, tags=None, **kwargs):
+        stage = next((t[len("stage:"):] for t in tags or () if t.startswith("stage:")), "llm")
+        self._runs[run_id] = (stage, time.perf_counter())
+
+    def on_llm_end(self, response, *, run_id, **kwargs):
+        run = self._runs.pop(run_id, None)
+        if run is None:
+            return
+        stage, start = run
+        self.recorder.observe(stage, time.perf_counter() - start)
+
+        tokens_in = tokens_out = 0
+        for generations in response.generations:
+            for generation in generations:
+                usage = getattr(getattr(generation, "message", None), "usage_metadata", None)
+                if usage:
+                    tokens_in += usage.get("input_tokens", 0)
+                    tokens_out += usage.get("output_tokens", 0)
+        if not tokens_in and not tokens_out:
+            usage = (response.llm_output or {}).get("token_usage") or {}
+            tokens_in, tokens_out = usage.get("prompt_tokens", 0), usage.get("completion_tokens", 0)
+        self.recorder.count("tokens_in", tokens_in)
+        self.recorder.count("tokens_out", tokens_out)
+
+    def on_llm_error(self, error, *, run_id, **kwargs):
+        self._runs.pop(run_id, None)
+        self.recorder.count("llm_errors")
+
+def perf_callbacks():
+    """Callbacks to pass in a chain's config, empty when stats are disabled."""
+    return [PerfCallbackHandler()] if PERF.enabled else []
@@ -1,7 +1,10 @@
 import os
+import time
+import hashlib
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
 from dotenv import load_dotenv
-from pinecone import Pinecone
 from langchain_core.documents import Document
+from local_index import LocalVectorIndex
 
 env_path = "/Users/kumarpersonal/Downloads/ScalerAssist/venv-scaler-assist/.env"
 load_dotenv(dotenv_path=env_path)
@@ -9,19 +12,136 @@ load_dotenv(dotenv_path=env_path)
 PINECONE_API_KEY = os.getenv("PINECONE_API_KEY")
 PINECONE_INDEX_NAME = os.getenv("PINECONE_INDEX_NAME")
 
+# "pinecone" (default) or "local" for the in-process NumPy index
+VECTOR_BACKEND = os.getenv("VECTOR_BACKEND", "pinecone")
+LOCAL_INDEX_DIR = os.getenv("LOCAL_INDEX_DIR", "/Users/kumarpersonal/Downloads/ScalerAssist/Context/local_index")
+LOCAL_INDEX_DTYPE = os.getenv("LOCAL_INDEX_DTYPE", "float32")
+
+ID_PREFIX = "doc-"
+UPSERT_BATCH_SIZE = 100
+UPSERT_MAX_WORKERS = 4
+UPSERT_MAX_RETRIES = 3
+UPSERT_BACKOFF = 1.0
+DELETE_BATCH_SIZE = 1000
+
 def setup_pinecone(api_key, index_name):
+    if VECTOR_BACKEND == "local":
+        return setup_local_index(LOCAL_INDEX_DIR, LOCAL_INDEX_DTYPE)
+    # Imported here so the ingest helpers work against a local or stand-in index without the client
+    from pinecone import Pinecone
     pc = Pinecone(api_key=api_key)
     return pc.Index(index_name)
 
-def upsert_documents(documents, embed_func):
-    index = setup_pinecone(PINECONE_API_KEY, PINECONE_INDEX_NAME)
-    texts = [doc.page_content for doc in documents]
-    vectors = embed_func.embed_documents(texts)
-    upsert_data = [
-        {"id": f"doc-{i}", "values": vectors[i], "metadata": {"text": texts[i]}}
-        for i in range(len(texts))
-    ]
-    index.upsert(vectors=upsert_data)
+def setup_local_index(index_dir, dtype="float32"):
+    return LocalVectorIndex(index_dir, dtype=dtype)
+
+def flush_index(index):
+    """Write buffered changes of a LocalVectorIndex to disk; Pinecone writes need no flush."""
+    if isinstance(index, LocalVectorIndex):
+        index.flush()
+
+def chunk_id(text):
+    """Content-hash vector id, so the same chunk always maps to the same id."""
+    return ID_PREFIX + hashlib.sha256(text.encode("utf-8")).hexdigest()[:32]
+
+def _call_with_retry(func, max_retries=UPSERT_MAX_RETRIES, backoff=UPSERT_BACKOFF, **kwargs):
+    """Call an index method, retrying with exponential backoff on failure."""
+    for attempt in range(max_retries + 1):
+        try:
+            return func(**kwargs)
+        except Exception as e:
+            if attempt == max_retries:
+                raise
+            delay = backoff * (2 ** attempt)
+            print(f"Index request failed ({e}), retrying in {delay:.1f}s...")
+            time.sleep(delay)
+
+def _iter_upsert_batches(texts, ids, embed_func, batch_size):
+    """Embed texts lazily and group the results into upsert-sized batches."""
+    batch = []
+    for positions, vectors in embed_func.iter_embed_documents(texts):
+        for i, vec in zip(positions, vectors):
+            batch.append({"id": ids[i], "values": vec.tolist(), "metadata": {"text": texts[i]}})
+            if len(batch) >= batch_size:
+                yield batch
+                batch = []
+    if batch:
+        yield batch
+
+def upsert_documents(documents, embed_func, index=None, batch_size=UPSERT_BATCH_SIZE,
+                     max_workers=UPSERT_MAX_WORKERS, max_retries=UPSERT_MAX_RETRIES,
+                     backoff=UPSERT_BACKOFF, delete_stale=False, flush=True):
+    """
+    Embed and upsert documents in batches with a few requests in flight.
+
+    Args:
+        documents: LangChain documents to index
+        embed_func: Embedding model exposing iter_embed_documents
+        index: Target index, defaults to get_pinecone_index()
+        batch_size: Vectors per upsert request
+        max_workers: Maximum number of upsert requests in flight
+        max_retries: Retries per batch before giving up
+        backoff: Initial retry delay in seconds, doubled on each retry
+        delete_stale: Delete vectors whose ids are not part of `documents`
+        flush: Persist a local index afterwards, pass False when more changes follow
+
+    Returns the list of vector ids that were written.
+    """
+    if index is None:
+        index = get_pinecone_index()
+
+    # Identical chunks share an id, so only embed them once
+    texts, ids, seen = [], [], set()
+    for doc in documents:
+        vec_id = chunk_id(doc.page_content)
+        if vec_id not in seen:
+            seen.add(vec_id)
+            texts.append(doc.page_content)
+            ids.append(vec_id)
+
+    pending = set()
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        for batch in _iter_upsert_batches(texts, ids, embed_func, batch_size):
+            # Bound the number of batches held in memory while requests are in flight
+            if len(pending) >= max_workers:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    future.result()
+            pending.add(pool.submit(
+                _call_with_retry, index.upsert, max_retries, backoff, vectors=batch
+            ))
+        for future in pending:
+            future.result()
+
+    if delete_stale:
+        delete_stale_vectors(index, set(ids), max_retries=max_retries, backoff=backoff, flush=False)
+    if flush:
+        flush_index(index)
+    return ids
+
+def list_vector_ids(index, prefix=ID_PREFIX):
+    """Collect every id in the index that starts with `prefix`."""
+    ids = []
+    for page in index.list(prefix=prefix):
+        ids.extend(page)
+    return ids
+
+def delete_vectors(index, ids, batch_size=DELETE_BATCH_SIZE, max_retries=UPSERT_MAX_RETRIES,
+                   backoff=UPSERT_BACKOFF, flush=True):
+    """Delete vectors by id in bulk requests, then persist a local index unless flush=False."""
+    ids = list(ids)
+    for start in range(0, len(ids), batch_size):
+        _call_with_retry(index.delete, max_retries, backoff, ids=ids[start:start + batch_size])
+    if flush:
+        flush_index(index)
+
+def delete_stale_vectors(index, keep_ids, prefix=ID_PREFIX, **kwargs):
+    """Delete every vector under `prefix` that is not in `keep_ids`, returns the deleted ids."""
+    stale = [vec_id for vec_id in list_vector_ids(index, prefix) if vec_id not in keep_ids]
+    delete_vectors(index, stale, **kwargs)
+    if stale:
+        print(f"Deleted {len(stale)} stale vectors")
+    return stale
 
 def get_pinecone_index():
-    return setup_pinecone(PINECONE_API_KEY, PINECONE_INDEX_NAME)
\ No newline at end of file
+    return setup_pinecone(PINECONE_API_KEY, PINECONE_INDEX_NAME)
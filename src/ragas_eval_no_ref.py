@@ -3,12 +3,9 @@
 import os
 import sys
 from dotenv import load_dotenv
-from hist_retriever import CustomPineconeRetriever
-from hist_rag_chain_v2 import create_rag_chain
-from ragas import evaluate
-from datasets import Dataset
-from ragas.metrics import faithfulness, answer_relevancy, context_precision, context_recall
-from langchain_groq import ChatGroq
+from shared_resources import get_llm, get_rag_chain
+from eval_runner import run_evaluation, make_answer_func, JudgeCache, EVAL_MAX_WORKERS
+from ragas.metrics import faithfulness, answer_relevancy
 
 # Load environment variables
 env_path = "/Users/kumarpersonal/Downloads/ScalerAssist/venv-scaler-assist/.env"
@@ -23,81 +20,41 @@ os.environ["OPENAI_API_KEY"] = "sk-placeholder"
 GROQ_API_KEY = os.getenv("GROQ_API_KEY")
 INFER_MODEL_NAME = os.getenv("INFER_MODEL_NAME")
 
-def run_ragas_eval(query: str, answer: str, retrieved_docs):
+def run_evaluation_batch(test_questions, output_path=None, max_workers=EVAL_MAX_WORKERS):
     """
-    Run RAGAS evaluation on the given query, generated answer, and retrieved documents.
-    """
-    contexts_text = [doc.page_content for doc in retrieved_docs]
-    ragas_data = Dataset.from_dict({
-        "question": [query],
-        "answer": [answer],
-        "contexts": [contexts_text],
-    })
+    Run evaluation on a batch of test questions.
 
-    # Create Groq LLM instance for RAGAS
-    groq_llm = ChatGroq(
-        api_key=GROQ_API_KEY,
-        model_name=INFER_MODEL_NAME,
-        temperature=0
-    )
+    Questions are answered concurrently (each with a fresh memory) and scored in one
+    batched RAGAS call; cached judge scores are reused. See eval_runner.py.
+
+    Returns one dict per scored question with 'question', 'answer' and
+    'ragas_metrics', a {metric name: score} dict for that question. Questions
+    that failed or retrieved nothing are left out, as before.
+    """
+    chain = get_rag_chain(GROQ_API_KEY, INFER_MODEL_NAME)
+    llm = get_llm(GROQ_API_KEY, INFER_MODEL_NAME)
 
-    results = evaluate(
-        ragas_data,
+    records, summary = run_evaluation(
+        [{"question": q} for q in test_questions],
+        make_answer_func(chain, llm, window_size=4),
         metrics=[faithfulness, answer_relevancy],
-        llm=groq_llm
+        llm=get_llm(GROQ_API_KEY, INFER_MODEL_NAME, temperature=0),
+        output_path=output_path,
+        cache=JudgeCache(),
+        max_workers=max_workers,
     )
-    
-    return results
 
-def run_evaluation_batch(test_questions):
-    """
-    Run evaluation on a batch of test questions
-    """
-    # Initialize retriever and RAG chain
-    retriever = CustomPineconeRetriever()
-    rag_chain = create_rag_chain(
-        retriever=retriever,
-        groq_api_key=GROQ_API_KEY,
-        model=INFER_MODEL_NAME,
-        window_size=4
-    )
-    
-    results = []
-    
-    for i, question in enumerate(test_questions):
-        print(f"\nEvaluating question {i+1}/{len(test_questions)}: {question}")
-        
-        try:
-            # Get answer from RAG chain
-            result = rag_chain.invoke({
-                "question": question,
-                "chat_history": []
-            })
-            
-            answer = result["answer"]
-            retrieved_docs = result.get("source_documents", [])
-            
-            print(f"Answer: {answer[:100]}...")
-            
-            # Run evaluations
-            if retrieved_docs:
-                ragas_results = run_ragas_eval(question, answer, retrieved_docs)
-                
-                evaluation_result = {
-                    "question": question,
-                    "answer": answer,
-                    "ragas_metrics": ragas_results,
-                }
-                
-                results.append(evaluation_result)
-                print(f"RAGAS scores: {ragas_results}")
-            else:
-                print("No retrieved documents found")
-                
-        except Exception as e:
-            print(f"Error processing question: {str(e)}")
-            
-    return results
+    for record in records:
+        if record["error"] is not None:
+            print(f"Error processing question '{record['question']}': {record['error']}")
+        elif not record["contexts"]:
+            print(f"No retrieved documents found for '{record['question']}'")
+        else:
+            print(f"\n{record['question']}\nAnswer: {record['answer'][:100]}...\nRAGAS scores: {record['metrics']}")
+    print(f"\nSummary: {summary}")
+
+    return [{"question": r["question"], "answer": r["answer"], "ragas_metrics": r["metrics"]}
+            for r in records if r["metrics"] is not None]
 
 def main():
     # Define test questions
@@ -114,14 +71,8 @@ def main():
         test_questions = [sys.argv[1]]
     
     print("Starting evaluation...")
-    results = run_evaluation_batch(test_questions)
-    
-    # Save results to file
-    # import json
-    # with open("evaluation_results.json", "w") as f:
-    #     json.dump(results, f, indent=2)
-    
-    # print(f"\nEvaluation complete! Results saved to evaluation_results.json")
+    results = run_evaluation_batch(test_questions, output_path="evaluation_results.jsonl")
+    print(f"\nEvaluation complete! {len(results)} questions scored, results saved to evaluation_results.jsonl")
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -3,12 +3,9 @@
 import os
 import sys
 from dotenv import load_dotenv
-from hist_retriever import CustomPineconeRetriever
-from hist_rag_chain_v2 import create_rag_chain
-from ragas import evaluate
-from datasets import Dataset
+from shared_resources import get_llm, get_rag_chain
+from eval_runner import run_evaluation, make_answer_func, JudgeCache, EVAL_MAX_WORKERS
 from ragas.metrics import faithfulness, answer_relevancy, context_precision, context_recall
-from langchain_groq import ChatGroq
 
 # Load environment variables
 env_path = "/Users/kumarpersonal/Downloads/ScalerAssist/venv-scaler-assist/.env"
@@ -51,82 +48,49 @@ def create_reference_dataset():
     ]
     return test_qa_pairs
 
-def run_evaluation_with_references(test_qa_pairs):
+def run_evaluation_with_references(test_qa_pairs, output_path=None, max_workers=EVAL_MAX_WORKERS):
     """
     Run evaluation when you have reference answers
     test_qa_pairs: list of dicts with 'question', 'reference_answer' keys
+
+    Questions are answered concurrently (each with a fresh memory) and scored in one
+    batched RAGAS call; cached judge scores are reused. See eval_runner.py.
+
+    Returns one dict per scored question with 'question', 'answer', 'reference'
+    and 'ragas_metrics', a {metric name: score} dict for that question.
+    Questions that failed or retrieved nothing are left out, as before.
     """
-    retriever = CustomPineconeRetriever()
-    rag_chain = create_rag_chain(
-        retriever=retriever,
-        groq_api_key=GROQ_API_KEY,
-        model=INFER_MODEL_NAME,
-        window_size=4
+    chain = get_rag_chain(GROQ_API_KEY, INFER_MODEL_NAME)
+    llm = get_llm(GROQ_API_KEY, INFER_MODEL_NAME)
+
+    records, summary = run_evaluation(
+        [{"question": qa["question"], "reference": qa["reference_answer"]} for qa in test_qa_pairs],
+        make_answer_func(chain, llm, window_size=4),
+        metrics=[faithfulness, answer_relevancy, context_recall, context_precision],
+        llm=get_llm(GROQ_API_KEY, INFER_MODEL_NAME, temperature=0),
+        output_path=output_path,
+        cache=JudgeCache(),
+        max_workers=max_workers,
     )
-    
-    results = []
-    
-    for i, qa_pair in enumerate(test_qa_pairs):
-        question = qa_pair["question"]
-        reference = qa_pair["reference_answer"]
-        
-        print(f"\nEvaluating question {i+1}/{len(test_qa_pairs)}: {question}")
-        
-        try:
-            result = rag_chain.invoke({
-                "question": question,
-                "chat_history": []
-            })
-            
-            answer = result["answer"]
-            retrieved_docs = result.get("source_documents", [])
-            
-            if retrieved_docs:
-                contexts_text = [doc.page_content if hasattr(doc, 'page_content') else str(doc) for doc in retrieved_docs]
-                
-                ragas_data = Dataset.from_dict({
-                    "question": [question],
-                    "answer": [answer],
-                    "contexts": [contexts_text],
-                    "reference": [reference]  
-                })
-                
-                groq_llm = ChatGroq(
-                    api_key=GROQ_API_KEY,
-                    model_name=INFER_MODEL_NAME,
-                    temperature=0
-                )
-                ragas_results = evaluate(
-                    ragas_data,
-                    metrics=[faithfulness, answer_relevancy, context_recall, context_precision],
-                    llm=groq_llm
-                )
-                
-                results.append({
-                    "question": question,
-                    "answer": answer,
-                    "reference": reference,
-                    "ragas_metrics": ragas_results,
-                })
-                
-                print(f"RAGAS scores: {ragas_results}")
-                
-        except Exception as e:
-            print(f"Error processing question: {str(e)}")
-            
-    return results
+
+    for record in records:
+        if record["error"] is not None:
+            print(f"Error processing question '{record['question']}': {record['error']}")
+        elif record["metrics"] is not None:
+            print(f"\n{record['question']}\nRAGAS scores: {record['metrics']}")
+    print(f"\nSummary: {summary}")
+
+    return [{"question": r["question"], "answer": r["answer"], "reference": r["reference"],
+             "ragas_metrics": r["metrics"]}
+            for r in records if r["metrics"] is not None]
 
 def main():
     print("Starting evaluation...")
 
     test_qa_pairs = create_reference_dataset()
     
-    results = run_evaluation_with_references(test_qa_pairs)
-    
-    # Optional: save to file
-    # import json
-    # with open("evaluation_with_refs.json", "w") as f:
-    #     json.dump(results, f, indent=2)                
+    results = run_evaluation_with_references(test_qa_pairs, output_path="evaluation_with_refs.jsonl")
+    print(f"\nEvaluation complete! {len(results)} questions scored, results saved to evaluation_with_refs.jsonl")
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
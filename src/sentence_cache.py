@@ -0,0 +1,120 @@
+import time
+import hashlib
+import sqlite3
+import threading
+import numpy as np
+from sqlite_lru import trim_lru
+
+def sentence_key(text):
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+class SentenceEmbeddingCache:
+    """
+    Persistent cache of sentence embeddings for semantic chunking, keyed by sentence hash.
+
+    Vectors live in a SQLite file (WAL mode) so re-chunking the same corpus, from
+    any script, never re-embeds a sentence it has seen. Without `db_path` the
+    cache is in-memory only and lasts for the lifetime of the object. The file
+    keeps at most `max_rows` vectors, evicting the least recently used.
+    """
+
+    def __init__(self, db_path=None, namespace="default", max_rows=200_000):
+        """
+        Args:
+            db_path: SQLite file for the cache, None for a memory-only cache
+            namespace: Prefix for keys, use the model name so models never share vectors
+            max_rows: Maximum number of vectors kept in the SQLite file
+        """
+        self.namespace = namespace
+        self.max_rows = max_rows
+        self._entries = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        self._db = None
+        self._rows = 0
+        if db_path:
+            self._db = sqlite3.connect(db_path, check_same_thread=False, timeout=30)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS sentence_embeddings "
+                "(key TEXT PRIMARY KEY, vector BLOB NOT NULL, last_used REAL NOT NULL DEFAULT 0)"
+            )
+            columns = [row[1] for row in self._db.execute("PRAGMA table_info(sentence_embeddings)")]
+            if "last_used" not in columns:
+                # Files from before eviction keep their vectors, as least recently used
+                self._db.execute("ALTER TABLE sentence_embeddings ADD COLUMN last_used REAL NOT NULL DEFAULT 0")
+            self._db.execute(
+                "CREATE INDEX IF NOT EXISTS sentence_embeddings_last_used ON sentence_embeddings (last_used)"
+            )
+            self._db.commit()
+            self._rows = self._db.execute("SELECT COUNT(*) FROM sentence_embeddings").fetchone()[0]
+
+    def _key(self, text):
+        return f"{self.namespace}\x00{sentence_key(text)}"
+
+    def get_many(self, texts):
+        """Cached vectors for `texts`, with None where a text has not been embedded yet."""
+        keys = [self._key(t) for t in texts]
+        with self._lock:
+            vectors = [self._entries.get(k) for k in keys]
+            missing = list({k for k, vec in zip(keys, vectors) if vec is None})
+            if missing and self._db is not None:
+                # Stay well below SQLite's bound-parameter limit
+                for start in range(0, len(missing), 500):
+                    part = missing[start:start + 500]
+                    rows = self._db.execute(
+                        f"SELECT key, vector FROM sentence_embeddings WHERE key IN ({','.join('?' * len(part))})",
+                        part,
+                    ).fetchall()
+                    for key, blob in rows:
+                        self._entries[key] = np.frombuffer(blob, dtype=np.float32)
+                    now = time.time()
+                    self._db.executemany(
+                        "UPDATE sentence_embeddings SET last_used = ? WHERE key = ?", [(now, key) for key, _ in rows]
+                    )
+                self._db.commit()
+                vectors = [self._entries.get(k) for k in keys]
+            found = sum(vec is not None for vec in vectors)
+            self.hits += found
+            self.misses += len(vectors) - found
+        return vectors
+
+    def put_many(self, texts, vectors):
+        rows = []
+        with self._lock:
+            for text, vector in zip(texts, vectors):
+                key = self._key(text)
+                vector = np.array(vector, dtype=np.float32)
+                vector.setflags(write=False)
+                self._entries[key] = vector
+                rows.append((key, vector.tobytes(), time.time()))
+            if self._db is not None:
+                self._db.executemany(
+                    "INSERT INTO sentence_embeddings (key, vector, last_used) VALUES (?, ?, ?) "
+                    "ON CONFLICT(key) DO UPDATE SET vector = excluded.vector, last_used = excluded.last_used",
+                    rows,
+                )
+                # Upper bound, _evict recounts before deleting anything
+                self._rows += len(rows)
+                if self._rows > self.max_rows:
+                    self._evict()
+                self._db.commit()
+
+    def _evict(self):
+        self._rows, removed = trim_lru(self._db, "sentence_embeddings", self.max_rows)
+        self.evictions += removed
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "size": len(self._entries),
+                "disk_rows": self._rows,
+                "evictions": self.evictions,
+            }
@@ -0,0 +1,290 @@
+# Per-session conversation store
+#
+# Sessions in use are live HybridMemory objects. Once a session drops out of the
+# `max_live` most recent, only its compact state (summary + window as plain
+# tuples) is kept in RAM. Compact states beyond `max_sessions` / `max_bytes` are
+# spilled to SQLite and rehydrated on the session's next turn. Sessions checked
+# out by a running turn are never evicted, and compaction runs on a background
+# thread so no request waits for another session's summary or SQLite write.
+
+import os
+import json
+import time
+import zlib
+import sqlite3
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
+
+SESSION_DB_PATH = os.getenv("SESSION_DB_PATH", "/Users/kumarpersonal/Downloads/ScalerAssist/Context/sessions.sqlite")
+SESSION_MAX_LIVE = int(os.getenv("SESSION_MAX_LIVE", "256"))
+SESSION_MAX_COMPACT = int(os.getenv("SESSION_MAX_COMPACT", "10000"))
+SESSION_MAX_BYTES = int(os.getenv("SESSION_MAX_BYTES", str(64 << 20)))
+
+# Rough per-object overhead added to the text length when sizing a state
+_MESSAGE_OVERHEAD = 64
+
+class SessionState:
+    """Compact conversation state, as produced by HybridMemory.export_state."""
+
+    __slots__ = ("summary", "summarized_count", "pending", "window", "nbytes")
+
+    def __init__(self, summary, summarized_count, pending, window):
+        self.summary = summary
+        self.summarized_count = summarized_count
+        self.pending = pending
+        self.window = window
+        messages = pending + window
+        self.nbytes = len(summary) + sum(len(c) for _, c in messages) + _MESSAGE_OVERHEAD * (len(messages) + 1)
+
+    @classmethod
+    def from_memory(cls, memory):
+        return cls(*memory.export_state())
+
+    def as_tuple(self):
+        return (self.summary, self.summarized_count, self.pending, self.window)
+
+    def to_bytes(self):
+        payload = [self.summary, self.summarized_count, [list(m) for m in self.pending], [list(m) for m in self.window]]
+        return zlib.compress(json.dumps(payload).encode("utf-8"))
+
+    @classmethod
+    def from_bytes(cls, data):
+        summary, summarized_count, pending, window = json.loads(zlib.decompress(data).decode("utf-8"))
+        return cls(summary, summarized_count, tuple(map(tuple, pending)), tuple(map(tuple, window)))
+
+class SessionStore:
+    """
+    Session id -> HybridMemory with three tiers: live objects, compact states in
+    RAM (LRU by count and bytes) and an optional SQLite spill file.
+
+    `acquire` returns a live HybridMemory and pins it until the matching
+    `release` (or use `checkout`); only unpinned sessions are evicted. `flush`
+    writes every session to SQLite, e.g. on shutdown, so conversations survive
+    a restart.
+    """
+
+    def __init__(self, memory_factory, db_path=SESSION_DB_PATH, max_live=SESSION_MAX_LIVE,
+                 max_sessions=SESSION_MAX_COMPACT, max_bytes=SESSION_MAX_BYTES, summary_timeout=1.0):
+        """
+        Args:
+            memory_factory: Creates an empty HybridMemory
+            db_path: SQLite file for spilled sessions, None to drop them instead
+            max_live: Live HybridMemory objects kept for the most recent sessions
+            max_sessions: Compact states kept in RAM before spilling the oldest
+            max_bytes: Approximate RAM budget for compact states
+            summary_timeout: Seconds to wait for a background summary before compacting a session
+        """
+        self.memory_factory = memory_factory
+        self.max_live = max_live
+        self.max_sessions = max_sessions
+        self.max_bytes = max_bytes
+        self.summary_timeout = summary_timeout
+        self._live = OrderedDict()
+        # session_id -> number of turns holding the session
+        self._pins = {}
+        # session_id -> (session_id, memory) of evicted sessions whose compaction has not finished yet
+        self._evicting = {}
+        self._compactor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="session-compactor")
+        self._compact = OrderedDict()
+        self._compact_bytes = 0
+        self._lock = threading.Lock()
+        self.live_hits = self.compact_hits = self.disk_hits = self.misses = 0
+
+        self._db = None
+        if db_path:
+            self._db = sqlite3.connect(db_path, check_same_thread=False, timeout=30)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS sessions (session_id TEXT PRIMARY KEY, state BLOB NOT NULL, updated REAL NOT NULL)"
+            )
+            self._db.commit()
+        self._db_lock = threading.Lock()
+
+    def acquire(self, session_id):
+        """
+        Live HybridMemory for the session, rehydrated from RAM or SQLite if it was
+        idle, and pinned so it is not evicted before `release(session_id)`.
+        """
+        with self._lock:
+            memory = self._live.get(session_id)
+            if memory is None:
+                # Evicted but not compacted yet: take the object back as it is
+                entry = self._evicting.pop(session_id, None)
+                if entry is not None:
+                    memory = self._live[session_id] = entry[1]
+            if memory is not None:
+                self._live.move_to_end(session_id)
+                self._pins[session_id] = self._pins.get(session_id, 0) + 1
+                self.live_hits += 1
+                return memory
+            state = self._compact.pop(session_id, None)
+            if state is not None:
+                self._compact_bytes -= state.nbytes
+                self.compact_hits += 1
+
+        if state is None:
+            state = self._load(session_id)
+            with self._lock:
+                if state is not None:
+                    self.disk_hits += 1
+                else:
+                    self.misses += 1
+
+        memory = self.memory_factory()
+        if state is not None:
+            memory.load_state(state.as_tuple())
+
+        with self._lock:
+            # Another thread may have rehydrated the same session meanwhile
+            memory = self._live.setdefault(session_id, memory)
+            self._pins[session_id] = self._pins.get(session_id, 0) + 1
+            self._evict()
+        return memory
+
+    def release(self, session_id):
+        """Unpin a session taken with `acquire`; it may be evicted once no turn holds it."""
+        with self._lock:
+            pins = self._pins.get(session_id, 0) - 1
+            if pins > 0:
+                self._pins[session_id] = pins
+            else:
+                self._pins.pop(session_id, None)
+            self._evict()
+
+    @contextmanager
+    def checkout(self, session_id):
+        """`acquire` and `release` around a block: `with store.checkout(sid) as memory: ...`"""
+        memory = self.acquire(session_id)
+        try:
+            yield memory
+        finally:
+            self.release(session_id)
+
+    def _evict(self):
+        # Caller holds _lock. Least recently used unpinned sessions go first; pinned
+        # ones may keep the live tier above max_live until they are released
+        excess = len(self._live) - self.max_live
+        if excess <= 0:
+            return
+        evicted = []
+        for sid in self._live:
+            if sid not in self._pins:
+                evicted.append((sid, self._live[sid]))
+                if len(evicted) == excess:
+                    break
+        for entry in evicted:
+            # The entry tuple identifies this eviction, see _compact_sessions
+            del self._live[entry[0]]
+            self._evicting[entry[0]] = entry
+        if evicted:
+            self._compactor.submit(self._compact_sessions, evicted)
+
+    def delete(self, session_id):
+        with self._lock:
+            found = self._live.pop(session_id, None) is not None
+            found |= self._evicting.pop(session_id, None) is not None
+            state = self._compact.pop(session_id, None)
+            if state is not None:
+                self._compact_bytes -= state.nbytes
+                found = True
+        if self._db is not None:
+            with self._db_lock:
+                found |= self._db.execute("DELETE FROM sessions WHERE session_id = ?", (session_id,)).rowcount > 0
+                self._db.commit()
+        return found
+
+    def flush(self):
+        """Write every live and compact session to SQLite (no-op without db_path)."""
+        if self._db is None:
+            return
+        with self._lock:
+            live = list(self._live.items()) + list(self._evicting.values())
+            compact = list(self._compact.items())
+        self._save([(sid, self._snapshot(memory)) for sid, memory in live] + compact)
+
+    def _snapshot(self, memory):
+        try:
+            memory.wait_for_summary(timeout=self.summary_timeout)
+        except Exception:
+            # Unfinished or failed summaries keep their messages pending in the state
+            pass
+        return SessionState.from_memory(memory)
+
+    def _compact_sessions(self, evicted):
+        """
+        Turn evicted live sessions into compact states, spilling the oldest beyond
+        the RAM limits. Runs on the compactor thread.
+        """
+        states = [(entry, self._snapshot(entry[1])) for entry in evicted]
+        spilled = []
+        with self._lock:
+            for entry, state in states:
+                sid = entry[0]
+                if self._evicting.get(sid) is not entry:
+                    # Picked up again or deleted while being compacted (a later eviction compacts it anew)
+                    continue
+                del self._evicting[sid]
+                old = self._compact.pop(sid, None)
+                if old is not None:
+                    self._compact_bytes -= old.nbytes
+                self._compact[sid] = state
+                self._compact_bytes += state.nbytes
+            while self._compact and (len(self._compact) > self.max_sessions or self._compact_bytes > self.max_bytes):
+                sid, state = self._compact.popitem(last=False)
+                self._compact_bytes -= state.nbytes
+                spilled.append((sid, state))
+            spill = self._db is not None and spilled
+            if spill:
+                # Taken before _lock is released, so an acquire of a spilled session
+                # only reads SQLite once the session has been written
+                self._db_lock.acquire()
+        if spill:
+            try:
+                self._write(spilled)
+            finally:
+                self._db_lock.release()
+
+    def _save(self, items):
+        if self._db is None or not items:
+            return
+        with self._db_lock:
+            self._write(items)
+
+    def _write(self, items):
+        # Caller holds _db_lock
+        now = time.time()
+        self._db.executemany(
+            "INSERT OR REPLACE INTO sessions (session_id, state, updated) VALUES (?, ?, ?)",
+            [(sid, state.to_bytes(), now) for sid, state in items],
+        )
+        self._db.commit()
+
+    def _load(self, session_id):
+        if self._db is None:
+            return None
+        with self._db_lock:
+            row = self._db.execute("SELECT state FROM sessions WHERE session_id = ?", (session_id,)).fetchone()
+        return SessionState.from_bytes(row[0]) if row else None
+
+    def stats(self):
+        with self._lock:
+            stats = {
+                "live_sessions": len(self._live),
+                "pinned_sessions": len(self._pins),
+                "evicting_sessions": len(self._evicting),
+                "compact_sessions": len(self._compact),
+                "compact_bytes": self._compact_bytes,
+                "live_hits": self.live_hits,
+                "compact_hits": self.compact_hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+            }
+        if self._db is not None:
+            with self._db_lock:
+                stats["spilled_sessions"] = self._db.execute("SELECT COUNT(*) FROM sessions").fetchone()[0]
+        return stats
+
+    def __len__(self):
+        return len(self._live) + len(self._evicting) + len(self._compact)
@@ -0,0 +1,135 @@
+# Process-wide shared resources
+#
+# The embedding model, vector index client, LLM client and the stateless RAG chain
+# are created lazily on first use and then shared by every session and thread in
+# the process. Per-session conversation memory lives in the shared SessionStore.
+
+import os
+import threading
+
+# Coalesce concurrent query embeddings from all sessions into batched model calls
+EMBED_BATCHING = os.getenv("EMBED_BATCHING", "false").lower() == "true"
+
+_resources = {}
+_locks = {}
+_locks_guard = threading.Lock()
+
+def get_resource(key, factory):
+    """
+    Return the shared instance for `key`, creating it with `factory()` on first use.
+
+    Creation is guarded by a per-key lock, so a slow factory (model load) only
+    blocks callers waiting for the same resource.
+    """
+    resource = _resources.get(key)
+    if resource is not None:
+        return resource
+
+    with _locks_guard:
+        lock = _locks.setdefault(key, threading.Lock())
+    with lock:
+        resource = _resources.get(key)
+        if resource is None:
+            resource = factory()
+            _resources[key] = resource
+    return resource
+
+def _get_bge_model():
+    from embeddings import BGEEmbedding
+    return get_resource("embedding_model", BGEEmbedding)
+
+def get_embedding_model():
+    model = _get_bge_model()
+    if not EMBED_BATCHING:
+        return model
+    from embedding_batcher import EmbeddingBatcher
+    return get_resource("embedding_batcher", lambda: EmbeddingBatcher(model))
+
+def get_vector_index():
+    from pinecone_utils import get_pinecone_index
+    return get_resource("vector_index", get_pinecone_index)
+
+def get_bm25_index():
+    """Shared BM25 index, or None if it has not been built yet."""
+    from bm25_index import BM25Index, BM25_INDEX_DIR
+    if not os.path.isdir(BM25_INDEX_DIR):
+        return None
+    return get_resource("bm25_index", lambda: BM25Index.load(BM25_INDEX_DIR))
+
+def get_llm_cache():
+    """Shared SQLite LLM response cache, or None unless LLM_CACHE=true."""
+    from llm_cache import LLM_CACHE, SQLiteLLMCache
+    if not LLM_CACHE:
+        return None
+    return get_resource("llm_cache", SQLiteLLMCache)
+
+def get_llm(groq_api_key, model, **kwargs):
+    """
+    Shared ChatGroq client for a model name and set of extra parameters.
+
+    Clients created with temperature=0 answer repeated prompts from the LLM
+    response cache when it is enabled.
+    """
+    from langchain_groq import ChatGroq
+    key = ("llm", model, tuple(sorted(kwargs.items())))
+
+    def build():
+        cache = get_llm_cache() if kwargs.get("temperature") == 0 else None
+        # cache=None keeps LangChain's default (the global cache, unset here)
+        return ChatGroq(groq_api_key=groq_api_key, model=model, cache=cache, **kwargs)
+
+    return get_resource(key, build)
+
+def get_retriever(k=5):
+    from hist_retriever import CustomPineconeRetriever
+    return get_resource(("retriever", k), lambda: CustomPineconeRetriever(k=k))
+
+def get_rag_chain(groq_api_key, model, k=5):
+    """Shared stateless retrieval chain, wrap it with a per-session HybridRAGChainWrapper."""
+    from hist_rag_chain_v2 import build_retrieval_chain
+    from context_packer import ContextPacker
+
+    def build():
+        llm = get_llm(groq_api_key, model)
+        return build_retrieval_chain(llm, get_retriever(k), ContextPacker(llm.get_num_tokens),
+                                     rewrite_llm=get_llm(groq_api_key, model, temperature=0))
+
+    return get_resource(("rag_chain", model, k), build)
+
+def get_session_store(groq_api_key, model, window_size=4):
+    """Shared SessionStore holding every session's HybridMemory, spilled to SQLite when idle."""
+    from hist_rag_chain_v2 import HybridMemory, HISTORY_TOKEN_BUDGET
+    from session_store import SessionStore
+
+    def memory_factory():
+        return HybridMemory(llm=get_llm(groq_api_key, model), window_size=window_size,
+                            max_history_tokens=HISTORY_TOKEN_BUDGET)
+
+    return get_resource(("session_store", model, window_size), lambda: SessionStore(memory_factory))
+
+def warm_up(groq_api_key=None, model=None):
+    """
+    Load the heavy components and run one dummy query embedding, once per process.
+
+    With a model name, the shared LLM client and RAG chain are built as well.
+    """
+    def run():
+        get_embedding_model()
+        # Straight through the model, so no junk entry lands in the persistent query cache
+        _get_bge_model().warm_up()
+        get_vector_index()
+        get_bm25_index()
+        if model is not None:
+            get_rag_chain(groq_api_key, model)
+        return True
+
+    return get_resource("warm_up", run)
+
+def start_warm_up(groq_api_key=None, model=None):
+    """Run warm_up in a background thread (once per process) so it does not block the caller."""
+    def start():
+        thread = threading.Thread(target=warm_up, args=(groq_api_key, model), name="warm-up", daemon=True)
+        thread.start()
+        return thread
+
+    return get_resource("warm_up_thread", start)
@@ -0,0 +1,19 @@
+# Size bound shared by the SQLite caches (LLM responses, query and sentence embeddings).
+# Each table has a `key` primary key and an indexed `last_used` timestamp.
+
+def trim_lru(db, table, max_rows):
+    """
+    Delete the least recently used rows of `table` down to 90% of `max_rows`.
+
+    Other processes may share the file, so the real row count is used, and the
+    extra 10% means a long run of inserts trims once per batch, not on every one.
+    Returns (rows left, rows removed); the caller commits.
+    """
+    rows = db.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+    excess = rows - int(max_rows * 0.9)
+    if excess <= 0:
+        return rows, 0
+    removed = db.execute(
+        f"DELETE FROM {table} WHERE key IN (SELECT key FROM {table} ORDER BY last_used LIMIT ?)", (excess,)
+    ).rowcount
+    return rows - removed, removed
@@ -16,13 +16,10 @@ with open(corpus_path, "r", encoding="utf-8") as f:
 
 docs = semantic_split(corpus)
 
-from langchain_groq import ChatGroq
+from shared_resources import get_llm
 
-llm = ChatGroq(
-    api_key=GROQ_API_KEY,
-    model_name=INFER_MODEL_NAME,
-    temperature=0
-)
+# Shared temperature=0 client, answers reruns from the LLM cache when LLM_CACHE=true
+llm = get_llm(GROQ_API_KEY, INFER_MODEL_NAME, temperature=0)
 embeddings = BGEEmbedding()
 
 from ragas.llms import LangchainLLMWrapper
@@ -1,10 +1,27 @@
+import os
 import re
+import tempfile
 import unicodedata
+from concurrent.futures import ProcessPoolExecutor
+
+PAGE_RE = re.compile(r"Page\s*\d+\s*(of)?\s*\d*", flags=re.IGNORECASE)
+COPYRIGHT_RE = re.compile(r"©\s*\d{4}\s*.*")
+URL_RE = re.compile(r"(www\.|https?:\/\/)\S+")
+TAG_RE = re.compile(r"<[^>]+>")
+REPEATED_RE = re.compile(r"([@#\-\*\)\(=+\|\\\/&%$^!~`{}\[\]:;\"',.?])\1{1,}")
+WHITESPACE_RE = re.compile(r"\s+")
+BLANK_LINES_RE = re.compile(r"\n\s*\n")
+NON_ASCII_RE = re.compile(r"[^\x00-\x7F]+")
+# A line starting like this may continue a page number or copyright match from the previous line
+_CONTINUATION_RE = re.compile(r"[\s\d]")
+
+# Target size of the blocks the streaming cleaner works on
+BLOCK_CHARS = 1 << 16
 
 def clean_text(text: str) -> str:
     """
     Clean and normalize raw text.
-    
+
     Steps:
     1. Normalize unicode characters (NFKC)
     2. Remove boilerplate (page numbers, copyrights, URLs)
@@ -15,25 +32,250 @@ def clean_text(text: str) -> str:
     7. Strip leading/trailing whitespace
     """
     text = unicodedata.normalize("NFKC", text)
-    text = re.sub(r"Page\s*\d+\s*(of)?\s*\d*", "", text, flags=re.IGNORECASE)
-    text = re.sub(r"©\s*\d{4}\s*.*", "", text)
-    text = re.sub(r"(www\.|https?:\/\/)\S+", "", text)
-    text = re.sub(r"<[^>]+>", "", text)
-    text = re.sub(r"([@#\-\*\)\(=+\|\\\/&%$^!~`{}\[\]:;\"',.?])\1{1,}", "", text)
-    text = re.sub(r"\s+", " ", text)
-    text = re.sub(r"\n\s*\n", "\n\n", text)
-    text = re.sub(r"[^\x00-\x7F]+", "", text)
+    text = PAGE_RE.sub("", text)
+    text = COPYRIGHT_RE.sub("", text)
+    text = URL_RE.sub("", text)
+    text = TAG_RE.sub("", text)
+    text = REPEATED_RE.sub("", text)
+    text = WHITESPACE_RE.sub(" ", text)
+    text = BLANK_LINES_RE.sub("\n\n", text)
+    text = NON_ASCII_RE.sub("", text)
     return text.strip()
 
+def _ends_with_match(pattern, text):
+    """Whether a match of `pattern` runs up to the end of `text` (and might continue past it)."""
+    return any(m.end() == len(text) for m in pattern.finditer(text))
+
+def _open_tag_start(text):
+    """
+    Where the part of `text` that a later '>' could still turn into a tag starts,
+    len(text) if there is none.
+
+    That is the first '<' after the last '>', moved back over a run of a repeated
+    character right before it: once the tag is removed, the run could continue
+    with the characters after the tag.
+    """
+    cut = text.find("<", text.rfind(">") + 1)
+    if cut == -1:
+        return len(text)
+    if cut and REPEATED_RE.match(text[cut - 1] * 2):
+        char = text[cut - 1]
+        while cut and text[cut - 1] == char:
+            cut -= 1
+    return cut
+
+class StreamingCleaner:
+    """
+    Incremental version of clean_text with the same output.
+
+    Lines are collected into blocks of about `block_chars`. A block is only cut
+    at a line boundary where no page-number, copyright or URL match can cross
+    it: the next line must not start with whitespace or a digit and no
+    page-number or copyright match may run to the end of the block. Those
+    patterns are removed per block. From an unclosed '<' on, the text is held
+    back until a '>' arrives (or the input ends) and is cleaned together with
+    it, so a tag is removed however long it is. Whitespace runs are collapsed
+    across blocks and the output is stripped at its ends, so the concatenated
+    output equals clean_text of the whole input.
+    """
+
+    def __init__(self, write, block_chars=BLOCK_CHARS):
+        """
+        Args:
+            write: Called with each piece of cleaned output
+            block_chars: Minimum block size before a cut is attempted
+        """
+        self.write = write
+        self.block_chars = block_chars
+        self._lines = []
+        self._size = 0
+        self._next_attempt = block_chars
+        # Text from an unclosed '<' on, with page numbers, copyrights and URLs already removed
+        self._tail = []
+        # Whitespace state of the output so far, before and after non-ASCII removal
+        self._space_before = True
+        self._started = False
+        self._pending = ""
+
+    def feed(self, line):
+        """Add one line of raw text (with its line ending, if any)."""
+        line = unicodedata.normalize("NFKC", line)
+        if self._size >= self._next_attempt and not _CONTINUATION_RE.match(line):
+            # A page number or copyright line may still run to the end of the block,
+            # then the next line decides
+            self._next_attempt = self.block_chars if self._flush_block(final=False) else self._size
+        self._lines.append(line)
+        self._size += len(line)
+
+    def finish(self):
+        """Clean whatever is left; the output is complete after this call."""
+        self._flush_block(final=True)
+
+    def _flush_block(self, final):
+        text = "".join(self._lines)
+        if not final and (_ends_with_match(PAGE_RE, text) or _ends_with_match(COPYRIGHT_RE, PAGE_RE.sub("", text))):
+            return False
+        self._lines = []
+        self._size = 0
+        self._clean_tags(URL_RE.sub("", COPYRIGHT_RE.sub("", PAGE_RE.sub("", text))), final)
+        return True
+
+    def _clean_tags(self, text, final):
+        if self._tail:
+            if not final and ">" not in text:
+                self._tail.append(text)
+                return
+            self._tail.append(text)
+            text = "".join(self._tail)
+            self._tail = []
+        cut = len(text) if final else _open_tag_start(text)
+        if cut < len(text):
+            self._tail.append(text[cut:])
+        self._output(WHITESPACE_RE.sub(" ", REPEATED_RE.sub("", TAG_RE.sub("", text[:cut]))))
+
+    def _output(self, text):
+        if self._space_before and text.startswith(" "):
+            text = text[1:]
+        if text:
+            self._space_before = text.endswith(" ")
+        self._emit(NON_ASCII_RE.sub("", text))
+
+    def _emit(self, text):
+        if not self._started:
+            text = text.lstrip()
+            if not text:
+                return
+            self._started = True
+        body = text.rstrip()
+        if not body:
+            self._pending += text
+            return
+        self.write(self._pending + body)
+        self._pending = text[len(body):]
+
+def clean_stream(lines, write, block_chars=BLOCK_CHARS):
+    """Clean an iterable of raw lines, passing the cleaned output to `write` piece by piece."""
+    cleaner = StreamingCleaner(write, block_chars)
+    for line in lines:
+        cleaner.feed(line)
+    cleaner.finish()
+
+def _iter_file_lines(paths, joiner="\n"):
+    """Lines of several files as if they were joined with `joiner`, like merge_all_texts."""
+    for i, path in enumerate(paths):
+        if i:
+            yield joiner
+        with open(path, "r", encoding="utf-8") as f:
+            yield from f
 
 def clean_corpus_file(input_path: str, output_path: str) -> None:
     """
     Read raw corpus text file, clean it, and write cleaned text to output file.
+
+    The file is cleaned block by block, so memory use does not grow with the corpus.
+    """
+    with open(output_path, "w", encoding="utf-8") as f_out:
+        clean_stream(_iter_file_lines([input_path]), f_out.write)
+
+def clean_text_files(input_paths, output_path):
+    """
+    Clean several raw text files into one output, as if they had first been merged
+    with merge_all_texts, without writing the merged corpus.
+    """
+    with open(output_path, "w", encoding="utf-8") as f_out:
+        clean_stream(_iter_file_lines(input_paths), f_out.write)
+
+class _SegmentCleaner(StreamingCleaner):
+    """StreamingCleaner for one file of a merged corpus, leaving both of its ends to the caller."""
+
+    def __init__(self, write, block_chars=BLOCK_CHARS):
+        super().__init__(write, block_chars)
+        self._space_before = False
+        # Whether the output starts with a space before non-ASCII removal, and the whitespace
+        # state after it; None while nothing has been output
+        self.leading_space = None
+        self.space_before = None
+
+    def _output(self, text):
+        super()._output(text)
+        if text:
+            if self.leading_space is None:
+                self.leading_space = text.startswith(" ")
+            self.space_before = self._space_before
+
+    def _emit(self, text):
+        self.write(text)
+
+def _clean_segment(task):
+    """
+    Clean one file of a merged corpus in a worker process, up to the last safe cut.
+
+    Returns whether its first line could continue a match from the file before, the
+    whitespace state at the start and end of its output, the raw lines and tag tail
+    left after the last cut, and the file holding the cleaned text (without the
+    leading-space and strip handling, which depend on the files before it).
+    """
+    path, joiner, output_folder, block_chars = task
+    cleaner = _SegmentCleaner(None, block_chars)
+    first_line = None
+    fd, segment_path = tempfile.mkstemp(suffix=".clean", dir=output_folder)
+    with os.fdopen(fd, "w", encoding="utf-8") as f_out:
+        cleaner.write = f_out.write
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                if first_line is None:
+                    first_line = unicodedata.normalize("NFKC", line)
+                cleaner.feed(line)
+        if joiner:
+            cleaner.feed(joiner)
+        if cleaner._lines:
+            cleaner._flush_block(final=False)
+    continues = first_line is None or bool(_CONTINUATION_RE.match(first_line))
+    return continues, cleaner.leading_space, cleaner.space_before, cleaner._lines, cleaner._tail, segment_path
+
+def clean_text_files_parallel(input_paths, output_path, max_workers=None, block_chars=BLOCK_CHARS):
+    """
+    clean_text_files with the files cleaned in parallel processes; same output.
+
+    Each worker cleans one file up to its last safe cut and writes the result to a
+    temporary file next to `output_path`. The segments are then stitched in order.
+    Where a pattern could span a file boundary (the next file starts with
+    whitespace or a digit, or a page number, copyright line or tag is still open
+    at the end of a file), the file is cleaned again here as part of the stream.
     """
-    with open(input_path, "r", encoding="utf-8") as f:
-        corpus = f.read()
+    output_folder = os.path.dirname(os.path.abspath(output_path))
+    tasks = [(path, "\n" if i < len(input_paths) - 1 else "", output_folder, block_chars)
+             for i, path in enumerate(input_paths)]
 
-    cleaned_text = clean_text(corpus)
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        results = list(executor.map(_clean_segment, tasks))
 
-    with open(output_path, "w", encoding="utf-8") as f:
-        f.write(cleaned_text)
\ No newline at end of file
+    try:
+        with open(output_path, "w", encoding="utf-8") as f_out:
+            cleaner = StreamingCleaner(f_out.write, block_chars)
+            for i, ((path, joiner, _, _), result) in enumerate(zip(tasks, results)):
+                continues, leading_space, space_before, lines, tail, segment_path = result
+                safe_start = not cleaner._lines and not cleaner._tail and (i == 0 or not continues)
+                safe_end = i == len(results) - 1 or not results[i + 1][0]
+                if not (safe_start and safe_end):
+                    for line in _iter_file_lines([path]):
+                        cleaner.feed(line)
+                    if joiner:
+                        cleaner.feed(joiner)
+                    continue
+                with open(segment_path, "r", encoding="utf-8") as segment:
+                    piece = segment.read(BLOCK_CHARS)
+                    if cleaner._space_before and leading_space:
+                        piece = piece[1:]
+                    while piece:
+                        cleaner._emit(piece)
+                        piece = segment.read(BLOCK_CHARS)
+                if space_before is not None:
+                    cleaner._space_before = space_before
+                cleaner._lines = lines
+                cleaner._size = sum(len(line) for line in lines)
+                cleaner._tail = tail
+            cleaner.finish()
+    finally:
+        for result in results:
+            os.remove(result[-1])
@@ -1,38 +1,66 @@
 import pdfplumber
-from pdf2image import convert_from_path
+from pdf2image import convert_from_path, pdfinfo_from_path
 import pytesseract
-import cv2
 import os
 import glob
+from concurrent.futures import ProcessPoolExecutor
 
 BASE_FOLDER = "/Users/kumarpersonal/Downloads/ScalerAssist/Context"
 
 PDF_FOLDER = os.path.join(BASE_FOLDER, "PDFs")
 TEXT_FOLDER = os.path.join(BASE_FOLDER, "Text")
 
+OCR_DPI = 200
+OCR_GRAYSCALE = True
+# Pages whose pdfplumber text is shorter than this are treated as image-only and OCR'd
+MIN_PAGE_CHARS = 50
+
+def extract_pages_pdfplumber(pdf_path):
+    """Extract the text of every PDF page using pdfplumber, one entry per page."""
+    with pdfplumber.open(pdf_path) as pdf:
+        return [page.extract_text() for page in pdf.pages]
+
+def format_pdfplumber_pages(page_texts):
+    return "\n".join(f"\n--- Page {i+1} ---\n{text}" for i, text in enumerate(page_texts))
+
 def extract_text_pdfplumber(pdf_path):
     """Extract all text from PDF pages using pdfplumber."""
-    all_text = []
-    with pdfplumber.open(pdf_path) as pdf:
-        for i, page in enumerate(pdf.pages):
-            text = page.extract_text()
-            all_text.append(f"\n--- Page {i+1} ---\n{text}")
-    return "\n".join(all_text)
-
-def ocr_from_pdf_images(pdf_path):
-    """Convert PDF pages to images and run OCR using pytesseract."""
-    pages = convert_from_path(pdf_path)
-    ocr_texts = []
-    for i, image in enumerate(pages):
-        img_path = f"temp_page_{i+1}.png"
-        image.save(img_path, "PNG")
-
-        img = cv2.imread(img_path)
-        text = pytesseract.image_to_string(img)
-        ocr_texts.append(f"\n--- OCR from Page {i+1} ---\n{text}")
-
-        os.remove(img_path)
-    return "\n".join(ocr_texts)
+    return format_pdfplumber_pages(extract_pages_pdfplumber(pdf_path))
+
+def pages_needing_ocr(page_texts, min_chars=MIN_PAGE_CHARS):
+    """1-based numbers of the pages where pdfplumber found little or no text."""
+    return [i + 1 for i, text in enumerate(page_texts) if len((text or "").strip()) < min_chars]
+
+def ocr_page(pdf_path, page_number, dpi=OCR_DPI, grayscale=OCR_GRAYSCALE):
+    """Render a single PDF page in memory and OCR it, without a temp file."""
+    images = convert_from_path(
+        pdf_path, dpi=dpi, first_page=page_number, last_page=page_number, grayscale=grayscale
+    )
+    try:
+        return pytesseract.image_to_string(images[0])
+    finally:
+        for image in images:
+            image.close()
+
+def _ocr_page_task(task):
+    """Process pool entry point, task is (pdf_path, page_number, dpi, grayscale)."""
+    return ocr_page(*task)
+
+def format_ocr_pages(page_numbers, texts):
+    return "\n".join(f"\n--- OCR from Page {n} ---\n{text}" for n, text in zip(page_numbers, texts))
+
+def ocr_from_pdf_images(pdf_path, pages=None, dpi=OCR_DPI, grayscale=OCR_GRAYSCALE):
+    """
+    OCR PDF pages one at a time using pytesseract.
+
+    Only one rendered page is held in memory at once. `pages` is a list of
+    1-based page numbers and defaults to every page of the PDF.
+    """
+    if pages is None:
+        pages = range(1, pdfinfo_from_path(pdf_path)["Pages"] + 1)
+    pages = list(pages)
+    texts = [ocr_page(pdf_path, n, dpi, grayscale) for n in pages]
+    return format_ocr_pages(pages, texts)
 
 def cleanup_old_outputs(base_name):
     """Delete previous text and OCR output files for a given PDF basename."""
@@ -47,8 +75,15 @@ def cleanup_old_outputs(base_name):
         os.remove(file)
         print(f"Deleted old file: {file}")
 
-def process_pdf_file(pdf_path):
-    """Process a single PDF: extract text and OCR text; save outputs."""
+def write_outputs(filename, text_data, ocr_text):
+    """Save the pdfplumber and OCR text of one PDF into TEXT_FOLDER."""
+    with open(os.path.join(TEXT_FOLDER, f"{filename}_text.txt"), "w", encoding="utf-8") as f:
+        f.write(text_data)
+    with open(os.path.join(TEXT_FOLDER, f"{filename}_ocr.txt"), "w", encoding="utf-8") as f:
+        f.write(ocr_text)
+
+def process_pdf_file(pdf_path, min_chars=MIN_PAGE_CHARS):
+    """Process a single PDF: extract text, OCR the pages without text; save outputs."""
     filename = os.path.splitext(os.path.basename(pdf_path))[0]
     print(f"\nProcessing: {filename}.pdf")
 
@@ -56,35 +91,74 @@ def process_pdf_file(pdf_path):
 
     # Extract structured text
     print("Extracting structured text...")
-    text_data = extract_text_pdfplumber(pdf_path)
-    with open(os.path.join(TEXT_FOLDER, f"{filename}_text.txt"), "w", encoding="utf-8") as f:
-        f.write(text_data)
+    page_texts = extract_pages_pdfplumber(pdf_path)
 
-    # OCR from images
-    print("Performing OCR on images...")
-    ocr_text = ocr_from_pdf_images(pdf_path)
-    with open(os.path.join(TEXT_FOLDER, f"{filename}_ocr.txt"), "w", encoding="utf-8") as f:
-        f.write(ocr_text)
+    # OCR from images, only where pdfplumber came back (nearly) empty
+    ocr_pages = pages_needing_ocr(page_texts, min_chars)
+    print(f"Performing OCR on {len(ocr_pages)}/{len(page_texts)} pages...")
+    ocr_text = ocr_from_pdf_images(pdf_path, pages=ocr_pages)
 
+    write_outputs(filename, format_pdfplumber_pages(page_texts), ocr_text)
     print(f"Finished processing {filename}.pdf")
 
-def process_all_pdfs(pdf_folder=PDF_FOLDER):
+def process_all_pdfs(pdf_folder=PDF_FOLDER, parallel=False, max_workers=None):
     """Process all PDFs found in the pdf_folder."""
     pdf_files = glob.glob(os.path.join(pdf_folder, "*.pdf"))
     if not pdf_files:
         print(f"No PDF files found in {pdf_folder}")
         return
-    for pdf_path in pdf_files:
-        process_pdf_file(pdf_path)
+    if parallel:
+        process_pdfs_parallel(pdf_files, max_workers=max_workers)
+    else:
+        for pdf_path in pdf_files:
+            process_pdf_file(pdf_path)
     print("\nAll PDF files processed. Clean and updated outputs are ready.")
 
+def process_pdfs_parallel(pdf_files, max_workers=None, dpi=OCR_DPI, grayscale=OCR_GRAYSCALE,
+                          min_chars=MIN_PAGE_CHARS):
+    """
+    Process PDFs on a process pool.
+
+    pdfplumber extraction runs one task per PDF, then OCR runs one task per page
+    that needs it across all PDFs, so a large prospectus is spread over all
+    cores instead of being rendered in one piece.
+    """
+    with ProcessPoolExecutor(max_workers=max_workers) as pool:
+        print(f"Extracting structured text from {len(pdf_files)} PDFs...")
+        page_texts = dict(zip(pdf_files, pool.map(extract_pages_pdfplumber, pdf_files)))
+
+        tasks = [
+            (pdf_path, n, dpi, grayscale)
+            for pdf_path in pdf_files
+            for n in pages_needing_ocr(page_texts[pdf_path], min_chars)
+        ]
+        print(f"Performing OCR on {len(tasks)} pages...")
+        ocr_results = {}
+        for task, text in zip(tasks, pool.map(_ocr_page_task, tasks)):
+            ocr_results.setdefault(task[0], []).append((task[1], text))
+
+    for pdf_path in pdf_files:
+        filename = os.path.splitext(os.path.basename(pdf_path))[0]
+        cleanup_old_outputs(filename)
+        ocr_pages = ocr_results.get(pdf_path, [])
+        write_outputs(
+            filename,
+            format_pdfplumber_pages(page_texts[pdf_path]),
+            format_ocr_pages([n for n, _ in ocr_pages], [text for _, text in ocr_pages]),
+        )
+        print(f"Finished processing {filename}.pdf")
+
+def list_text_files(text_folder=TEXT_FOLDER):
+    """Per-PDF text files in text_folder, in the order merge_all_texts joins them."""
+    return glob.glob(os.path.join(text_folder, "*.txt"))
+
 def merge_all_texts(text_folder=TEXT_FOLDER, output_path=None):
     """
     Merge all text files in text_folder into a single corpus file.
     If output_path not provided, saves as corpus.txt inside base folder.
     """
     corpus = []
-    txt_files = glob.glob(os.path.join(text_folder, "*.txt"))
+    txt_files = list_text_files(text_folder)
     for txt_file in txt_files:
         with open(txt_file, "r", encoding="utf-8") as f:
             corpus.append(f.read())
@@ -1,7 +1,20 @@
-from langchain_huggingface import HuggingFaceEmbeddings
+import os
+import re
+import numpy as np
 from langchain.text_splitter import RecursiveCharacterTextSplitter
-from langchain_experimental.text_splitter import SemanticChunker
 from langchain_core.documents import Document
+from sentence_cache import SentenceEmbeddingCache
+
+SENTENCE_MODEL_NAME = "BAAI/bge-base-en-v1.5"
+# SQLite file with cached sentence vectors, shared by ingestion and test set generation
+SENTENCE_CACHE_PATH = os.getenv(
+    "SENTENCE_CACHE_PATH", "/Users/kumarpersonal/Downloads/ScalerAssist/Context/sentence_embeddings.sqlite"
+)
+SENTENCE_CACHE_MAX_ROWS = int(os.getenv("SENTENCE_CACHE_MAX_ROWS", "200000"))
+BREAKPOINT_PERCENTILE = 95
+SENTENCE_BATCH_SIZE = 64
+
+_SENTENCE_SPLIT_RE = re.compile(r"(?<=[.?!])\s+")
 
 def recursive_char_split(corpus, chunk_size=300, chunk_overlap=50):
     rc_splitter = RecursiveCharacterTextSplitter(
@@ -16,16 +29,123 @@ def recursive_char_split(corpus, chunk_size=300, chunk_overlap=50):
     return documents
 
 
-def semantic_split(corpus):
-    embed_model = HuggingFaceEmbeddings(
-        model_name="BAAI/bge-base-en-v1.5",
-        encode_kwargs={"normalize_embeddings": True}
-    )
-    
-    sc_splitter = SemanticChunker(embed_model)
+def get_sentence_model():
+    """Shared sentence embedding model, loaded once per process."""
+    from shared_resources import get_resource
+
+    def build():
+        from langchain_huggingface import HuggingFaceEmbeddings
+        return HuggingFaceEmbeddings(
+            model_name=SENTENCE_MODEL_NAME,
+            encode_kwargs={"normalize_embeddings": True}
+        )
+
+    return get_resource("sentence_model", build)
+
+def split_sentences(text):
+    return _SENTENCE_SPLIT_RE.split(text)
+
+def combine_sentences(sentences, buffer_size=1):
+    """Each sentence joined with its `buffer_size` neighbours on both sides, as SemanticChunker does."""
+    combined = []
+    for i in range(len(sentences)):
+        window = sentences[max(0, i - buffer_size):i + 1 + buffer_size]
+        combined.append(" ".join(window))
+    return combined
+
+class CachedSemanticChunker:
+    """
+    Semantic chunking (the SemanticChunker percentile method) over cached sentence vectors.
+
+    Sentence windows are embedded in batches only if they are not in the
+    SentenceEmbeddingCache yet. Splitting at a breakpoint percentile is then pure
+    NumPy over the cosine distances of consecutive windows, so trying another
+    threshold on the same text costs no embedding calls.
+    """
+
+    def __init__(self, embed_model=None, cache=None, buffer_size=1,
+                 breakpoint_percentile=BREAKPOINT_PERCENTILE, batch_size=SENTENCE_BATCH_SIZE):
+        """
+        Args:
+            embed_model: Embeddings object with embed_documents, defaults to get_sentence_model() on first use
+            cache: SentenceEmbeddingCache, defaults to one at SENTENCE_CACHE_PATH
+            buffer_size: Neighbouring sentences on each side included in a sentence's window
+            breakpoint_percentile: Split where the distance exceeds this percentile of all distances
+            batch_size: Number of uncached windows embedded per model call
+        """
+        self._embed_model = embed_model
+        if cache is None:
+            cache = SentenceEmbeddingCache(SENTENCE_CACHE_PATH, namespace=SENTENCE_MODEL_NAME,
+                                           max_rows=SENTENCE_CACHE_MAX_ROWS)
+        self.cache = cache
+        self.buffer_size = buffer_size
+        self.breakpoint_percentile = breakpoint_percentile
+        self.batch_size = batch_size
+
+    @property
+    def embed_model(self):
+        if self._embed_model is None:
+            self._embed_model = get_sentence_model()
+        return self._embed_model
+
+    def embed(self, texts):
+        """Normalized float32 matrix of the texts' vectors, embedding only the uncached ones."""
+        vectors = self.cache.get_many(texts)
+        missing = list(dict.fromkeys(t for t, vec in zip(texts, vectors) if vec is None))
+        for start in range(0, len(missing), self.batch_size):
+            batch = missing[start:start + self.batch_size]
+            self.cache.put_many(batch, self.embed_model.embed_documents(batch))
+        if missing:
+            vectors = self.cache.get_many(texts)
+        if not vectors:
+            return np.empty((0, 0), dtype=np.float32)
+        matrix = np.vstack(vectors)
+        return matrix / np.maximum(np.linalg.norm(matrix, axis=1, keepdims=True), 1e-12)
+
+    def distances(self, sentences):
+        """Cosine distance between each sentence window and the next."""
+        matrix = self.embed(combine_sentences(sentences, self.buffer_size))
+        return 1.0 - np.sum(matrix[:-1] * matrix[1:], axis=1)
+
+    def split_at(self, sentences, distances, breakpoint_percentile=None):
+        """Group sentences into chunks at the distances above the percentile threshold."""
+        if len(sentences) <= 1:
+            return list(sentences)
+        if breakpoint_percentile is None:
+            breakpoint_percentile = self.breakpoint_percentile
+        threshold = np.percentile(distances, breakpoint_percentile)
+        breakpoints = np.flatnonzero(distances > threshold)
+
+        chunks, start = [], 0
+        for index in breakpoints:
+            chunks.append(" ".join(sentences[start:index + 1]))
+            start = index + 1
+        if start < len(sentences):
+            chunks.append(" ".join(sentences[start:]))
+        return chunks
+
+    def split_text(self, text, breakpoint_percentile=None):
+        sentences = split_sentences(text)
+        if len(sentences) <= 1:
+            return sentences
+        return self.split_at(sentences, self.distances(sentences), breakpoint_percentile)
+
+    def split_documents(self, documents, breakpoint_percentile=None):
+        chunks = []
+        for doc in documents:
+            for text in self.split_text(doc.page_content, breakpoint_percentile):
+                chunks.append(Document(page_content=text, metadata=dict(doc.metadata)))
+        return chunks
+
+def get_semantic_chunker():
+    from shared_resources import get_resource
+    return get_resource("semantic_chunker", CachedSemanticChunker)
+
+def semantic_split(corpus, breakpoint_percentile=BREAKPOINT_PERCENTILE):
+    sc_splitter = get_semantic_chunker()
     document = Document(page_content=corpus)
-    documents = sc_splitter.split_documents([document])
+    documents = sc_splitter.split_documents([document], breakpoint_percentile)
 
     for doc in documents:
         doc.metadata["chunk_text"] = doc.page_content
-    return documents
\ No newline at end of file
+    return documents
@@ -1,13 +1,5 @@
-from text_splitter import semantic_split
-from embeddings import BGEEmbedding
-from pinecone_utils import upsert_documents
+from ingest_manifest import incremental_ingest
 
-corpus_path = "/Users/kumarpersonal/Downloads/ScalerAssist/Context/cleaned_text.txt"
-
-with open(corpus_path, "r", encoding="utf-8") as f:
-    corpus = f.read()
-
-docs = semantic_split(corpus)
-embed_func = BGEEmbedding()
-
-upsert_documents(docs, embed_func)
\ No newline at end of file
+# Only new or changed brochures in Context/PDFs are re-chunked, embedded and upserted;
+# vectors of removed chunks are deleted. See ingest_manifest.py.
+incremental_ingest()
@@ -0,0 +1,5 @@
+# The modules in src/ import each other by bare name, like the scripts do when run from src/
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src"))
@@ -0,0 +1,51 @@
+from answer_cache import SemanticAnswerCache, extract_entities
+from eval_stubs import HashEmbedding
+
+def result(answer):
+    return {"answer": answer, "source_documents": []}
+
+def test_extract_entities():
+    assert extract_entities("What is the fee for DSML?") == {"dsml"}
+    assert extract_entities("what is the fee for devops") == {"devops"}
+    assert extract_entities("Fees for the 2024 batch?") == {"2024"}
+    assert extract_entities("Can I pay in EMIs?") == extract_entities("Is there an EMI option?")
+
+def test_same_question_hits():
+    cache = SemanticAnswerCache(HashEmbedding(), threshold=0.9)
+    cache.store("What is the fee for DSML?", result("DSML fee"))
+
+    assert cache.lookup("what is the fee for DSML ?")["answer"] == "DSML fee"
+
+def test_different_program_never_matches():
+    cache = SemanticAnswerCache(HashEmbedding(), threshold=0.5)
+    cache.store("What is the fee for DSML?", result("DSML fee"))
+
+    assert cache.lookup("What is the fee for DevOps?") is None
+    assert cache.lookup("What is the fee for the 2025 batch?") is None
+    assert cache.stats()["misses"] == 2
+
+def test_expired_entries_are_dropped(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr("answer_cache.time.time", lambda: now[0])
+    cache = SemanticAnswerCache(HashEmbedding(), threshold=0.9, ttl=60)
+    cache.store("What is NSET?", result("entrance test"))
+    now[0] += 30
+    cache.store("What is the fee for DSML?", result("DSML fee"))
+    assert cache.lookup("What is NSET?") is not None
+
+    # NSET has expired but sits behind the fresh DSML entry, so only a later sweep from the head drops it
+    now[0] += 45
+    assert cache.lookup("What is the fee for DSML?") is not None
+    now[0] += 50
+    assert cache.lookup("What is NSET?") is None
+    assert cache.stats()["size"] == 0
+
+def test_least_recently_used_entry_is_evicted():
+    cache = SemanticAnswerCache(HashEmbedding(), threshold=0.9, maxsize=2)
+    cache.store("What is NSET?", result("a"))
+    cache.store("What is the fee for DSML?", result("b"))
+    cache.lookup("What is NSET?")
+    cache.store("How long is the DevOps course?", result("c"))
+
+    assert cache.lookup("What is the fee for DSML?") is None
+    assert cache.lookup("What is NSET?")["answer"] == "a"
@@ -0,0 +1,49 @@
+import json
+import time
+import threading
+import urllib.error
+import urllib.request
+import pytest
+from api_server import build_service, make_server
+
+@pytest.fixture
+def server():
+    service = build_service(stub=True, workers=2, queue_timeout=0.2)
+    server = make_server(service, port=0)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+def request(server, method, path, body=None):
+    url = f"http://127.0.0.1:{server.server_address[1]}{path}"
+    data = json.dumps(body).encode("utf-8") if body is not None else None
+    req = urllib.request.Request(url, data=data, method=method, headers={"Content-Type": "application/json"})
+    try:
+        with urllib.request.urlopen(req, timeout=10) as response:
+            return response.status, json.loads(response.read())
+    except urllib.error.HTTPError as e:
+        return e.code, json.loads(e.read())
+
+def test_query_strings_are_ignored(server):
+    assert request(server, "GET", "/health?")[0] == 200
+    status, payload = request(server, "POST", "/chat?x=1", {"question": "What is Scaler?", "session_id": "s1"})
+    assert status == 200 and payload["session_id"] == "s1"
+    assert request(server, "DELETE", "/sessions/s1?confirm=1")[0] == 200
+
+def test_busy_session_times_out_with_503(server):
+    service = server.RequestHandlerClass.service
+    assert service.lock_session("s1")
+    try:
+        status, payload = request(server, "POST", "/chat", {"question": "What is Scaler?", "session_id": "s1"})
+    finally:
+        service.unlock_session("s1")
+
+    assert status == 503 and payload["session_id"] == "s1"
+    assert request(server, "POST", "/chat", {"question": "What is Scaler?", "session_id": "s1"})[0] == 200
+    # Locks of finished turns are dropped (the handler unlocks right after responding)
+    deadline = time.monotonic() + 5
+    while service._session_locks and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert service._session_locks == {}
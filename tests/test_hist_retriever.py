@@ -0,0 +1,49 @@
+import asyncio
+import time
+from embedding_batcher import EmbeddingBatcher
+from eval_stubs import HashEmbedding, build_stub_retriever
+
+QUESTIONS = ["How long is the Data Science program?", "Can I pay the fee in EMIs?", "Are classes live?"]
+
+def texts(docs):
+    return [doc.page_content for doc in docs]
+
+def test_async_retrieval_matches_sync(tmp_path):
+    retriever = build_stub_retriever(index_dir=str(tmp_path))
+
+    async def run():
+        return await asyncio.gather(*(retriever.ainvoke(q) for q in QUESTIONS))
+
+    assert [texts(docs) for docs in asyncio.run(run())] == [texts(retriever.invoke(q)) for q in QUESTIONS]
+
+def test_local_index_aquery_matches_query(tmp_path):
+    retriever = build_stub_retriever(index_dir=str(tmp_path))
+    vector = HashEmbedding().embed_query(QUESTIONS[0])
+
+    result = asyncio.run(retriever.index.aquery(vector=vector, top_k=3, include_metadata=True))
+    assert result == retriever.index.query(vector=vector, top_k=3, include_metadata=True)
+
+def test_batcher_coalesces_async_queries(tmp_path):
+    retriever = build_stub_retriever(index_dir=str(tmp_path))
+    expected = [texts(retriever.invoke(q)) for q in QUESTIONS]
+    batcher = EmbeddingBatcher(HashEmbedding(), max_wait_ms=50)
+    retriever.embed_func = batcher
+
+    async def run():
+        return await asyncio.gather(*(retriever.ainvoke(q) for q in QUESTIONS))
+
+    try:
+        assert [texts(docs) for docs in asyncio.run(run())] == expected
+    finally:
+        batcher.close()
+    assert batcher.stats()["batches"] == 1
+
+def test_index_queries_overlap(tmp_path):
+    retriever = build_stub_retriever(index_dir=str(tmp_path), index_latency=0.2)
+
+    async def run():
+        return await asyncio.gather(*(retriever.ainvoke(q) for q in QUESTIONS))
+
+    start = time.perf_counter()
+    asyncio.run(run())
+    assert time.perf_counter() - start < 0.2 * len(QUESTIONS)
@@ -0,0 +1,49 @@
+from eval_stubs import StubChatModel
+from hist_rag_chain_v2 import HISTORY_TOKEN_MARGIN, HybridMemory
+
+class FailingChatModel(StubChatModel):
+    def _generate(self, *args, **kwargs):
+        raise RuntimeError("rate limited")
+
+def add_turns(memory, n, start=0):
+    for i in range(start, start + n):
+        memory.add_user_message(f"question {i}")
+        memory.add_ai_message(f"answer {i}")
+
+def test_evicted_turns_are_summarized():
+    memory = HybridMemory(llm=StubChatModel(), window_size=2)
+    add_turns(memory, 10)
+    memory.wait_for_summary(timeout=10)
+
+    stats = memory.get_stats()
+    assert stats["pending_summary_messages"] == 0
+    assert stats["total_messages_in_summary"] == 16
+    assert stats["recent_messages_count"] == 4
+
+def test_pending_is_capped_while_summarization_fails():
+    memory = HybridMemory(llm=FailingChatModel(), window_size=1, max_pending=6)
+    for i in range(20):
+        add_turns(memory, 1, start=i)
+        memory.wait_for_summary(timeout=10)
+
+    stats = memory.get_stats()
+    assert stats["pending_summary_messages"] <= 6
+    assert stats["dropped_unsummarized_messages"] == 38 - stats["pending_summary_messages"]
+
+def test_load_state_during_summary_is_summarized():
+    memory = HybridMemory(llm=StubChatModel(latency=0.05), window_size=1)
+    add_turns(memory, 3)
+    memory.load_state(("", 0, ((True, "old question"), (False, "old answer")), ((True, "q"), (False, "a"))))
+    memory.wait_for_summary(timeout=10)
+
+    summary, summarized, pending, window = memory.export_state()
+    assert pending == ()
+    assert summarized == 2
+    assert window == ((True, "q"), (False, "a"))
+
+def test_history_budget_keeps_a_margin():
+    memory = HybridMemory(llm=StubChatModel(), window_size=10, max_history_tokens=100,
+                          token_counter=lambda text: 10)
+    add_turns(memory, 5)
+
+    assert len(memory.get_combined_history()) == int(100 * (1 - HISTORY_TOKEN_MARGIN)) // 10
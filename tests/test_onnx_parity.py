@@ -0,0 +1,51 @@
+# Parity of the ONNX Runtime backend with the BGEM3 torch model. The model is
+# exported into a temporary folder, so this runs whenever onnxruntime, torch,
+# transformers and FlagEmbedding are installed and the weights are in the local
+# Hugging Face cache; otherwise it is skipped.
+import pytest
+
+pytest.importorskip("onnxruntime")
+pytest.importorskip("torch")
+pytest.importorskip("transformers")
+pytest.importorskip("FlagEmbedding")
+huggingface_hub = pytest.importorskip("huggingface_hub")
+
+from embeddings import MODEL_NAME, BGEEmbedding
+from embedding_cache import QueryEmbeddingCache
+from onnx_embedding import check_parity, export_onnx_model
+
+if not isinstance(huggingface_hub.try_to_load_from_cache(MODEL_NAME, "config.json"), str):
+    pytest.skip(f"{MODEL_NAME} weights are not in the local Hugging Face cache", allow_module_level=True)
+
+SAMPLE = [
+    "Scaler Academy offers a structured program in software development with live classes and mentorship.",
+    "The Data Science and Machine Learning program covers Python, statistics, SQL and deep learning.",
+    "Learners get career support including mock interviews, resume reviews and referrals to partner companies.",
+    "The intermediate data analytics module teaches Excel, Tableau, SQL and case-study driven problem solving.",
+    "What is Scaler Academy?",
+    "How long is the Data Science program?",
+    "What is the eligibility for Scaler's AI/ML track?",
+    "Tell me about Scaler's placement support.",
+]
+
+def make_model(**kwargs):
+    # Disabled query cache so every vector comes from the model
+    return BGEEmbedding(query_cache=QueryEmbeddingCache(maxsize=0), **kwargs)
+
+@pytest.fixture(scope="module")
+def torch_model():
+    return make_model(backend="torch")
+
+@pytest.fixture(scope="module")
+def onnx_dir(tmp_path_factory):
+    # Writes both the float32 and the int8 model
+    model_dir = str(tmp_path_factory.mktemp("onnx_model"))
+    export_onnx_model(MODEL_NAME, model_dir, quantize=True)
+    return model_dir
+
+@pytest.mark.parametrize("quantized", [False, True], ids=["float32", "int8"])
+def test_onnx_matches_torch(torch_model, onnx_dir, quantized):
+    onnx_model = make_model(backend="onnx", quantized=quantized, onnx_model_dir=onnx_dir)
+
+    parity = check_parity(torch_model, onnx_model, SAMPLE)
+    assert parity["min"] >= 0.99, parity
@@ -0,0 +1,63 @@
+import pytest
+from langchain_core.documents import Document
+from eval_stubs import HashEmbedding, RecordingIndex, TransientIndexError
+from pinecone_utils import _call_with_retry, chunk_id, delete_stale_vectors, upsert_documents
+
+def make_docs(n):
+    return [Document(page_content=f"chunk number {i} about the Scaler program") for i in range(n)]
+
+def test_retry_recovers_from_transient_failures():
+    index = RecordingIndex()
+    index.fail("upsert", times=2)
+    upsert_documents(make_docs(3), HashEmbedding(), index=index, batch_size=10, backoff=0)
+
+    assert len(index.calls_to("upsert")) == 3
+    assert index.describe_index_stats()["total_vector_count"] == 3
+
+def test_retry_gives_up_after_max_retries(monkeypatch):
+    delays = []
+    monkeypatch.setattr("pinecone_utils.time.sleep", delays.append)
+    index = RecordingIndex()
+    index.fail("delete", times=5)
+
+    with pytest.raises(TransientIndexError):
+        _call_with_retry(index.delete, 3, 0.5, ids=["doc-x"])
+    assert len(index.calls_to("delete")) == 4
+    assert delays == [0.5, 1.0, 2.0]
+
+def test_upserts_in_flight_are_bounded():
+    index = RecordingIndex(latency=0.02)
+    docs = make_docs(40)
+    ids = upsert_documents(docs, HashEmbedding(), index=index, batch_size=4, max_workers=2, backoff=0)
+
+    assert index.max_in_flight <= 2
+    assert len(index.calls_to("upsert")) == 10
+    assert all(len(call["ids"]) <= 4 for call in index.calls_to("upsert"))
+    assert sorted(ids) == sorted(chunk_id(doc.page_content) for doc in docs)
+
+def test_identical_chunks_are_upserted_once():
+    index = RecordingIndex()
+    ids = upsert_documents(make_docs(3) + make_docs(3), HashEmbedding(), index=index, backoff=0)
+
+    assert len(ids) == 3
+    assert sum(len(call["ids"]) for call in index.calls_to("upsert")) == 3
+
+def test_delete_stale_vectors_removes_only_unreferenced_ids():
+    index = RecordingIndex()
+    docs = make_docs(5)
+    upsert_documents(docs, HashEmbedding(), index=index, backoff=0)
+    keep = {chunk_id(doc.page_content) for doc in docs[:3]}
+
+    stale = delete_stale_vectors(index, keep, backoff=0)
+
+    assert set(stale) == {chunk_id(doc.page_content) for doc in docs[3:]}
+    assert [call["ids"] for call in index.calls_to("delete")] == [stale]
+    assert set(id_ for page in index.list(prefix="doc-") for id_ in page) == keep
+
+def test_upsert_documents_with_delete_stale():
+    index = RecordingIndex()
+    upsert_documents(make_docs(4), HashEmbedding(), index=index, backoff=0)
+    ids = upsert_documents(make_docs(2), HashEmbedding(), index=index, backoff=0, delete_stale=True)
+
+    assert index.describe_index_stats()["total_vector_count"] == 2
+    assert set(id_ for page in index.index.list() for id_ in page) == set(ids)
@@ -0,0 +1,58 @@
+import threading
+from eval_stubs import StubChatModel
+from hist_rag_chain_v2 import HybridMemory
+from session_store import SessionStore
+
+def make_store(tmp_path, **kwargs):
+    return SessionStore(lambda: HybridMemory(llm=StubChatModel(), window_size=2),
+                        db_path=str(tmp_path / "sessions.sqlite"), **kwargs)
+
+def wait_for_compaction(store):
+    # The compactor runs one task at a time, so an empty task queues behind the evictions
+    store._compactor.submit(lambda: None).result(timeout=10)
+
+def test_pinned_session_is_not_evicted(tmp_path):
+    store = make_store(tmp_path, max_live=1)
+    memory = store.acquire("a")
+    with store.checkout("b"):
+        pass
+    wait_for_compaction(store)
+
+    assert store.stats()["live_sessions"] == 1
+    assert store.acquire("a") is memory
+    store.release("a")
+    store.release("a")
+
+def test_released_session_is_compacted_and_rehydrated(tmp_path):
+    store = make_store(tmp_path, max_live=1, max_sessions=0)
+    with store.checkout("a") as memory:
+        memory.add_user_message("What is the DSML fee?")
+        memory.add_ai_message("It is listed in the brochure.")
+    with store.checkout("b"):
+        pass
+    wait_for_compaction(store)
+
+    assert store.stats()["spilled_sessions"] == 1
+    with store.checkout("a") as memory:
+        assert [m.content for m in memory.get_combined_history()][-1] == "It is listed in the brochure."
+    assert store.disk_hits == 1
+
+def test_eviction_does_not_wait_for_summaries(tmp_path):
+    store = make_store(tmp_path, max_live=1, summary_timeout=10)
+    blocked = threading.Event()
+    store._compactor.submit(blocked.wait)
+    with store.checkout("a"):
+        pass
+    # Evicting "a" only queues its compaction behind the blocked task
+    with store.checkout("b"):
+        pass
+    assert store.stats()["evicting_sessions"] == 1
+
+    # Taken back before it was compacted: the same object, with nothing lost
+    with store.checkout("a") as memory:
+        memory.add_user_message("still here")
+    blocked.set()
+    wait_for_compaction(store)
+    with store.checkout("a") as again:
+        assert again is memory
+    assert store.stats()["evicting_sessions"] == 0
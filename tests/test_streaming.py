@@ -0,0 +1,62 @@
+import asyncio
+import pytest
+from langchain_core.language_models.fake_chat_models import GenericFakeChatModel
+from eval_stubs import StubChatModel, build_stub_retriever
+from hist_rag_chain_v2 import (
+    STREAM_ABORTED_MARKER, HybridMemory, HybridRAGChainWrapper, build_retrieval_chain
+)
+
+ANSWER = "The program fee can be paid upfront or through EMI."
+
+def make_wrapper(llm):
+    chain = build_retrieval_chain(llm, build_stub_retriever())
+    return HybridRAGChainWrapper(chain, HybridMemory(llm=StubChatModel(), window_size=4))
+
+def saved_turn(wrapper):
+    return [m.content for m in wrapper.hybrid_memory.window_memory.chat_memory.messages]
+
+def test_stream_yields_tokens_and_saves_turn():
+    wrapper = make_wrapper(GenericFakeChatModel(messages=iter([ANSWER])))
+
+    tokens = list(wrapper.stream({"question": "What is the fee?"}))
+
+    assert len(tokens) > 1
+    assert "".join(tokens) == ANSWER
+    assert saved_turn(wrapper) == ["What is the fee?", ANSWER]
+    assert wrapper.last_source_documents
+
+def test_disconnected_consumer_saves_partial_answer():
+    wrapper = make_wrapper(GenericFakeChatModel(messages=iter([ANSWER])))
+
+    stream = wrapper.stream({"question": "What is the fee?"})
+    received = [next(stream), next(stream)]
+    stream.close()
+
+    assert saved_turn(wrapper) == ["What is the fee?", f"{''.join(received)} {STREAM_ABORTED_MARKER}"]
+
+def test_failing_chain_saves_turn_and_reraises():
+    class FailingModel(GenericFakeChatModel):
+        def _stream(self, *args, **kwargs):
+            yield from list(super()._stream(*args, **kwargs))[:3]
+            raise RuntimeError("connection reset")
+
+    wrapper = make_wrapper(FailingModel(messages=iter([ANSWER])))
+
+    received = []
+    with pytest.raises(RuntimeError):
+        for token in wrapper.stream({"question": "What is the fee?"}):
+            received.append(token)
+    assert received
+    assert saved_turn(wrapper) == ["What is the fee?", f"{''.join(received)} {STREAM_ABORTED_MARKER}"]
+
+def test_astream_disconnect_saves_partial_answer():
+    wrapper = make_wrapper(GenericFakeChatModel(messages=iter([ANSWER])))
+
+    async def consume_two():
+        stream = wrapper.astream({"question": "What is the fee?"})
+        received = [await stream.__anext__(), await stream.__anext__()]
+        await stream.aclose()
+        return received
+
+    received = asyncio.run(consume_two())
+    assert saved_turn(wrapper) == ["What is the fee?", f"{''.join(received)} {STREAM_ABORTED_MARKER}"]
@@ -0,0 +1,95 @@
+import os
+import re
+import random
+import unicodedata
+import pytest
+from text_cleaner import StreamingCleaner, clean_stream, clean_text, clean_text_files_parallel
+
+CORPUS_PATH = os.path.join(os.path.dirname(__file__), os.pardir, "Context", "extracted_text.txt")
+
+PIECES = ["word ", "Page 3 of 9\n", "Page\n", " 4\n", "of 3\n", "<b>", "</b>", "<", ">", "© 2024 Scaler\n",
+          "www.scaler.com ", "---", "-", "*", "\n", "\n\n", "  ", "é", "é ", "12 "]
+
+def baseline_clean(text):
+    """The regex pipeline clean_text had before the streaming cleaner, kept verbatim."""
+    text = unicodedata.normalize("NFKC", text)
+    text = re.sub(r"Page\s*\d+\s*(of)?\s*\d*", "", text, flags=re.IGNORECASE)
+    text = re.sub(r"©\s*\d{4}\s*.*", "", text)
+    text = re.sub(r"(www\.|https?:\/\/)\S+", "", text)
+    text = re.sub(r"<[^>]+>", "", text)
+    text = re.sub(r"([@#\-\*\)\(=+\|\\\/&%$^!~`{}\[\]:;\"',.?])\1{1,}", "", text)
+    text = re.sub(r"\s+", " ", text)
+    text = re.sub(r"\n\s*\n", "\n\n", text)
+    text = re.sub(r"[^\x00-\x7F]+", "", text)
+    return text.strip()
+
+def stream_clean(text, block_chars):
+    out = []
+    clean_stream(text.splitlines(keepends=True), out.append, block_chars)
+    return "".join(out)
+
+def random_text(rng, max_pieces):
+    return "".join(rng.choice(PIECES) for _ in range(rng.randint(0, max_pieces)))
+
+def test_streaming_matches_baseline():
+    rng = random.Random(0)
+    for _ in range(300):
+        text = random_text(rng, 80)
+        assert stream_clean(text, block_chars=rng.randint(1, 40)) == baseline_clean(text)
+
+def test_streaming_matches_baseline_on_corpus():
+    if not os.path.exists(CORPUS_PATH):
+        pytest.skip("Context/extracted_text.txt is not available")
+    with open(CORPUS_PATH, "r", encoding="utf-8") as f:
+        text = f.read()
+
+    expected = baseline_clean(text)
+    assert clean_text(text) == expected
+    for block_chars in (64, 4096, 1 << 16):
+        assert stream_clean(text, block_chars) == expected
+
+def test_long_unclosed_tag_is_removed_once_closed():
+    text = "start --<" + "x" * 50 + "\n" + ("y" * 50 + "\n") * 2000 + ">-- end\n" + "z" * 50 + "\nmore <open\n"
+    assert stream_clean(text, block_chars=100) == baseline_clean(text) == "start end " + "z" * 50 + " more <open"
+
+def test_closed_tags_do_not_hold_text_back():
+    writes = []
+    cleaner = StreamingCleaner(writes.append, block_chars=100)
+    for i in range(100):
+        cleaner.feed(f"line {i} <b>bold</b>\n")
+    assert len(cleaner._lines) < 10 and not cleaner._tail
+    cleaner.finish()
+
+def test_parallel_files_match_merged_baseline(tmp_path):
+    rng = random.Random(1)
+    for trial in range(30):
+        texts = [random_text(rng, 40) for _ in range(rng.randint(1, 5))]
+        paths = []
+        for i, text in enumerate(texts):
+            path = tmp_path / f"{trial}_{i}.txt"
+            path.write_text(text, encoding="utf-8", newline="")
+            paths.append(str(path))
+        output = tmp_path / f"{trial}_clean.txt"
+        clean_text_files_parallel(paths, str(output), max_workers=2, block_chars=rng.randint(1, 40))
+
+        assert output.read_text(encoding="utf-8") == baseline_clean("\n".join(texts))
+    # Worker segments are removed once stitched
+    assert not list(tmp_path.glob("*.clean"))
+
+def test_parallel_files_match_merged_corpus(tmp_path):
+    if not os.path.exists(CORPUS_PATH):
+        pytest.skip("Context/extracted_text.txt is not available")
+    with open(CORPUS_PATH, "r", encoding="utf-8") as f:
+        lines = f.read().split("\n")
+    # Split the corpus into per-PDF-sized files that merge back into it
+    step = len(lines) // 7 + 1
+    texts = ["\n".join(lines[i:i + step]) for i in range(0, len(lines), step)]
+    paths = []
+    for i, text in enumerate(texts):
+        path = tmp_path / f"part{i}.txt"
+        path.write_text(text, encoding="utf-8", newline="")
+        paths.append(str(path))
+    output = tmp_path / "clean.txt"
+    clean_text_files_parallel(paths, str(output), max_workers=4)
+
+    assert output.read_text(encoding="utf-8") == baseline_clean("\n".join(texts))